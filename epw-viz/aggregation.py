@@ -0,0 +1,148 @@
+"""Monthly, daily and monthly per hour statistics of all the fields of an EPW file.
+
+The average, the total, the minimum and the maximum of every field are calculated
+for every month, day and hour of each month in one step with NumPy reduceat over the
+hourly values of the EPW file. The bar chart and the daily chart read their values
+from these tables instead of grouping the hourly data collections for each chart.
+
+The hours are grouped in the same way as ladybug's hourly collections. Each month
+also includes the first hour of the next month like the group_by_month of ladybug.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Union
+
+import numpy as np
+
+from ladybug.analysisperiod import AnalysisPeriod
+from ladybug.datacollection import DailyCollection, MonthlyCollection, \
+    MonthlyPerHourCollection
+from ladybug.epw import EPWFields
+from ladybug.header import Header
+
+from degree_time import month_starts
+from epw_data import EPWData
+
+PERIODS = ('monthly', 'daily', 'monthly_per_hour')
+# the same names as the operations of ladybug's data collections
+STATISTICS = ('average', 'total', 'minimum', 'maximum')
+# number of cubes to keep in memory. Each one is less than 1 MB.
+MAX_CACHED_CUBES = 8
+
+_cubes = OrderedDict()
+_cubes_lock = threading.Lock()
+
+
+def _reduce(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Calculate the statistics of the groups of columns that start at starts.
+
+    Args:
+        values: An array with the shape of (fields, hours).
+        starts: Index of the first column of each group.
+
+    Returns:
+        An array with the shape of (statistics, fields, groups).
+    """
+    counts = np.diff(np.append(starts, values.shape[1]))
+    total = np.add.reduceat(values, starts, axis=1)
+    return np.stack([
+        total / counts, total,
+        np.minimum.reduceat(values, starts, axis=1),
+        np.maximum.reduceat(values, starts, axis=1)
+    ])
+
+
+class AggregationCube:
+    """Statistics of the hourly values of all the fields of an EPW file.
+
+    Args:
+        values: Hourly values with the shape of (fields, hours) for a year.
+        is_leap_year: A boolean to indicate if the values are for a leap year.
+    """
+
+    def __init__(self, values: np.ndarray, is_leap_year: bool = False):
+        values = np.asarray(values, dtype=np.float64)
+        self.is_leap_year = is_leap_year
+        hours = values.shape[1]
+        self._tables = {}
+
+        # each month includes the first hour of the next month so the hours on the
+        # edges are repeated before grouping them
+        starts = month_starts(is_leap_year)
+        ends = np.append(starts[1:] + 1, hours)
+        columns = np.concatenate([np.arange(st, end) for st, end in zip(starts, ends)])
+        self._tables['monthly'] = _reduce(
+            values[:, columns], np.append(0, np.cumsum(ends - starts)[:-1]))
+
+        self._tables['daily'] = _reduce(values, np.arange(0, hours, 24))
+
+        # sort the hours by the month and the hour of the day
+        months = np.searchsorted(starts, np.arange(hours), side='right') - 1
+        keys = months * 24 + np.arange(hours) % 24
+        order = np.argsort(keys, kind='stable')
+        group_starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+        self._tables['monthly_per_hour'] = _reduce(values[:, order], group_starts)
+
+        for table in self._tables.values():
+            table.flags.writeable = False
+
+    def values(self, field: int, period: str, statistic: str) -> np.ndarray:
+        """Get the statistic of a field for each month, day or hour of each month.
+
+        Args:
+            field: EPW field number.
+            period: One of PERIODS.
+            statistic: One of STATISTICS.
+
+        Returns:
+            A read-only array with 12 values for monthly, one value for each day of
+            the year for daily and 288 values for monthly_per_hour.
+        """
+        return self._tables[period][STATISTICS.index(statistic), field]
+
+
+def aggregation_cube(epw: EPWData) -> AggregationCube:
+    """Get the AggregationCube of an EPW file.
+
+    The cubes are cached by the SHA-256 of the EPW file.
+    """
+    with _cubes_lock:
+        if epw.sha256 in _cubes:
+            _cubes.move_to_end(epw.sha256)
+            return _cubes[epw.sha256]
+
+    # the same values as the data collections of the EPW file
+    cube = AggregationCube(epw.values.astype(np.float64).round(4), epw.is_leap_year)
+    with _cubes_lock:
+        _cubes[epw.sha256] = cube
+        while len(_cubes) > MAX_CACHED_CUBES:
+            _cubes.popitem(last=False)
+    return cube
+
+
+def aggregated_collection(
+    epw: EPWData, field: int, period: str, statistic: str
+) -> Union[MonthlyCollection, DailyCollection, MonthlyPerHourCollection]:
+    """Create a ladybug data collection from the AggregationCube of an EPW file.
+
+    The collection is the same as calling average_monthly, total_daily and so on for
+    the hourly collection of the field.
+    """
+    epw_field = EPWFields.field_by_number(field)
+    metadata = epw.metadata
+    metadata['operation'] = statistic
+    analysis_period = AnalysisPeriod(is_leap_year=epw.is_leap_year)
+    header = Header(data_type=epw_field.name, unit=epw_field.unit,
+                    analysis_period=analysis_period, metadata=metadata)
+    values = aggregation_cube(epw).values(field, period, statistic).tolist()
+
+    if period == 'monthly':
+        collection = MonthlyCollection(header, values, analysis_period.months_int)
+    elif period == 'daily':
+        collection = DailyCollection(header, values, analysis_period.doys_int)
+    else:
+        collection = MonthlyPerHourCollection(
+            header, values, analysis_period.months_per_hour)
+    collection._validated_a_period = True
+    return collection
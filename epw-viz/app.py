@@ -3,13 +3,24 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
-from ladybug.epw import EPW
-
-from helper import colorsets, get_fields, get_image, get_hourly_data_figure, \
+from concurrent.futures import Future, TimeoutError, as_completed
+from typing import List, Tuple
+
+from city_image import request_image
+from climate_summary import climate_summary
+from aggregation import STATISTICS
+from comparison import Comparison, compare, field_label, library_files
+from epw_data import EPWData, cached_epw, load_epw
+from figure_cache import figure_key
+from helper import figure_executor, colorsets, get_fields, get_hourly_data_figure, \
     get_bar_chart_figure, get_hourly_line_chart_figure, get_figure_config,\
     get_hourly_diurnal_average_chart_figure, get_daily_chart_figure, get_sunpath_figure,\
-    get_degree_days_figure, get_windrose_figure, get_psy_chart_figure, \
-    get_diurnal_average_chart_figure
+    get_degree_days_figure, get_degree_days_sensitivity_figure, get_windrose_figure,\
+    get_psy_chart_figure, get_binned_psy_chart_figure, get_diurnal_average_chart_figure,\
+    get_comparison_monthly_figure, get_comparison_diurnal_figure,\
+    get_comparison_distribution_figure, get_series_hourly_figure,\
+    get_series_monthly_figure, get_series_yearly_figure, get_series_degree_days_figure
+from weather_series import WeatherSeries, field_statistics, load_series
 
 st.set_page_config(
     page_title='Weather data visualization', layout='wide',
@@ -22,6 +33,176 @@ st.sidebar.image(
     use_column_width=True
 )
 
+# sections of the main page. Only the selected sections are created.
+SECTIONS = (
+    'Location', 'Climate summary', 'Diurnal average chart', 'Hourly data', 'Bar chart', 'Hourly line chart',
+    'Diurnal average chart (hourly data)', 'Daily chart', 'Sunpath', 'Degree days',
+    'Windrose', 'Psychrometric chart'
+)
+
+# seconds to wait for the image of the city after all the figures are shown. This is
+# kept short so a pending download never holds up a rerun. The download goes on in the
+# background and the next rerun shows the image.
+IMAGE_TIMEOUT = 0.2
+
+
+def submit_figure(func, *args, title: str, caption=None) -> Tuple:
+    """Submit a figure to the figure workers and add a placeholder for it on the page.
+
+    The figures that were shown in the last run of the session are reused without
+    going to the workers if the inputs are the same so the sections that didn't change
+    are never created again while the user is editing another section.
+
+    Args:
+        func: The function that creates the figure.
+        args: The inputs of the function.
+        title: File name to download the figure.
+        caption: An optional function to create a text to show under the figure. It
+            is called with the values that the function returns after the figure.
+
+    Returns:
+        A tuple of the future, the placeholder, the title, the caption and the key of
+        the inputs.
+    """
+    placeholder = st.empty()
+    key = figure_key(func.__name__, list(args))
+    shown_figures = st.session_state.get('shown_figures', {})
+    if key in shown_figures:
+        # the inputs of the section haven't changed since the last run
+        future = Future()
+        future.set_result(shown_figures[key])
+    else:
+        placeholder.caption('Loading the chart...')
+        future = figure_executor.submit(func, *args)
+    return future, placeholder, title, caption, key
+
+
+def show_figures(figure_jobs: List[Tuple]) -> None:
+    """Show the figures in their placeholders in the order that they are ready."""
+    jobs = {job[0]: job[1:] for job in figure_jobs}
+    # only keep the figures of this run in the session
+    shown_figures = {}
+    st.session_state['shown_figures'] = shown_figures
+    for future in as_completed(jobs):
+        placeholder, title, caption, key = jobs[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            placeholder.exception(e)
+            continue
+
+        if isinstance(result, str):
+            # an error message
+            placeholder.error(result)
+            continue
+
+        shown_figures[key] = result
+
+        values = []
+        if isinstance(result, tuple):
+            result, *values = result
+        with placeholder.container():
+            st.plotly_chart(result, use_container_width=True,
+                            config=get_figure_config(title))
+            if caption:
+                st.text(caption(*values))
+
+
+def show_image(future: Future, placeholder, timeout: float = IMAGE_TIMEOUT) -> None:
+    """Show the image of the city in its placeholder if it is downloaded.
+
+    If the image is not ready within the timeout the placeholder is kept and the next
+    rerun picks up the image.
+    """
+    try:
+        path = future.result(timeout=timeout)
+    except TimeoutError:
+        placeholder.caption(
+            'Looking for an image of the city... Rerun the app to see it once it is '
+            'ready.')
+        return
+    if path is None:
+        placeholder.empty()
+    else:
+        placeholder.image(str(path))
+
+
+def load_upload(upload) -> EPWData:
+    """Load an uploaded EPW file from its bytes.
+
+    The session keeps a registry of the SHA-256 of its uploads by the id of the upload
+    so a rerun gets the parsed file from the cache without hashing it again.
+    """
+    registry = st.session_state.setdefault('epw_uploads', {})
+    epw = cached_epw(registry.get(upload.id))
+    if epw is None:
+        epw = load_epw(upload.getvalue())
+        registry[upload.id] = epw.sha256
+    return epw
+
+
+def unique_names(names: List[str]) -> List[str]:
+    """Remove the extension of the EPW file names and number the duplicates."""
+    stems = [pathlib.Path(name).stem for name in names]
+    return [
+        stem if stems.count(stem) == 1 else f'{stem} ({stems[:i + 1].count(stem)})'
+        for i, stem in enumerate(stems)
+    ]
+
+
+def show_comparison(comparison: Comparison, field: int, total: bool, heat_base: float,
+                    cool_base: float, temperature_range: Tuple[float, float],
+                    humidity_range: Tuple[float, float], global_colorset: str) -> None:
+    """Show the statistics of several EPW files on the same charts."""
+    st.title('Weather Data Comparison')
+    st.markdown(
+        f'Comparing {len(comparison)} EPW files. The statistics of all the files are'
+        ' calculated together so adding more files only makes the page slightly slower.')
+
+    st.header('Ranking')
+    st.markdown(
+        'The files are ranked by the number of hours with the dry bulb temperature and'
+        ' the relative humidity in the comfortable ranges. The 0.4% and the 99.6%'
+        ' dry bulb temperatures are the percentiles of the hourly values.')
+    st.dataframe(comparison.ranking(heat_base, cool_base, temperature_range,
+                                    humidity_range))
+
+    figure_jobs = []
+    for header, func, args in (
+            ('Monthly', get_comparison_monthly_figure, (total,)),
+            ('Average day', get_comparison_diurnal_figure, ()),
+            ('Distribution', get_comparison_distribution_figure, ())):
+        st.header(header)
+        figure_jobs.append(submit_figure(
+            func, comparison, field, global_colorset, *args,
+            title=f'Comparison_{header.lower().replace(" ", "_")}'))
+    show_figures(figure_jobs)
+
+
+def show_series(series: WeatherSeries, field: int, statistic: str, heat_base: float,
+                cool_base: float, global_colorset: str) -> None:
+    """Show the year-over-year trends of a multi-year weather series."""
+    st.title('Multi-year Weather Series')
+    st.markdown(
+        f'{len(series.years)} years from {series.years[0]} to {series.years[-1]} with'
+        f' {series.hours} hours. The hourly values are kept on disk and the charts are'
+        ' created from the statistics that are calculated while the files are read.')
+
+    st.header('Yearly statistics')
+    st.dataframe(field_statistics(series, field))
+
+    figure_jobs = []
+    for header, func, args in (
+            ('Yearly', get_series_yearly_figure, (field, statistic)),
+            ('Monthly', get_series_monthly_figure, (field, statistic)),
+            ('Hourly', get_series_hourly_figure, (field, statistic)),
+            ('Degree days', get_series_degree_days_figure, (heat_base, cool_base))):
+        st.header(header)
+        figure_jobs.append(submit_figure(
+            func, series, *args, global_colorset,
+            title=f'Series_{header.lower().replace(" ", "_")}'))
+    show_figures(figure_jobs)
+
 
 def main():
 
@@ -36,14 +217,75 @@ def main():
         # epw file #####################################################################
         with st.expander('Upload EPW file'):
             epw_data = st.file_uploader('', type='epw')
-            if epw_data:
-                epw_file = pathlib.Path(f'./data/{epw_data.name}')
-                epw_file.parent.mkdir(parents=True, exist_ok=True)
-                epw_file.write_bytes(epw_data.read())
-            else:
-                epw_file = './assets/sample.epw'
-
-            global_epw = EPW(epw_file)
+            # the uploads are parsed in memory so the sessions never share a file
+            global_epw = load_upload(epw_data) if epw_data else \
+                load_epw('./assets/sample.epw')
+
+        # sections #####################################################################
+        with st.expander('Sections'):
+            sections = st.multiselect(
+                'Show sections', options=SECTIONS, default=SECTIONS, key='sections',
+                help='The charts of the hidden sections are not created. Hide the'
+                ' sections that you are not using to update the page faster.')
+
+        # comparison ###################################################################
+        with st.expander('Compare EPW files'):
+            comparison_uploads = st.file_uploader(
+                'Upload EPW files', type='epw', accept_multiple_files=True,
+                key='comparison_files')
+            library = {path.name: path for path in library_files()}
+            comparison_library = st.multiselect(
+                'Select EPW files from the library', options=list(library.keys()),
+                key='comparison_library')
+            comparison_mode = st.checkbox(
+                'Compare the files', value=False, key='comparison_mode',
+                help='Show the statistics of all the selected EPW files instead of the'
+                ' charts of a single EPW file.')
+
+            comparison_selected = st.selectbox(
+                'Select an environmental variable', options=fields.keys(),
+                key='comparison_field')
+            comparison_total = st.checkbox(
+                'Monthly total', value=False, key='comparison_total',
+                help='Show the monthly totals instead of the monthly averages.')
+            comparison_heat_base = st.number_input(
+                'Base heating temperature', value=18, key='comparison_heat_base')
+            comparison_cool_base = st.number_input(
+                'Base cooling temperature', value=23, key='comparison_cool_base')
+            comparison_temperature_range = st.slider(
+                'Comfortable dry bulb temperature', min_value=-10, max_value=40,
+                value=(20, 26), key='comparison_temperature_range')
+            comparison_humidity_range = st.slider(
+                'Comfortable relative humidity', min_value=0, max_value=100,
+                value=(20, 80), key='comparison_humidity_range')
+
+        # multi-year series ############################################################
+        with st.expander('Multi-year series'):
+            series_uploads = st.file_uploader(
+                'Upload EPW or CSV files', type=['epw', 'csv'], accept_multiple_files=True,
+                key='series_files',
+                help='One file for each year or CSV files with the columns of the hourly'
+                ' data of an EPW file. The files can cover many years.')
+            series_mode = st.checkbox(
+                'Show the series', value=False, key='series_mode',
+                help='Show the trends of the uploaded years instead of the charts of a'
+                ' single EPW file.')
+
+            series_selected = st.selectbox(
+                'Select an environmental variable', options=fields.keys(),
+                key='series_field')
+            series_statistic = st.selectbox(
+                'Statistic', options=STATISTICS, key='series_statistic')
+            series_heat_base = st.number_input(
+                'Base heating temperature', value=18, key='series_heat_base')
+            series_cool_base = st.number_input(
+                'Base cooling temperature', value=23, key='series_cool_base')
+
+        # climate summary ##############################################################
+        with st.expander('Climate summary'):
+            summary_selected = st.selectbox(
+                'Select an environmental variable', options=fields.keys(),
+                key='summary_field')
 
         # Global Colorset ##############################################################
         with st.expander('Global colorset'):
@@ -61,7 +303,6 @@ def main():
         with st.expander('Hourly data'):
             hourly_selected = st.selectbox(
                 'Select an environmental variable', options=fields.keys(), key='hourly_data')
-            hourly_data = global_epw._get_data_by_field(fields[hourly_selected])
             hourly_data_conditional_statement = st.text_input(
                 'Apply conditional statement')
             hourly_data_min = st.text_input('Min')
@@ -106,20 +347,29 @@ def main():
             hourly_line_chart_selected = st.selectbox(
                 'Select an environmental variable', options=fields.keys(), index=2,
                 key='line_chart')
-            hourly_line_chart_data = global_epw._get_data_by_field(
-                fields[hourly_line_chart_selected])
 
             hourly_line_chart_switch = st.checkbox('Switch colors', key='line_chart_switch',
                                                    help='Reverse the colorset')
 
+            hourly_line_chart_months = st.slider(
+                'Months', min_value=1, max_value=12, value=(1, 12),
+                key='line_chart_months',
+                help='Select a shorter period to see more details.')
+            hourly_line_chart_points = st.select_slider(
+                'Number of points', options=[500, 1000, 2000, 4000, 'All'], value=2000,
+                key='line_chart_points',
+                help='The hourly values are downsampled to this number of points while'
+                ' keeping the peaks. Select All to draw all the hourly values.')
+            hourly_line_chart_webgl = st.checkbox(
+                'Use WebGL', key='line_chart_webgl',
+                help='Draw the chart with WebGL which is faster for many points.')
+
         # Hourly diurnal chart ##########################################################
         with st.expander('Diurnal average chart from Hourly data'):
 
             diurnal_average_chart_hourly_selected = st.selectbox(
                 'Select an environmental variable', options=fields.keys(), index=8,
                 key='hourly_diurnal_average_chart')
-            diurnal_average_chart_hourly_data = global_epw._get_data_by_field(
-                fields[diurnal_average_chart_hourly_selected])
 
             diurnal_average_chart_hourly_switch = st.checkbox(
                 'Switch colors', key='hourly_diurnal_average_chart_switch',
@@ -131,8 +381,6 @@ def main():
             daily_chart_selected = st.selectbox(
                 'Select an environmental variable', options=fields.keys(), index=16,
                 key='daily_chart')
-            daily_chart_data = global_epw._get_data_by_field(
-                fields[daily_chart_selected])
 
             daily_chart_switch = st.checkbox('Switch colors', key='daily_chart_switch',
                                              help='Reverse the colorset')
@@ -148,12 +396,12 @@ def main():
             if sunpath_radio == 'from epw location':
                 sunpath_switch = st.checkbox('Switch colors', key='sunpath_switch',
                                              help='Reverse the colorset')
-                sunpath_data = None
+                sunpath_field = None
 
             else:
                 sunpath_selected = st.selectbox(
                     'Select an environmental variable', options=fields.keys(), key='sunpath')
-                sunpath_data = global_epw._get_data_by_field(fields[sunpath_selected])
+                sunpath_field = fields[sunpath_selected]
                 sunpath_switch = None
 
         # Degree days ###################################################################
@@ -195,20 +443,62 @@ def main():
             if psy_load_data:
                 psy_selected = st.selectbox('Select an environmental variable',
                                             options=fields.keys(), key='psychrometric')
-                psy_data = global_epw._get_data_by_field(fields[psy_selected])
+                psy_field = fields[psy_selected]
             else:
-                psy_data = None
+                psy_field = None
 
             psy_draw_polygons = st.checkbox('Draw comfort polygons', key='psychrometric')
             psy_strategy_options = ['Comfort', 'Evaporative Cooling',
-                                    'Mass + Night Ventilation', ' Occupant use of fans',
+                                    'Mass + Night Ventilation', 'Occupant use of fans',
                                     'Capture internal heat', 'Passive solar heating', 'All']
             psy_selected_strategy = st.selectbox(
                 'Select a passive strategy', options=psy_strategy_options, key='psychrometric')
+            psy_binned = st.checkbox(
+                'Bin hours by humidity ratio', value=True, key='psychrometric_binned',
+                help='Draw the hours as cells of temperature and humidity ratio. This is'
+                ' much faster than binning them by relative humidity.')
+
+    ####################################################################################
+    # Multi-year series page
+    ####################################################################################
+    if series_mode:
+        if not series_uploads:
+            st.warning('Upload the EPW or CSV files of the series to show it.')
+        else:
+            try:
+                series = load_series(series_uploads,
+                                     [upload.name for upload in series_uploads])
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                show_series(series, fields[series_selected], series_statistic,
+                            series_heat_base, series_cool_base, global_colorset)
+                return
+
+    ####################################################################################
+    # Comparison page
+    ####################################################################################
+    if comparison_mode:
+        sources = [(upload.name, upload.getvalue()) for upload in comparison_uploads] + \
+            [(name, library[name]) for name in comparison_library]
+        if len(sources) < 2:
+            st.warning('Upload or select at least two EPW files to compare them.')
+        else:
+            epws = list(figure_executor.map(load_epw, [source for _, source in sources]))
+            comparison = compare(epws, unique_names([name for name, _ in sources]))
+            show_comparison(
+                comparison, fields[comparison_selected], comparison_total,
+                comparison_heat_base, comparison_cool_base, comparison_temperature_range,
+                comparison_humidity_range, global_colorset)
+            return
 
     ####################################################################################
     # Main page
     ####################################################################################
+    # the figures are created in the background and are added to their placeholders
+    # once they are all submitted
+    figure_jobs = []
+    image_job, image_placeholder = None, None
     with st.container():
         st.title('Weather Data Visualization App!')
 
@@ -220,50 +510,86 @@ def main():
         st.header(f'{global_epw.location.city}, {global_epw.location.country}')
 
         # image and map ################################################################
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.text(
-                f'Latitude: {global_epw.location.latitude}, Longitude: {global_epw.location.longitude},'
-                f' Timezone: {global_epw.location.time_zone}, source: {global_epw.location.source}')
-
-            with st.expander('Load imge from local drive'):
-                local_image = st.file_uploader(
-                    'Select an image', type=['png', 'jpg', 'jpeg'])
-
-            get_image(global_epw.location.latitude, global_epw.location.longitude)
-
-            if local_image:
-                st.image(local_image)
-            else:
-                try:
-                    st.image('./assets/image/000001.jpg')
-                except FileNotFoundError:
-                    pass
-
-        with col2:
-            location = pd.DataFrame(
-                [np.array([global_epw.location.latitude,
-                          global_epw.location.longitude], dtype=np.float64)],
-                columns=['latitude', 'longitude']
-            )
-            st.map(location, use_container_width=True)
+        if 'Location' in sections:
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.text(
+                    f'Latitude: {global_epw.location.latitude},'
+                    f' Longitude: {global_epw.location.longitude},'
+                    f' Timezone: {global_epw.location.time_zone},'
+                    f' source: {global_epw.location.source}')
+
+                with st.expander('Load imge from local drive'):
+                    local_image = st.file_uploader(
+                        'Select an image', type=['png', 'jpg', 'jpeg'])
+
+                if local_image:
+                    st.image(local_image)
+                else:
+                    # the image is downloaded in the background and shown when ready
+                    image_placeholder = st.empty()
+                    image_job = request_image(
+                        global_epw.location.latitude, global_epw.location.longitude)
+                    if image_job.done():
+                        show_image(image_job, image_placeholder)
+                    else:
+                        image_placeholder.caption('Looking for an image of the city...')
+
+            with col2:
+                location = pd.DataFrame(
+                    [np.array([global_epw.location.latitude,
+                              global_epw.location.longitude], dtype=np.float64)],
+                    columns=['latitude', 'longitude']
+                )
+                st.map(location, use_container_width=True)
+
+        # Climate summary ###############################################################
+        if 'Climate summary' in sections:
+            st.header('Climate Summary')
+            st.markdown('Percentiles of the hourly values of each month and the whole'
+                        ' year. The 0.4%, 1% and 2% values are exceeded by the hours'
+                        ' below them and the 99% and 99.6% values by the hours above them'
+                        ' which are commonly used as heating and cooling design'
+                        ' conditions.')
+            summary = climate_summary(global_epw)
+            percentiles = summary.percentile_table()
+            design_conditions = summary.design_conditions()
+            weeks = summary.weeks()
+            st.dataframe(percentiles.loc[[field_label(fields[summary_selected])]]
+                         .set_index('Period'))
+
+            st.markdown('Design conditions of the dry bulb temperature with the mean'
+                        ' values of other variables during the same hours.')
+            st.dataframe(design_conditions)
+
+            st.markdown('Extreme and typical weeks of each season based on the daily'
+                        ' average dry bulb temperature.')
+            st.dataframe(weeks)
+
+            city = global_epw.location.city
+            for label, table, name in (
+                    ('percentiles', percentiles, 'percentiles'),
+                    ('design conditions', design_conditions, 'design_conditions'),
+                    ('weeks', weeks, 'weeks')):
+                st.download_button(
+                    f'Download {label} as CSV', table.to_csv().encode('utf-8'),
+                    file_name=f'{name}_{city}.csv', mime='text/csv',
+                    key=f'summary_{name}')
 
         # Diurnal average chart from hourly data ########################################
-        with st.container():
+        if 'Diurnal average chart' in sections:
             st.header('Diurnal average chart')
             st.markdown(
                 'A chart showing how an average day looks like in this weather each month.')
 
-            diurnal_average_chart_figure = get_diurnal_average_chart_figure(
-                global_epw, global_colorset, diurnal_average_chart_switch)
-
-            st.plotly_chart(diurnal_average_chart_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'Diurnal chart_{global_epw.location.city}'))
+            figure_jobs.append(submit_figure(
+                get_diurnal_average_chart_figure, global_epw, global_colorset,
+                diurnal_average_chart_switch,
+                title=f'Diurnal chart_{global_epw.location.city}'))
 
         # Hourly data ##################################################################
-        with st.container():
+        if 'Hourly data' in sections:
             st.header('visualize hourly data')
             st.markdown(
                 'Select an environmental variable from the EPW weatherfile to visualize.'
@@ -277,64 +603,58 @@ def main():
                 ' data you are visualizing and the legend. By default, the chart uses the'
                 ' minimum and maximum values of the data to set the bounds.')
 
-            hourly_data_figure = get_hourly_data_figure(
-                hourly_data, global_colorset, hourly_data_conditional_statement,
-                hourly_data_min, hourly_data_max, hourly_data_st_month, hourly_data_st_day,
+            figure_jobs.append(submit_figure(
+                get_hourly_data_figure, global_epw, fields[hourly_selected],
+                global_colorset, hourly_data_conditional_statement, hourly_data_min,
+                hourly_data_max, hourly_data_st_month, hourly_data_st_day,
                 hourly_data_st_hour, hourly_data_end_month, hourly_data_end_day,
-                hourly_data_end_hour)
-
-            if isinstance(hourly_data_figure, str):
-                st.error(hourly_data_figure)
-            else:
-                st.plotly_chart(hourly_data_figure, use_container_width=True,
-                                config=get_figure_config(f'{hourly_data.header.data_type}'))
+                hourly_data_end_hour,
+                title=f'{hourly_selected}'))
 
         # Bar Chart ####################################################################
-        with st.container():
+        if 'Bar chart' in sections:
             st.header('Bar chart')
             st.markdown(
                 'Select one or more environmental variable from the EPW weatherfile to'
                 ' visualize side by side on a monthly or daily bar chart. By default, '
                 ' "Dry bulb temperature" and "relative humidity" are selected.')
 
-            bar_chart_figure = get_bar_chart_figure(
-                fields, global_epw, bar_chart_selection, bar_chart_data_type,
-                bar_chart_switch, bar_chart_stack, global_colorset)
-
-            st.plotly_chart(bar_chart_figure, use_container_width=True,
-                            config=get_figure_config(f'{bar_chart_data_type}'))
+            figure_jobs.append(submit_figure(
+                get_bar_chart_figure, fields, global_epw, bar_chart_selection,
+                bar_chart_data_type, bar_chart_switch, bar_chart_stack, global_colorset,
+                title=f'{bar_chart_data_type}'))
 
         # Hourly line chart ############################################################
-        with st.container():
+        if 'Hourly line chart' in sections:
             st.header('Hourly line chart')
             st.markdown(
                 'Select an environmental variable from the EPW weatherfile to visualize on a'
                 ' line chart. By default, the hourly data is set to "relative humidity".')
 
-            hourly_line_chart_figure = get_hourly_line_chart_figure(
-                hourly_line_chart_data, hourly_line_chart_switch, global_colorset)
-
-            st.plotly_chart(hourly_line_chart_figure, use_container_width=True,
-                            config=get_figure_config(f'{hourly_line_chart_selected}'))
+            figure_jobs.append(submit_figure(
+                get_hourly_line_chart_figure, global_epw,
+                fields[hourly_line_chart_selected], hourly_line_chart_switch,
+                global_colorset,
+                None if hourly_line_chart_points == 'All' else hourly_line_chart_points,
+                hourly_line_chart_webgl, *hourly_line_chart_months,
+                title=f'{hourly_line_chart_selected}'))
 
         # Diurnal average chart from hourly data ########################################
-        with st.container():
+        if 'Diurnal average chart (hourly data)' in sections:
             st.header('Diurnal average chart (hourly data)')
             st.markdown(
                 'Select an environmental variable from the EPW weatherfile to visualize on a'
                 ' diurnal average chart. By default, the hourly data is set to "Direct normal'
                 ' radiation".')
 
-            per_hour_line_chart_figure = get_hourly_diurnal_average_chart_figure(
-                diurnal_average_chart_hourly_data, diurnal_average_chart_hourly_switch,
-                global_colorset)
-
-            st.plotly_chart(per_hour_line_chart_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'{diurnal_average_chart_hourly_data.header.data_type.name}'))
+            figure_jobs.append(submit_figure(
+                get_hourly_diurnal_average_chart_figure, global_epw,
+                fields[diurnal_average_chart_hourly_selected],
+                diurnal_average_chart_hourly_switch, global_colorset,
+                title=f'{diurnal_average_chart_hourly_selected}'))
 
         # Daily chart ###################################################################
-        with st.container():
+        if 'Daily chart' in sections:
 
             st.header('Daily chart')
             st.markdown(
@@ -342,15 +662,13 @@ def main():
                 ' daily chart. This chart shows average daily values. By default, the hourly'
                 ' data is set to "Total sky cover".')
 
-            daily_chart_figure = get_daily_chart_figure(
-                daily_chart_data, daily_chart_switch, global_colorset)
-
-            st.plotly_chart(daily_chart_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'{daily_chart_data.header.data_type.name}'))
+            figure_jobs.append(submit_figure(
+                get_daily_chart_figure, global_epw, fields[daily_chart_selected],
+                daily_chart_switch, global_colorset,
+                title=f'{daily_chart_selected}'))
 
         # Sunpath #######################################################################
-        with st.container():
+        if 'Sunpath' in sections:
 
             st.header('Sunpath')
             st.markdown('Generate a sunpath using EPW location. Additionally, you can'
@@ -358,15 +676,13 @@ def main():
                         ' on the sunpath.'
                         )
 
-            sunpath_figure = get_sunpath_figure(
-                sunpath_radio, global_colorset, global_epw, sunpath_switch, sunpath_data)
-
-            st.plotly_chart(sunpath_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'Sunpath_{global_epw.location.city}'))
+            figure_jobs.append(submit_figure(
+                get_sunpath_figure, sunpath_radio, global_colorset, global_epw,
+                sunpath_switch, sunpath_field,
+                title=f'Sunpath_{global_epw.location.city}'))
 
         # Degree days ###################################################################
-        with st.container():
+        if 'Degree days' in sections:
 
             st.header('Degree Days')
             st.markdown('Calculates heating and cooling degree-days.'
@@ -379,33 +695,36 @@ def main():
                         ' heating will be deployed and above the cooling base temperature'
                         ' cooling will be deployed.')
 
-            degree_days_figure, hourly_heat, hourly_cool = get_degree_days_figure(
-                global_epw.dry_bulb_temperature, degree_days_heat_base,
+            figure_jobs.append(submit_figure(
+                get_degree_days_figure, global_epw, degree_days_heat_base,
                 degree_days_cool_base, degree_days_stack, degree_days_switch,
-                global_colorset)
-
-            st.plotly_chart(degree_days_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'Degree days_{global_epw.location.city}'))
-            st.text(
-                f'Total Cooling degree days are {round(hourly_cool.total)}'
-                f' and total heating degree days {round(hourly_heat.total)}.')
+                global_colorset,
+                title=f'Degree days_{global_epw.location.city}',
+                caption=lambda total_heat, total_cool: (
+                    f'Total Cooling degree days are {round(total_cool)}'
+                    f' and total heating degree days {round(total_heat)}.')))
+
+            st.markdown('The annual degree-days for a range of base temperatures show how'
+                        ' sensitive the results are to the selected base temperatures.'
+                        ' The markers show the selected base temperatures.')
+            figure_jobs.append(submit_figure(
+                get_degree_days_sensitivity_figure, global_epw, degree_days_heat_base,
+                degree_days_cool_base, degree_days_switch, global_colorset,
+                title=f'Degree days sensitivity_{global_epw.location.city}'))
 
         # Windrose ######################################################################
-        with st.container():
+        if 'Windrose' in sections:
             st.header('Windrose')
             st.markdown('Generate a windrose diagram')
 
-            windrose_figure = get_windrose_figure(
-                windrose_st_month, windrose_st_day, windrose_st_hour, windrose_end_month,
-                windrose_end_day, windrose_end_hour, global_epw, global_colorset)
-
-            st.plotly_chart(windrose_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'Windrose_{global_epw.location.city}'))
+            figure_jobs.append(submit_figure(
+                get_windrose_figure, windrose_st_month, windrose_st_day,
+                windrose_st_hour, windrose_end_month, windrose_end_day,
+                windrose_end_hour, global_epw, global_colorset,
+                title=f'Windrose_{global_epw.location.city}'))
 
         # Psychrometric chart ###########################################################
-        with st.container():
+        if 'Psychrometric chart' in sections:
             st.header('Psychrometric Chart')
             st.markdown(
                 'Generate a psychrometric chart for the dry bulb temperature and relative'
@@ -415,13 +734,17 @@ def main():
                 ' By default, the psychrometric shows the hours in year when a certain'
                 ' dry bulb temperature and relative humidity occurs.')
 
-            psy_chart_figure = get_psy_chart_figure(
-                global_epw, global_colorset, psy_selected_strategy, psy_load_data,
-                psy_draw_polygons, psy_data)
+            figure_jobs.append(submit_figure(
+                get_binned_psy_chart_figure if psy_binned else get_psy_chart_figure,
+                global_epw, global_colorset,
+                psy_selected_strategy, psy_load_data, psy_draw_polygons, psy_field,
+                title=f'Psychrometric_chart_{global_epw.location.city}'))
+
+    # show the figures as soon as each one of them is ready
+    show_figures(figure_jobs)
 
-            st.plotly_chart(psy_chart_figure, use_container_width=True,
-                            config=get_figure_config(
-                                f'Psychrometric_chart_{global_epw.location.city}'))
+    if image_job is not None and not image_job.done():
+        show_image(image_job, image_placeholder)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+"""Fetch an image of the city of an EPW file in the background.
+
+The images are saved on disk for each location so they are shared between the
+sessions and the app only looks for an image of a location once. The locations are
+rounded to LOCATION_DIGITS decimals which is about 1 km so the EPW files of the same
+city share the same image.
+
+The images are found by a provider. GoogleImageProvider finds the name of the city
+with Nominatim and downloads the first image from Google Images.
+LocalDirectoryProvider reads the images from a folder for the deployments that are
+offline. Set the IMAGE_FOLDER_ENV environment variable to the folder to use it or
+call set_provider with any other provider.
+"""
+
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+CACHE_FOLDER = pathlib.Path('./data/images')
+IMAGE_FOLDER_ENV = 'EPW_VIZ_IMAGE_FOLDER'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# number of decimals of the latitude and the longitude in the cache key
+LOCATION_DIGITS = 2
+# seconds to wait before looking for an image of a location again if none was found
+RETRY_INTERVAL = 60 * 60
+
+# the images are downloaded by a separate worker so they never wait for the figures
+_executor = ThreadPoolExecutor(max_workers=2)
+_lock = threading.Lock()
+_pending: Dict[str, Future] = {}
+_failed: Dict[str, float] = {}
+
+
+class ImageProvider:
+    """Base class for the providers of the city images."""
+
+    def fetch(self, latitude: float, longitude: float,
+              folder: pathlib.Path) -> Optional[pathlib.Path]:
+        """Save an image of a location in a folder.
+
+        Args:
+            latitude: Latitude of the location.
+            longitude: Longitude of the location.
+            folder: An empty folder to save the image in.
+
+        Returns:
+            Path to the image or None if no image was found.
+        """
+        raise NotImplementedError
+
+
+class GoogleImageProvider(ImageProvider):
+    """Download the first image of the city from Google Images.
+
+    Args:
+        user_agent: User agent for the Nominatim reverse geocoding service.
+    """
+
+    def __init__(self, user_agent: str = 'geoapiExercises'):
+        self.user_agent = user_agent
+
+    def fetch(self, latitude: float, longitude: float,
+              folder: pathlib.Path) -> Optional[pathlib.Path]:
+        # imported here so the offline deployments don't need these packages
+        from geopy.geocoders import Nominatim
+        from icrawler.builtin import GoogleImageCrawler
+
+        # find city name and create a keyword for search
+        geolocator = Nominatim(user_agent=self.user_agent)
+        location = geolocator.reverse(f'{latitude},{longitude}', language='en')
+        if location is None:
+            return None
+        city = location.raw.get('address', {}).get('city', '')
+        if not city:
+            return None
+
+        filters = dict(size='medium', type='photo', license='commercial,modify')
+        google_crawler = GoogleImageCrawler(storage={'root_dir': str(folder)})
+        google_crawler.crawl(keyword=f'{city} city image', max_num=1, filters=filters)
+        return _first_image(folder)
+
+
+class LocalDirectoryProvider(ImageProvider):
+    """Copy the images of the locations from a folder.
+
+    The image of a location is named after its cache key such as 42.36_-71.01.jpg.
+    If there is no image for a location, an image named default is used.
+
+    Args:
+        folder: Path to the folder of the images.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = pathlib.Path(folder)
+
+    def fetch(self, latitude: float, longitude: float,
+              folder: pathlib.Path) -> Optional[pathlib.Path]:
+        for name in (location_key(latitude, longitude), 'default'):
+            for extension in IMAGE_EXTENSIONS:
+                source = self.folder.joinpath(f'{name}{extension}')
+                if source.is_file():
+                    return pathlib.Path(shutil.copy(source, folder))
+        return None
+
+
+def _default_provider() -> ImageProvider:
+    folder = os.environ.get(IMAGE_FOLDER_ENV)
+    if folder:
+        return LocalDirectoryProvider(folder)
+    return GoogleImageProvider()
+
+
+_provider = _default_provider()
+
+
+def set_provider(provider: ImageProvider) -> None:
+    """Set the provider of the images that are not in the cache yet."""
+    global _provider
+    with _lock:
+        _provider = provider
+        _failed.clear()
+
+
+def location_key(latitude: float, longitude: float) -> str:
+    """Create the cache key of a location from its rounded latitude and longitude."""
+    # adding 0.0 turns -0.0 into 0.0
+    latitude = round(float(latitude), LOCATION_DIGITS) + 0.0
+    longitude = round(float(longitude), LOCATION_DIGITS) + 0.0
+    return f'{latitude:.{LOCATION_DIGITS}f}_{longitude:.{LOCATION_DIGITS}f}'
+
+
+def _first_image(folder: pathlib.Path) -> Optional[pathlib.Path]:
+    images = sorted(
+        path for path in folder.iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    return images[0] if images else None
+
+
+def cached_image(latitude: float, longitude: float) -> Optional[pathlib.Path]:
+    """Get the path to the cached image of a location or None if it is not cached."""
+    key = location_key(latitude, longitude)
+    for extension in IMAGE_EXTENSIONS:
+        path = CACHE_FOLDER.joinpath(f'{key}{extension}')
+        if path.is_file():
+            return path
+    return None
+
+
+def _fetch(provider: ImageProvider, latitude: float, longitude: float,
+           key: str) -> Optional[pathlib.Path]:
+    CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+    # each fetch uses its own folder so the sessions never remove each other's images
+    with tempfile.TemporaryDirectory(dir=CACHE_FOLDER) as temp_folder:
+        try:
+            image = provider.fetch(latitude, longitude, pathlib.Path(temp_folder))
+        except Exception:
+            image = None
+        if image is None or not image.is_file():
+            with _lock:
+                _failed[key] = time.time()
+            return None
+        path = CACHE_FOLDER.joinpath(f'{key}{image.suffix.lower()}')
+        os.replace(image, path)
+    return path
+
+
+def _done(path: Optional[pathlib.Path]) -> Future:
+    future = Future()
+    future.set_result(path)
+    return future
+
+
+def request_image(latitude: float, longitude: float) -> Future:
+    """Get a future for the image of a location.
+
+    The future is already done if the image is in the cache or no image was found
+    in the last RETRY_INTERVAL seconds. Otherwise, the image is fetched in the
+    background and the same future is returned to all the sessions that ask for the
+    location until it is done.
+
+    Returns:
+        A future for the path to the image or None if there is no image.
+    """
+    path = cached_image(latitude, longitude)
+    if path is not None:
+        return _done(path)
+
+    key = location_key(latitude, longitude)
+    with _lock:
+        if time.time() - _failed.get(key, 0) < RETRY_INTERVAL:
+            return _done(None)
+        future = _pending.get(key)
+        if future is None:
+            future = _executor.submit(_fetch, _provider, latitude, longitude, key)
+            _pending[key] = future
+            future.add_done_callback(lambda _: _pending.pop(key, None))
+        return future
@@ -0,0 +1,239 @@
+"""Tabular climate summary of an EPW file.
+
+The summary has the monthly and the annual percentiles of every field, the design
+conditions of the dry bulb temperature with the mean coincident values of other
+fields and the extreme and the typical weeks of each season.
+
+The monthly percentiles of all the fields are calculated with a single sort of an
+array with the shape of (fields, months, hours of the longest month) where the
+shorter months are padded with NaN. The annual percentiles are found with a single
+partition of the hourly values around the ranks of the percentiles. The percentiles
+are interpolated linearly between the closest ranks in the same way as np.percentile.
+
+The months are the calendar months of the hours. The summaries are cached by the
+SHA-256 of the EPW file.
+"""
+
+import datetime
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ladybug.analysisperiod import AnalysisPeriod
+
+from comparison import field_label
+from degree_time import month_starts
+from epw_data import EPWData
+
+PERCENTILES = (0.4, 1, 2, 99, 99.6)
+# the same fields as the other charts of the app
+SUMMARY_FIELDS = tuple(range(6, 34))
+DRY_BULB_TEMPERATURE = 6
+# the fields that are averaged over the hours of the design conditions
+COINCIDENT_FIELDS = (7, 8, 13, 21)
+# the months of each season in the northern hemisphere
+SEASONS = (
+    ('Winter', (12, 1, 2)), ('Spring', (3, 4, 5)), ('Summer', (6, 7, 8)),
+    ('Autumn', (9, 10, 11))
+)
+WEEK_DAYS = 7
+# number of summaries to keep in memory
+MAX_CACHED_SUMMARIES = 8
+
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()
+
+
+def _ranks(percentiles, counts: np.ndarray):
+    """Get the ranks around the percentiles of groups with counts values.
+
+    Returns:
+        A tuple with the lower ranks, the upper ranks and the fractions between them
+        with the shape of (groups, percentiles).
+    """
+    rank = np.asarray(percentiles, dtype=np.float64)[None, :] / 100 * \
+        (np.asarray(counts)[:, None] - 1)
+    low = np.floor(rank).astype(np.int64)
+    high = np.minimum(low + 1, np.asarray(counts)[:, None] - 1)
+    return low, high, rank - low
+
+
+def monthly_percentiles(values: np.ndarray, starts: np.ndarray,
+                        percentiles=PERCENTILES) -> np.ndarray:
+    """Calculate the percentiles of hourly values for each month.
+
+    Args:
+        values: Hourly values with the shape of (fields, hours).
+        starts: Index of the first hour of each month.
+        percentiles: A list of percentiles between 0 and 100.
+
+    Returns:
+        An array with the shape of (fields, months, percentiles).
+    """
+    counts = np.diff(np.append(starts, values.shape[1]))
+    month = np.repeat(np.arange(len(starts)), counts)
+    position = np.arange(values.shape[1]) - starts[month]
+    padded = np.full((values.shape[0], len(starts), counts.max()), np.nan)
+    padded[:, month, position] = values
+    # NaN is sorted to the end so the values of each month stay at the start
+    padded.sort(axis=2)
+    low, high, fraction = _ranks(percentiles, counts)
+    months = np.arange(len(starts))[:, None]
+    low_values, high_values = padded[:, months, low], padded[:, months, high]
+    return low_values + (high_values - low_values) * fraction
+
+
+def annual_percentiles(values: np.ndarray, percentiles=PERCENTILES) -> np.ndarray:
+    """Calculate the percentiles of hourly values for the whole year.
+
+    Returns:
+        An array with the shape of (fields, percentiles).
+    """
+    low, high, fraction = _ranks(percentiles, [values.shape[1]])
+    partitioned = np.partition(values, np.union1d(low, high), axis=1)
+    low_values, high_values = partitioned[:, low[0]], partitioned[:, high[0]]
+    return low_values + (high_values - low_values) * fraction[0]
+
+
+def weekly_averages(daily: np.ndarray) -> np.ndarray:
+    """Get the average of daily values for the WEEK_DAYS days that start on each day.
+
+    Returns:
+        An array with one value for each day that starts a whole week in the year.
+    """
+    total = np.concatenate([[0], np.cumsum(daily)])
+    return (total[WEEK_DAYS:] - total[:-WEEK_DAYS]) / WEEK_DAYS
+
+
+class ClimateSummary:
+    """Percentiles, design conditions and typical and extreme weeks of an EPW file.
+
+    Args:
+        epw: An EPWData object.
+    """
+
+    def __init__(self, epw: EPWData):
+        self.is_leap_year = epw.is_leap_year
+        self.latitude = epw.location.latitude
+        values = np.stack([epw.collection_values(field) for field in SUMMARY_FIELDS])
+        self.hours = values.shape[1]
+        self.starts = month_starts(self.is_leap_year)
+
+        self.monthly = monthly_percentiles(values, self.starts)
+        self.annual = annual_percentiles(values)
+
+        # mean coincident values for the hours at or beyond each percentile of the
+        # dry bulb temperature
+        temperature = values[SUMMARY_FIELDS.index(DRY_BULB_TEMPERATURE)]
+        thresholds = self.annual[SUMMARY_FIELDS.index(DRY_BULB_TEMPERATURE)]
+        below = np.array(PERCENTILES) < 50
+        hours = np.where(below[:, None], temperature <= thresholds[:, None],
+                         temperature >= thresholds[:, None])
+        coincident = values[[SUMMARY_FIELDS.index(f) for f in COINCIDENT_FIELDS]]
+        self.coincident_hours = hours.sum(axis=1)
+        self.coincident = hours @ coincident.T / self.coincident_hours[:, None]
+
+        self.daily_temperature = temperature[:self.hours // 24 * 24] \
+            .reshape(-1, 24).mean(axis=1)
+
+    def percentile_table(self, field: int = None) -> pd.DataFrame:
+        """Create a table of the monthly and the annual percentiles.
+
+        Args:
+            field: An EPW field number. Set to None to create a table for all the
+                SUMMARY_FIELDS.
+        """
+        fields = SUMMARY_FIELDS if field is None else (field,)
+        periods = list(AnalysisPeriod.MONTHNAMES.values()) + ['Annual']
+        rows = []
+        for fld in fields:
+            index = SUMMARY_FIELDS.index(fld)
+            values = np.vstack([self.monthly[index], self.annual[index]]).round(2)
+            for period, row in zip(periods, values):
+                rows.append([field_label(fld), period] + row.tolist())
+        table = pd.DataFrame(
+            rows, columns=['Field', 'Period'] + [f'{p}%' for p in PERCENTILES])
+        if field is not None:
+            table = table.drop(columns='Field')
+        return table.set_index(table.columns[0])
+
+    def design_conditions(self) -> pd.DataFrame:
+        """Create a table of the annual percentiles of the dry bulb temperature with
+        the mean of the COINCIDENT_FIELDS over the hours at or beyond them.
+
+        The hours below 50% are the hours at or below the percentile and the hours
+        above 50% are the hours at or above the percentile.
+        """
+        table = pd.DataFrame({
+            field_label(DRY_BULB_TEMPERATURE):
+                self.annual[SUMMARY_FIELDS.index(DRY_BULB_TEMPERATURE)].round(2),
+            'Hours': self.coincident_hours
+        }, index=pd.Index([f'{p}%' for p in PERCENTILES], name='Percentile'))
+        for field, values in zip(COINCIDENT_FIELDS, self.coincident.T):
+            table[f'Mean coincident {field_label(field)}'] = values.round(2)
+        return table
+
+    def _date(self, day: int) -> str:
+        year = 2016 if self.is_leap_year else 2017
+        return (datetime.date(year, 1, 1) + datetime.timedelta(days=int(day))) \
+            .strftime('%d %b')
+
+    def weeks(self) -> pd.DataFrame:
+        """Create a table of the extreme and the typical weeks.
+
+        The extreme hot week is the week of the summer with the highest average dry
+        bulb temperature and the extreme cold week is the week of the winter with the
+        lowest one. The typical week of each season is the week with the average
+        closest to the average of the season. The weeks don't go over the end of a
+        season. The seasons of the southern hemisphere are shifted by 6 months.
+        """
+        days = len(self.daily_temperature)
+        day_months = np.searchsorted(self.starts // 24, np.arange(days), side='right')
+        if self.latitude < 0:
+            day_months = (day_months + 5) % 12 + 1
+        weekly = weekly_averages(self.daily_temperature)
+
+        rows = []
+        for season, months in SEASONS:
+            in_season = np.isin(day_months, months)
+            # the weeks that start and end in the season
+            starts = np.flatnonzero(in_season[:-WEEK_DAYS + 1] & in_season[WEEK_DAYS - 1:])
+            if not len(starts):
+                continue
+            average = self.daily_temperature[in_season].mean()
+            selected = [('Typical', starts[np.argmin(np.abs(weekly[starts] - average))])]
+            if season == 'Summer':
+                selected.append(('Extreme hot', starts[np.argmax(weekly[starts])]))
+            elif season == 'Winter':
+                selected.append(('Extreme cold', starts[np.argmin(weekly[starts])]))
+            for period, start in selected:
+                rows.append([
+                    f'{period} {season.lower()} week', self._date(start),
+                    self._date(start + WEEK_DAYS - 1), round(float(weekly[start]), 2),
+                    round(float(average), 2)
+                ])
+        label = field_label(DRY_BULB_TEMPERATURE)
+        return pd.DataFrame(
+            rows, columns=['Week', 'Start', 'End', f'Average {label}',
+                           f'Season average {label}']
+        ).set_index('Week')
+
+
+def climate_summary(epw: EPWData) -> ClimateSummary:
+    """Get the ClimateSummary of an EPW file.
+
+    The summaries are cached by the SHA-256 of the EPW file.
+    """
+    with _summaries_lock:
+        if epw.sha256 in _summaries:
+            _summaries.move_to_end(epw.sha256)
+            return _summaries[epw.sha256]
+
+    summary = ClimateSummary(epw)
+    with _summaries_lock:
+        _summaries[epw.sha256] = summary
+        while len(_summaries) > MAX_CACHED_SUMMARIES:
+            _summaries.popitem(last=False)
+    return summary
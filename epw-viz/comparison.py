@@ -0,0 +1,208 @@
+"""Compare several EPW files with vectorized statistics.
+
+The hourly values of all the files are stacked in a single array with the shape of
+(files, fields, 8760) so every statistic is calculated for all the files in one step
+instead of going through the charts of each file. February 29 is removed from the
+leap years so the hours of all the files line up.
+
+The months are the calendar months of the hours. They are not grouped in the same way
+as the monthly values of ladybug which add the first hour of the next month to each
+month.
+"""
+
+import hashlib
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ladybug.epw import EPWFields
+
+from degree_time import month_starts
+from epw_data import EPWData
+
+# folder of the EPW files that can be compared without uploading them
+LIBRARY_FOLDER = pathlib.Path(os.environ.get('EPW_VIZ_LIBRARY', './assets'))
+HOURS = 8760
+# index of the first hour of February 29 in a leap year
+LEAP_DAY_START = 59 * 24
+# number of comparisons to keep in memory
+MAX_CACHED_COMPARISONS = 4
+
+DRY_BULB_TEMPERATURE = 6
+RELATIVE_HUMIDITY = 8
+GLOBAL_HORIZONTAL_RADIATION = 13
+WIND_SPEED = 21
+
+_comparisons = OrderedDict()
+_comparisons_lock = threading.Lock()
+
+
+def library_files() -> List[pathlib.Path]:
+    """Get the EPW files in the library folder."""
+    return sorted(LIBRARY_FOLDER.glob('*.epw'))
+
+
+def year_values(epw: EPWData) -> np.ndarray:
+    """Get the hourly values of an EPW file for a year of 8760 hours.
+
+    The values are rounded in the same way as EPWData.collection_values.
+
+    Returns:
+        An array with the shape of (fields, 8760).
+    """
+    values = epw.values
+    if values.shape[1] > HOURS:
+        values = np.delete(values, np.s_[LEAP_DAY_START:LEAP_DAY_START + 24], axis=1)
+    return values[:, :HOURS].astype(np.float64).round(4)
+
+
+class Comparison:
+    """Hourly values of several EPW files in a single array.
+
+    Args:
+        epws: A list of EPWData objects.
+        names: A name for each EPW file.
+    """
+
+    def __init__(self, epws: Sequence[EPWData], names: Sequence[str]):
+        self.sha256 = _comparison_key(epws, names)
+        self.names = list(names)
+        self.locations = [epw.location for epw in epws]
+        self.values = np.stack([year_values(epw) for epw in epws])
+        self.values.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __str__(self) -> str:
+        # the key of the files and their names is also used in the keys of the figures
+        return self.sha256
+
+    def field(self, field: int) -> np.ndarray:
+        """Get the hourly values of a field with the shape of (files, 8760)."""
+        return self.values[:, field]
+
+    def monthly(self, field: int, total: bool = False) -> np.ndarray:
+        """Get the monthly average or the monthly total of a field.
+
+        Returns:
+            An array with the shape of (files, 12).
+        """
+        values = self.field(field)
+        starts = month_starts()
+        totals = np.add.reduceat(values, starts, axis=1)
+        if total:
+            return totals
+        return totals / np.diff(np.append(starts, HOURS))
+
+    def diurnal(self, field: int) -> np.ndarray:
+        """Get the average value of a field for each hour of the day.
+
+        Returns:
+            An array with the shape of (files, 24).
+        """
+        return self.field(field).reshape(len(self), -1, 24).mean(axis=1)
+
+    def percentiles(self, field: int, percentiles: Sequence[float]) -> np.ndarray:
+        """Get the percentiles of the hourly values of a field.
+
+        Returns:
+            An array with the shape of (files, percentiles).
+        """
+        return np.percentile(self.field(field), percentiles, axis=1).T
+
+    def degree_days(self, heat_base: float,
+                    cool_base: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the annual heating and cooling degree-days in degC-days.
+
+        Returns:
+            A tuple with the heating and the cooling degree-days with the shape of
+            (files,).
+        """
+        temperature = self.field(DRY_BULB_TEMPERATURE)
+        heating = np.maximum(heat_base - temperature, 0).sum(axis=1) / 24
+        cooling = np.maximum(temperature - cool_base, 0).sum(axis=1) / 24
+        return heating, cooling
+
+    def comfort_hours(self, temperature_range: Tuple[float, float],
+                      humidity_range: Tuple[float, float]) -> np.ndarray:
+        """Get the number of hours with the dry bulb temperature and the relative
+        humidity in a range.
+
+        Returns:
+            An array with the shape of (files,).
+        """
+        temperature = self.field(DRY_BULB_TEMPERATURE)
+        humidity = self.field(RELATIVE_HUMIDITY)
+        comfortable = (temperature >= temperature_range[0]) & \
+            (temperature <= temperature_range[1]) & \
+            (humidity >= humidity_range[0]) & (humidity <= humidity_range[1])
+        return comfortable.sum(axis=1)
+
+    def ranking(self, heat_base: float, cool_base: float,
+                temperature_range: Tuple[float, float],
+                humidity_range: Tuple[float, float]) -> pd.DataFrame:
+        """Create a table of the main statistics of the files.
+
+        The files are ranked by the number of comfortable hours.
+        """
+        temperature = self.percentiles(DRY_BULB_TEMPERATURE, [0.4, 50, 99.6])
+        heating, cooling = self.degree_days(heat_base, cool_base)
+        comfort = self.comfort_hours(temperature_range, humidity_range)
+        radiation = self.field(GLOBAL_HORIZONTAL_RADIATION).sum(axis=1) / 1000
+        table = pd.DataFrame({
+            'EPW file': self.names,
+            'Location': [f'{loc.city}, {loc.country}' for loc in self.locations],
+            'Comfortable hours': comfort,
+            'Comfortable hours (%)': (comfort / HOURS * 100).round(1),
+            'Heating degree days (degC-days)': heating.round(1),
+            'Cooling degree days (degC-days)': cooling.round(1),
+            'Mean dry bulb temperature (C)':
+                self.field(DRY_BULB_TEMPERATURE).mean(axis=1).round(1),
+            'Dry bulb temperature 0.4% (C)': temperature[:, 0].round(1),
+            'Median dry bulb temperature (C)': temperature[:, 1].round(1),
+            'Dry bulb temperature 99.6% (C)': temperature[:, 2].round(1),
+            'Global horizontal radiation (kWh/m2)': radiation.round(1),
+            'Mean wind speed (m/s)': self.field(WIND_SPEED).mean(axis=1).round(2)
+        })
+        table = table.sort_values('Comfortable hours', ascending=False, kind='stable')
+        table.index = pd.RangeIndex(1, len(table) + 1, name='Rank')
+        return table
+
+
+def field_label(field: int) -> str:
+    """Get the name and the unit of an EPW field."""
+    epw_field = EPWFields.field_by_number(field)
+    return f'{epw_field.name} ({epw_field.unit})'
+
+
+def _comparison_key(epws: Sequence[EPWData], names: Sequence[str]) -> str:
+    """Get the SHA-256 of the EPW files and their names."""
+    return hashlib.sha256(
+        '\n'.join(f'{epw.sha256}:{name}' for epw, name in zip(epws, names))
+        .encode('utf-8')
+    ).hexdigest()
+
+
+def compare(epws: Sequence[EPWData], names: Sequence[str]) -> Comparison:
+    """Get the Comparison of a list of EPW files.
+
+    The comparisons are cached by the SHA-256 of the files and their names.
+    """
+    key = _comparison_key(epws, names)
+    with _comparisons_lock:
+        if key in _comparisons:
+            _comparisons.move_to_end(key)
+            return _comparisons[key]
+
+    comparison = Comparison(epws, names)
+    with _comparisons_lock:
+        _comparisons[key] = comparison
+        while len(_comparisons) > MAX_CACHED_COMPARISONS:
+            _comparisons.popitem(last=False)
+    return comparison
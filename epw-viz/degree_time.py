@@ -0,0 +1,169 @@
+"""Heating and cooling degree-days for many base temperatures at once.
+
+ladybug calculates the degree-time by calling heating_degree_time or
+cooling_degree_time for each hour of the year. Here the hourly temperatures are
+broadcast against a vector of base temperatures and summed for each month so a
+(bases, months) table is calculated in one step.
+
+The table for BASE_TEMPERATURES is calculated once for each EPW file and is cached.
+Base temperatures in the table are looked up and other base temperatures are
+calculated on request.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from ladybug.analysisperiod import AnalysisPeriod
+from ladybug.datacollection import MonthlyCollection
+from ladybug.datatype.temperaturetime import HeatingDegreeTime, CoolingDegreeTime
+from ladybug.header import Header
+
+from epw_data import EPWData
+
+# the base temperatures of the cached table in Celsius
+BASE_TEMPERATURES = np.arange(0, 35.5, 0.5)
+
+# number of tables to keep in memory
+MAX_CACHED_TABLES = 16
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+_DAYS_EACH_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_DAYS_EACH_MONTH_LEAP = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def month_starts(is_leap_year: bool = False) -> np.ndarray:
+    """Get the index of the first hour of each month."""
+    days = _DAYS_EACH_MONTH_LEAP if is_leap_year else _DAYS_EACH_MONTH
+    return np.concatenate([[0], np.cumsum(days[:-1])]) * 24
+
+
+def degree_hours(temperature: np.ndarray, bases: np.ndarray,
+                 heating: bool = True) -> np.ndarray:
+    """Calculate the hourly degree-time for a list of base temperatures.
+
+    Args:
+        temperature: Hourly dry bulb temperature in Celsius.
+        bases: A list of base temperatures in Celsius.
+        heating: A boolean to calculate the heating degree-time. Set to False to
+            calculate the cooling degree-time.
+
+    Returns:
+        An array with the shape of (bases, hours) in degC-hours.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    bases = np.atleast_1d(np.asarray(bases, dtype=np.float64))
+    if heating:
+        difference = bases[:, None] - temperature[None, :]
+    else:
+        difference = temperature[None, :] - bases[:, None]
+    return np.maximum(difference, 0)
+
+
+def monthly_totals(hourly: np.ndarray, is_leap_year: bool = False) -> np.ndarray:
+    """Sum hourly values with the shape of (rows, hours) for each month.
+
+    The months are grouped in the same way as the total_monthly of ladybug's hourly
+    collections which adds the first hour of the next month to each month.
+
+    Returns:
+        An array with the shape of (rows, 12).
+    """
+    starts = month_starts(is_leap_year)
+    totals = np.add.reduceat(hourly, starts, axis=1)
+    totals[:, :-1] += hourly[:, starts[1:]]
+    return totals
+
+
+class DegreeDays(NamedTuple):
+    """Heating and cooling degree-days in degC-days for a list of base temperatures.
+
+    The monthly values have the shape of (bases, 12) and the annual values have the
+    shape of (bases,).
+    """
+    heating: np.ndarray
+    cooling: np.ndarray
+    annual_heating: np.ndarray
+    annual_cooling: np.ndarray
+
+
+def degree_days(temperature: np.ndarray, bases: np.ndarray,
+                is_leap_year: bool = False) -> DegreeDays:
+    """Calculate the monthly and the annual degree-days for a list of base temperatures.
+
+    Args:
+        temperature: Hourly dry bulb temperature in Celsius for a year.
+        bases: A list of base temperatures in Celsius.
+        is_leap_year: A boolean to indicate if the temperatures are for a leap year.
+
+    Returns:
+        A DegreeDays with read-only arrays.
+    """
+    values = []
+    for heating in (True, False):
+        hourly = degree_hours(temperature, bases, heating) / 24
+        values.append(monthly_totals(hourly, is_leap_year))
+        values.append(hourly.sum(axis=1))
+    for array in values:
+        array.flags.writeable = False
+    return DegreeDays(values[0], values[2], values[1], values[3])
+
+
+def degree_day_table(epw: EPWData) -> DegreeDays:
+    """Get the degree-days of an EPW file for BASE_TEMPERATURES.
+
+    The tables are cached by the SHA-256 of the EPW file.
+    """
+    with _tables_lock:
+        if epw.sha256 in _tables:
+            _tables.move_to_end(epw.sha256)
+            return _tables[epw.sha256]
+
+    table = degree_days(epw.collection_values(6), BASE_TEMPERATURES, epw.is_leap_year)
+    with _tables_lock:
+        _tables[epw.sha256] = table
+        while len(_tables) > MAX_CACHED_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def base_degree_days(epw: EPWData, base: float,
+                     heating: bool = True) -> Tuple[np.ndarray, float]:
+    """Get the degree-days of an EPW file for a base temperature.
+
+    The values are looked up in the cached table if the base temperature is in
+    BASE_TEMPERATURES.
+
+    Returns:
+        A tuple with the monthly degree-days and the annual degree-days.
+    """
+    index = np.flatnonzero(np.isclose(BASE_TEMPERATURES, base))
+    if len(index):
+        table, row = degree_day_table(epw), index[0]
+    else:
+        table, row = degree_days(epw.collection_values(6), [base], epw.is_leap_year), 0
+    if heating:
+        return table.heating[row], float(table.annual_heating[row])
+    return table.cooling[row], float(table.annual_cooling[row])
+
+
+def monthly_collection(epw: EPWData, values: np.ndarray,
+                       heating: bool = True) -> MonthlyCollection:
+    """Create a ladybug MonthlyCollection for monthly degree-days of an EPW file.
+
+    The collection is the same as the total_monthly of the hourly degree-time in
+    degC-days.
+    """
+    data_type = HeatingDegreeTime() if heating else CoolingDegreeTime()
+    metadata = epw.metadata
+    metadata['operation'] = 'total'
+    header = Header(
+        data_type=data_type, unit='degC-days',
+        analysis_period=AnalysisPeriod(is_leap_year=epw.is_leap_year),
+        metadata=metadata
+    )
+    return MonthlyCollection(header, [float(v) for v in values], list(range(1, 13)))
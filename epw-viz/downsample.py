@@ -0,0 +1,64 @@
+"""Downsample line charts with the largest triangle three buckets algorithm.
+
+The algorithm keeps the first and the last point and splits the rest of the points
+into equal buckets. From each bucket, it picks the point that makes the largest
+triangle with the point that was picked from the previous bucket and the average point
+of the next bucket. This keeps the peaks of the data which are lost by averaging or by
+picking every nth value.
+
+    Steinarsson, S. (2013). Downsampling time series for visual representation.
+"""
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Get the indices of the points to keep for a line chart.
+
+    Args:
+        x: Values of the x axis in ascending order.
+        y: Values of the y axis.
+        threshold: Number of points to keep.
+
+    Returns:
+        An array of indices. All the indices are returned if the threshold is larger
+        than the number of points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(y)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    # bucket edges for the points between the first and the last point
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    size = int((ends - starts).max())
+
+    # pad the buckets to a 2D array so the averages and the areas are calculated
+    # for a whole bucket at once
+    index = starts[:, None] + np.arange(size)[None, :]
+    valid = index < ends[:, None]
+    index = np.where(valid, index, ends[:, None] - 1)
+    bucket_x, bucket_y = x[index], y[index]
+    lengths = valid.sum(axis=1)
+    average_x = np.where(valid, bucket_x, 0).sum(axis=1) / lengths
+    average_y = np.where(valid, bucket_y, 0).sum(axis=1) / lengths
+    # the average point of the next bucket. The last bucket uses the last point.
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    a_x, a_y = x[0], y[0]
+    for i in range(len(starts)):
+        # twice the area of the triangle for every point in the bucket
+        area = np.abs(
+            (a_x - next_x[i]) * (bucket_y[i] - a_y) -
+            (a_x - bucket_x[i]) * (next_y[i] - a_y)
+        )
+        area[~valid[i]] = -1
+        j = index[i, area.argmax()]
+        selected[i + 1] = j
+        a_x, a_y = x[j], y[j]
+    return selected
@@ -0,0 +1,212 @@
+"""Load EPW files once and share the parsed data between the sessions of the app.
+
+An EPW file is parsed into a single float32 array with one row per EPW field and one
+column per hour. The parsed data is kept in a small LRU cache that is keyed by the
+SHA-256 of the file contents so uploading the same file again, from any session, reuses
+the parsed data and two different files from the same city never collide.
+
+The charts read the hourly values as read-only row views of this array. The ladybug
+data collections and the EPW object are only created when a chart needs them and they
+are cached with the parsed data.
+"""
+
+import hashlib
+import io
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ladybug.analysisperiod import AnalysisPeriod
+from ladybug.datacollection import HourlyContinuousCollection
+from ladybug.epw import EPW, EPWFields
+from ladybug.header import Header
+
+# number of fields in an EPW file
+FIELD_COUNT = 35
+# index of the uncertainty flags which is the only field that is not a number
+UNCERTAINTY_FIELD = 5
+# number of parsed EPW files to keep in memory
+MAX_CACHED_FILES = 8
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class EPWData:
+    """Parsed data of an EPW file.
+
+    Args:
+        contents: The contents of the EPW file as bytes.
+        sha256: The SHA-256 hex digest of the contents.
+    """
+
+    def __init__(self, contents: bytes, sha256: str):
+        self.sha256 = sha256
+        try:
+            text = contents.decode('utf-8')
+        except UnicodeDecodeError:
+            text = contents.decode('latin-1')
+        lines = text.split('\n')
+        self._header_lines = lines[:8]
+        self._lock = threading.Lock()
+        self._collections = {}
+        self._epw = None
+
+        # an EPW object with the location and the header but without the hourly data
+        self._shell = EPW(None)
+        self._shell._import_location(lines[0])
+        self._shell._import_header(lines[:8])
+
+        self.values, self._uncertainty_flags = self._parse_body(text.split('\n', 8)[8])
+        self.values.flags.writeable = False
+        self.is_leap_year = self._shell.is_leap_year or self.values.shape[1] == 8784
+        # the analysis period is shared by the collections so the datetimes are only
+        # created once
+        self._analysis_period = AnalysisPeriod(is_leap_year=self.is_leap_year)
+
+    @staticmethod
+    def _parse_body(body: str):
+        """Parse the hourly data.
+
+        Returns:
+            A tuple with an array with the shape of (fields, hours) and the list of
+            uncertainty flags which are set to NaN in the array.
+        """
+        df = pd.read_csv(
+            io.StringIO(body), header=None, usecols=range(FIELD_COUNT),
+            skip_blank_lines=True
+        )
+        flags = df[UNCERTAINTY_FIELD].astype(str).tolist()
+        df[UNCERTAINTY_FIELD] = np.nan
+        values = np.ascontiguousarray(df.to_numpy(dtype=np.float32).T)
+        # ladybug starts the point in time values at midnight. The last hour of the
+        # year is moved to the start in the same way as ladybug.epw.EPW.
+        for field in range(FIELD_COUNT):
+            if EPWFields.field_by_number(field).name.point_in_time:
+                values[field] = np.roll(values[field], 1)
+        return values, flags[-1:] + flags[:-1]
+
+    @property
+    def location(self):
+        """The ladybug Location of the EPW file."""
+        return self._shell.location
+
+    @property
+    def metadata(self) -> dict:
+        return dict(self._shell.metadata)
+
+    def column(self, field: int) -> np.ndarray:
+        """Get the hourly values of a field as a read-only view.
+
+        Note that the values are float32 so the integer codes of the present weather
+        codes field are not exact.
+        """
+        return self.values[field]
+
+    def collection_values(self, field: int) -> np.ndarray:
+        """Get the hourly values of a field as the same numbers as collection(field).
+
+        The values are rounded in the same way as the data collections so the
+        vectorized calculations give the same results as ladybug for the values on
+        the edges of the bins and the polygons.
+        """
+        return self.values[field].astype(np.float64).round(4)
+
+    def collection(self, field: int) -> HourlyContinuousCollection:
+        """Get the hourly values of a field as a ladybug data collection.
+
+        The collection is created once and is shared by all the charts. Do not
+        modify it in place.
+        """
+        with self._lock:
+            return self._collection(field)
+
+    def _collection(self, field: int) -> HourlyContinuousCollection:
+        if field in self._collections:
+            return self._collections[field]
+        epw_field = EPWFields.field_by_number(field)
+        header = Header(
+            data_type=epw_field.name, unit=epw_field.unit,
+            analysis_period=self._analysis_period,
+            metadata=self.metadata
+        )
+        if field == UNCERTAINTY_FIELD:
+            values = self._uncertainty_flags
+        elif epw_field.value_type == int:
+            values = np.rint(self.values[field]).astype(np.int64).tolist()
+        else:
+            values = self.collection_values(field).tolist()
+        collection = HourlyContinuousCollection(header, values)
+        # ladybug creates the datetimes on the first request by appending to a list.
+        # Create them before the collection is shared with the figure workers so they
+        # never see a partial list.
+        collection.datetimes
+        self._collections[field] = collection
+        return collection
+
+    @property
+    def epw(self) -> EPW:
+        """A ladybug EPW object that uses the cached data collections.
+
+        Only use it to read the data. The data collections are shared between the
+        sessions.
+        """
+        with self._lock:
+            if self._epw is None:
+                epw = EPW(None)
+                epw._import_location(self._header_lines[0])
+                epw._import_header(self._header_lines)
+                epw._is_leap_year = self.is_leap_year
+                epw._num_of_fields = FIELD_COUNT
+                epw._data = [self._collection(i) for i in range(FIELD_COUNT)]
+                epw._is_data_loaded = True
+                self._epw = epw
+            return self._epw
+
+
+def cached_epw(sha256: Optional[str]) -> Optional[EPWData]:
+    """Get a parsed EPW file from the cache by its SHA-256 or None if it is not cached.
+    """
+    with _cache_lock:
+        if sha256 in _cache:
+            _cache.move_to_end(sha256)
+            return _cache[sha256]
+    return None
+
+
+def load_epw(epw_file: Union[str, pathlib.Path, bytes]) -> EPWData:
+    """Load an EPW file from a path or from its contents.
+
+    The parsed data is cached by the SHA-256 of the file contents and the least
+    recently used files are removed from the cache once there are more than
+    MAX_CACHED_FILES files.
+
+    Args:
+        epw_file: Path to an EPW file or the contents of the file as bytes.
+
+    Returns:
+        An EPWData object.
+    """
+    if isinstance(epw_file, (bytes, bytearray)):
+        contents = bytes(epw_file)
+    else:
+        contents = pathlib.Path(epw_file).read_bytes()
+    sha256 = hashlib.sha256(contents).hexdigest()
+
+    with _cache_lock:
+        if sha256 in _cache:
+            _cache.move_to_end(sha256)
+            return _cache[sha256]
+
+    # parse outside of the lock so other files can be loaded at the same time
+    epw_data = EPWData(contents, sha256)
+    with _cache_lock:
+        epw_data = _cache.setdefault(sha256, epw_data)
+        _cache.move_to_end(sha256)
+        while len(_cache) > MAX_CACHED_FILES:
+            _cache.popitem(last=False)
+    return epw_data
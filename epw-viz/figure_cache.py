@@ -0,0 +1,215 @@
+"""Cache the figures of the app on disk as Plotly JSON.
+
+The figures are keyed by the name and the source code of the function that creates
+them, the SHA-256 of the EPW file and the rest of the inputs. The keys also include a
+version of the cache which is the hash of the modules of the app and the versions of
+the packages that create the figures so the figures on disk are created again after
+any of them changes. Since the cache is on
+disk, the figures are shared between the sessions and they are reused after the app
+is restarted. The most recently used figures are also kept in memory to skip reading
+and validating the JSON on every rerun.
+
+The size of the cache folder is limited to MAX_CACHE_SIZE bytes and the least recently
+used figures are removed first.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+from plotly.graph_objects import Figure
+from plotly.utils import PlotlyJSONEncoder
+
+from comparison import Comparison
+from epw_data import EPWData
+from weather_series import WeatherSeries
+
+CACHE_FOLDER = pathlib.Path('./data/figures')
+# maximum size of the figures on disk in bytes
+MAX_CACHE_SIZE = 200 * 1024 ** 2
+# number of figures to keep in memory
+MAX_MEMORY_ITEMS = 64
+# the packages that create the figures
+PACKAGES = ('ladybug-core', 'ladybug-charts', 'ladybug-comfort', 'plotly')
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def cache_version() -> str:
+    """Get the hash of the modules of the app and the versions of the PACKAGES."""
+    sha256 = hashlib.sha256()
+    for module in sorted(pathlib.Path(__file__).parent.glob('*.py')):
+        # app.py only shows the figures
+        if module.name == 'app.py':
+            continue
+        sha256.update(module.name.encode('utf-8'))
+        sha256.update(module.read_bytes())
+    for package in PACKAGES:
+        try:
+            package_version = version(package)
+        except PackageNotFoundError:
+            package_version = None
+        sha256.update(f'{package}=={package_version}'.encode('utf-8'))
+    return sha256.hexdigest()
+
+
+CACHE_VERSION = cache_version()
+
+
+def _normalize(value):
+    """Normalize an input so the same inputs always create the same key.
+
+    Raises:
+        TypeError: If the type of the input is not supported since its text may not be
+            the same for the same input.
+    """
+    if isinstance(value, EPWData):
+        return value.sha256
+    if isinstance(value, (Comparison, WeatherSeries)):
+        # their text is the SHA-256 of their files
+        return str(value)
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        # 18 and 18.0 create the same figure
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if value is None or isinstance(value, str):
+        return value
+    raise TypeError(f'Unsupported input type for the figure cache: {type(value)}')
+
+
+def figure_key(name: str, inputs: dict) -> str:
+    """Create a cache key for a function name and its inputs."""
+    text = json.dumps([name, _normalize(inputs)], sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _dump(result) -> str:
+    items = result if isinstance(result, tuple) else (result,)
+    data = [
+        {'figure': item.to_plotly_json()} if isinstance(item, Figure)
+        else {'value': item}
+        for item in items
+    ]
+    return json.dumps(
+        {'tuple': isinstance(result, tuple), 'items': data}, cls=PlotlyJSONEncoder
+    )
+
+
+def _load(text: str):
+    data = json.loads(text)
+    items = [
+        Figure(item['figure']) if 'figure' in item else item['value']
+        for item in data['items']
+    ]
+    return tuple(items) if data['tuple'] else items[0]
+
+
+def _is_cacheable(result) -> bool:
+    """Only cache figures. Error messages are returned as text and are not cached."""
+    if isinstance(result, tuple):
+        return len(result) > 0 and isinstance(result[0], Figure)
+    return isinstance(result, Figure)
+
+
+def _remember(key: str, result):
+    with _memory_lock:
+        _memory[key] = result
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+
+def _write(path: pathlib.Path, text: str):
+    """Write a file in the cache folder and remove the old files if it is too big."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first so other sessions never read a partial file
+    fd, temp_file = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as outf:
+        outf.write(text)
+    os.replace(temp_file, path)
+    evict(path.parent)
+
+
+def evict(folder=CACHE_FOLDER, max_size: int = MAX_CACHE_SIZE):
+    """Remove the least recently used figures until the folder is smaller than max_size.
+    """
+    files = []
+    for path in pathlib.Path(folder).glob('*.json'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cache_figure(func):
+    """Cache the figures of a function in memory and on disk.
+
+    The function should take an EPWData object and inputs that can be written to
+    JSON. It can return a figure, a tuple that starts with a figure and is followed
+    by values that can be written to JSON or a text which is not cached.
+    """
+    signature = inspect.signature(func)
+    # the source code is part of the key so the figures are created again if it changes
+    source = hashlib.sha256(inspect.getsource(func).encode('utf-8')).hexdigest()
+    name = f'{func.__name__}:{source}:{CACHE_VERSION}'
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        inputs = signature.bind(*args, **kwargs)
+        inputs.apply_defaults()
+        key = figure_key(name, inputs.arguments)
+
+        with _memory_lock:
+            if key in _memory:
+                _memory.move_to_end(key)
+                return _memory[key]
+
+        path = CACHE_FOLDER.joinpath(f'{key}.json')
+        try:
+            result = _load(path.read_text())
+        except (FileNotFoundError, ValueError, KeyError):
+            result = None
+        if result is not None:
+            # update the modified time so the figure is the last one to be removed
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            _remember(key, result)
+            return result
+
+        result = func(*args, **kwargs)
+        if _is_cacheable(result):
+            _remember(key, result)
+            try:
+                _write(path, _dump(result))
+            except (OSError, TypeError, ValueError):
+                # the figure is still cached in memory if it can't be written to disk
+                pass
+        return result
+
+    return wrapper
@@ -1,31 +1,52 @@
 """Functions to support the epw-viz app."""
 
-import pathlib
-import shutil
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
 
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from typing import List, Tuple
-from icrawler.builtin import GoogleImageCrawler
-from geopy.geocoders import Nominatim
 from plotly.graph_objects import Figure
 
-from ladybug.datatype.temperaturetime import HeatingDegreeTime, CoolingDegreeTime
-from ladybug_comfort.degreetime import heating_degree_time, cooling_degree_time
-
-from ladybug.datacollection import HourlyContinuousCollection
-from ladybug_comfort.chart.polygonpmv import PolygonPMV
-from ladybug.epw import EPW, EPWFields
-from ladybug.color import Colorset, Color
+from ladybug.epw import EPWFields
+from ladybug.color import Colorset, Color, ColorRange
 from ladybug.legend import LegendParameters
 from ladybug.hourlyplot import HourlyPlot
 from ladybug.monthlychart import MonthlyChart
 from ladybug.sunpath import Sunpath
 from ladybug.analysisperiod import AnalysisPeriod
-from ladybug.windrose import WindRose
 from ladybug.psychchart import PsychrometricChart
+# import ladybug before ladybug_comfort so the ladybug_charts extension is loaded first
+from ladybug_comfort.chart.polygonpmv import PolygonPMV
 
 from ladybug_charts.utils import Strategy
 
+from aggregation import aggregated_collection
+from comparison import Comparison, field_label
+from degree_time import BASE_TEMPERATURES, base_degree_days, degree_day_table, \
+    monthly_collection
+from downsample import lttb
+from epw_data import EPWData
+from figure_cache import cache_figure
+from masks import analysis_period_hoys, analysis_period_mask, statement_mask, \
+    filter_collection
+from psychrometrics import STRATEGIES, STRATEGY_COLORS, MIN_TEMPERATURE, \
+    MAX_TEMPERATURE, MAX_HUMIDITY_RATIO, bin_hours, chart_lines, chart_pressure, \
+    evaluate_strategies, humidity_ratio
+from styling import apply_colors, probe_colors
+from weather_series import WeatherSeries
+from wind_rose import DIRECTION_COUNT, DIRECTION_NAMES, wind_histogram
+
+# the names of the probe colorsets. See styled_figure.
+PROBE_PREFIX = 'probe:'
+
+# the figures are created in the background so they can be shown as soon as each one
+# of them is ready. The workers are shared by all the sessions.
+figure_executor = ThreadPoolExecutor(max_workers=4)
+
 colorsets = {
     'original': Colorset.original(),
     'nuanced': Colorset.nuanced(),
@@ -57,21 +78,6 @@ colorsets = {
 }
 
 
-def epw_hash_func(epw: EPW) -> str:
-    """Function to help streamlit hash an EPW object."""
-    return epw.location.city
-
-
-def hourly_data_hash_func(hourly_data: HourlyContinuousCollection) -> str:
-    """Function to help streamlit hash an HourlyContinuousCollection object."""
-    return hourly_data.header.data_type, hourly_data.average, hourly_data.min, hourly_data.max
-
-
-def color_hash_func(color: Color) -> Tuple[float, float, float]:
-    """Function to help streamlit hash a Color object."""
-    return color.r, color.g, color.b
-
-
 def get_figure_config(title: str) -> dict:
     """Set figure config so that a figure can be downloaded as SVG."""
 
@@ -98,66 +104,90 @@ def get_colors(switch: bool, global_colorset: str) -> List[Color]:
     """
 
     if switch:
-        colors = list(colorsets[global_colorset])
+        colors = list(get_colorset(global_colorset))
         colors.reverse()
     else:
-        colors = colorsets[global_colorset]
+        colors = get_colorset(global_colorset)
     return colors
 
 
+def get_colorset(global_colorset: str) -> List[Color]:
+    """Get the colors of a colorset by its name.
+
+    The names that start with PROBE_PREFIX are for the probe colors that the figures
+    are created with. See styled_figure.
+    """
+    if global_colorset.startswith(PROBE_PREFIX):
+        return probe_colors(int(global_colorset[len(PROBE_PREFIX):]))
+    return colorsets[global_colorset]
+
+
+def styled_figure(func):
+    """Create the figures with probe colors and apply the colorset to a copy of them.
+
+    The function should take the name of the colorset as global_colorset and it can
+    take a switch input to reverse the colorset. The figure of the function is created
+    with the probe colors of a colorset with the same number of colors so changing the
+    colorset or switching it uses the same cached figure and only replaces its colors.
+    See styling.apply_colors.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        inputs = signature.bind(*args, **kwargs)
+        inputs.apply_defaults()
+        arguments = inputs.arguments
+        colors = get_colors(arguments.get('switch'), arguments['global_colorset'])
+        arguments['global_colorset'] = f'{PROBE_PREFIX}{len(colors)}'
+        if arguments.get('switch'):
+            arguments['switch'] = False
+
+        result = func(*inputs.args, **inputs.kwargs)
+        if isinstance(result, tuple):
+            return (apply_colors(result[0], colors),) + result[1:]
+        if isinstance(result, Figure):
+            return apply_colors(result, colors)
+        # an error message
+        return result
+
+    return wrapper
+
+
 @st.cache()
 def get_fields() -> dict:
     # A dictionary of EPW variable name to its corresponding field number
     return {EPWFields._fields[i]['name'].name: i for i in range(6, 34)}
 
 
-@st.cache()
-def get_image(latitude: float, longitude: float) -> None:
-    # find city name and create a keyword for search
-    geolocator = Nominatim(user_agent="geoapiExercises")
-    location = geolocator.reverse(str(latitude)+","+str(longitude), language='en')
-    address = location.raw['address']
-    city = address.get('city', '')
-    keyword = city + ' city image'
-
-    # nuke the images folder if exists
-    path = pathlib.Path('./assets/image')
-    if path.is_dir():
-        shutil.rmtree(path)
-
-    # create a new folder to download the image
-    path.mkdir(parents=True, exist_ok=True)
-    filters = dict(size='medium', type='photo',
-                   license='commercial,modify')
-    google_crawler = GoogleImageCrawler(storage={'root_dir': './assets/image'})
-    google_crawler.crawl(keyword=keyword, max_num=1, filters=filters)
-
-
-@st.cache(hash_funcs={EPW: epw_hash_func, Color: color_hash_func}, allow_output_mutation=True)
-def get_diurnal_average_chart_figure(epw: EPW, global_colorset: str, switch: bool = False) -> Figure:
+@styled_figure
+@cache_figure
+def get_diurnal_average_chart_figure(epw: EPWData, global_colorset: str,
+                                     switch: bool = False) -> Figure:
     """Create a diurnal average chart from EPW.
 
     Args:
-        epw: An EPW object.
+        epw: An EPWData object.
         global_colorset: A string representing the name of a Colorset.
 
     Returns:
         A plotly figure.
     """
     colors = get_colors(switch, global_colorset)
-    return epw.diurnal_average_chart(show_title=True, colors=colors)
+    return epw.epw.diurnal_average_chart(show_title=True, colors=colors)
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func}, allow_output_mutation=True)
+@styled_figure
+@cache_figure
 def get_hourly_data_figure(
-        data: HourlyContinuousCollection, global_colorset: str, conditional_statement: str,
+        epw: EPWData, field: int, global_colorset: str, conditional_statement: str,
         min: float, max: float, st_month: int, st_day: int, st_hour: int, end_month: int,
         end_day: int, end_hour: int) -> Figure:
     """Create heatmap from hourly data.
 
     Args:
-        data: HourlyContinuousCollection object.
+        epw: An EPWData object.
+        field: EPW field number of the hourly data.
         global_colorset: A string representing the name of a Colorset.
         conditional_statement: A string representing a conditional statement.
         min: A string representing the lower bound of the data range.
@@ -173,17 +203,20 @@ def get_hourly_data_figure(
         A plotly figure.
     """
     lb_ap = AnalysisPeriod(st_month, st_day, st_hour, end_month, end_day, end_hour)
-    data = data.filter_by_analysis_period(lb_ap)
+    data = epw.collection(field)
+    mask = analysis_period_mask(st_month, st_day, st_hour, end_month, end_day,
+                                end_hour, epw.is_leap_year)
 
     if conditional_statement:
         try:
-            data = data.filter_by_conditional_statement(
-                conditional_statement)
-        except AssertionError:
-            return 'No values found for that conditional statement'
+            mask = mask & statement_mask(data.values, conditional_statement)
         except ValueError:
             return 'Invalid conditional statement'
 
+    data = filter_collection(data, mask, lb_ap)
+    if data is None:
+        return 'No values found for that conditional statement'
+
     if min:
         try:
             min = float(min)
@@ -196,7 +229,7 @@ def get_hourly_data_figure(
         except ValueError:
             return 'Invalid maximum value'
 
-    lb_lp = LegendParameters(colors=colorsets[global_colorset])
+    lb_lp = LegendParameters(colors=get_colorset(global_colorset))
 
     if min:
         lb_lp.min = min
@@ -208,14 +241,17 @@ def get_hourly_data_figure(
     return hourly_plot.plot(title=str(data.header.data_type), show_title=True)
 
 
-@st.cache(hash_funcs={EPW: epw_hash_func, Color: color_hash_func})
-def get_bar_chart_figure(fields: dict, epw: EPW, selection: List[str], data_type: str,
+@styled_figure
+@cache_figure
+def get_bar_chart_figure(fields: dict, epw: EPWData, selection: List[str], data_type: str,
                          switch: bool, stack: bool, global_colorset: str) -> Figure:
     """Create bar chart figure.
 
+    The monthly and daily values are read from the AggregationCube of the EPW file.
+
     Args:
         fields: A dictionary of EPW variable name to its corresponding field number.
-        epw: An EPW object.
+        epw: An EPWData object.
         selection: A list of strings representing the names of the fields to be plotted.
         data_type: A string representing the data type of the data to be plotted.
         switch: A boolean to indicate whether to reverse the colorset.
@@ -227,50 +263,93 @@ def get_bar_chart_figure(fields: dict, epw: EPW, selection: List[str], data_type
     """
     colors = get_colors(switch, global_colorset)
 
-    data = []
-    for count, item in enumerate(selection):
-        if item:
-            var = epw._get_data_by_field(fields[list(fields.keys())[count]])
-            if data_type == 'Monthly average':
-                data.append(var.average_monthly())
-            elif data_type == 'Monthly total':
-                data.append(var.total_monthly())
-            elif data_type == 'Daily average':
-                data.append(var.average_daily())
-            elif data_type == 'Daily total':
-                data.append(var.total_daily())
+    period, statistic = {
+        'Monthly average': ('monthly', 'average'),
+        'Monthly total': ('monthly', 'total'),
+        'Daily average': ('daily', 'average'),
+        'Daily total': ('daily', 'total')
+    }[data_type]
+    data = [
+        aggregated_collection(epw, field, period, statistic)
+        for field, item in zip(fields.values(), selection) if item
+    ]
 
     lb_lp = LegendParameters(colors=colors)
     monthly_chart = MonthlyChart(data, legend_parameters=lb_lp)
     return monthly_chart.plot(stack=stack, title=data_type, show_title=True)
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func}, allow_output_mutation=True)
-def get_hourly_line_chart_figure(data: HourlyContinuousCollection,
-                                 switch: bool, global_colorset: str) -> Figure:
+@styled_figure
+@cache_figure
+def get_hourly_line_chart_figure(epw: EPWData, field: int,
+                                 switch: bool, global_colorset: str,
+                                 points: int = 2000, webgl: bool = False,
+                                 st_month: int = 1, end_month: int = 12) -> Figure:
     """Create hourly line chart figure.
 
+    The hourly values are downsampled to the number of points using the largest
+    triangle three buckets algorithm which keeps the peaks of the data. Selecting a
+    shorter period shows more details since the same number of points is used for the
+    shorter period.
+
     Args:
-        data: An HourlyContinuousCollection object.
+        epw: An EPWData object.
+        field: EPW field number of the hourly data.
         switch: A boolean to indicate whether to reverse the colorset.
         global_colorset: A string representing the name of a Colorset.
+        points: Number of points to draw. Set to None to draw all the hourly values.
+        webgl: A boolean to draw the line with WebGL which is faster for many points.
+        st_month: Start month of the period.
+        end_month: End month of the period.
 
     Returns:
         A plotly figure.
     """
     colors = get_colors(switch, global_colorset)
-    return data.line_chart(color=colors[-1])
+    color = colors[-1]
+    data_type = EPWFields.field_by_number(field).name
+    unit = EPWFields.field_by_number(field).unit
+
+    hours = np.flatnonzero(
+        analysis_period_mask(st_month, 1, 0, end_month, 31, 23, epw.is_leap_year))
+    values = epw.column(field)[hours].astype(np.float64)
+    if points:
+        indices = lttb(hours, values, int(points))
+        hours, values = hours[indices], values[indices]
+
+    year = 2016 if epw.is_leap_year else 2017
+    times = pd.Timestamp(year, 1, 1) + pd.to_timedelta(hours, unit='h')
+
+    scatter = go.Scattergl if webgl else go.Scatter
+    figure = go.Figure(
+        scatter(
+            x=times, y=values.round(2), mode='lines', name=data_type.name,
+            line=dict(color=f'rgb({color.r},{color.g},{color.b})', width=1),
+            hovertemplate=f'%{{y}} {unit}<br>%{{x|%b %d %H:00}}<extra></extra>'
+        ),
+        layout=go.Layout(margin=dict(l=20, r=20, t=33, b=20))
+    )
+    figure.update_xaxes(dtick='M1', tickformat='%b', ticklabelmode='period',
+                        showline=True, linewidth=1, linecolor='black', mirror=True)
+    figure.update_yaxes(title_text=f'({unit})', showline=True, linewidth=1,
+                        linecolor='black', mirror=True)
+    figure.update_layout(
+        template='plotly_white',
+        title={'text': data_type.name, 'y': 1, 'x': 0.5, 'xanchor': 'center',
+               'yanchor': 'top'}
+    )
+    return figure
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func}, allow_output_mutation=True)
-def get_hourly_diurnal_average_chart_figure(data: HourlyContinuousCollection,
+@styled_figure
+@cache_figure
+def get_hourly_diurnal_average_chart_figure(epw: EPWData, field: int,
                                             switch: bool, global_colorset: str) -> Figure:
     """Create diurnal average chart figure for hourly data.
 
     Args:
-        data: An HourlyContinuousCollection object.
+        epw: An EPWData object.
+        field: EPW field number of the hourly data.
         switch: A boolean to indicate whether to reverse the colorset.
         global_colorset: A string representing the name of a Colorset.
 
@@ -278,19 +357,21 @@ def get_hourly_diurnal_average_chart_figure(data: HourlyContinuousCollection,
         A plotly figure.
     """
     colors = get_colors(switch, global_colorset)
+    data = epw.collection(field)
     return data.diurnal_average_chart(
         title=data.header.data_type.name, show_title=True,
         color=colors[-1])
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func}, allow_output_mutation=True)
-def get_daily_chart_figure(data: HourlyContinuousCollection, switch: bool,
+@styled_figure
+@cache_figure
+def get_daily_chart_figure(epw: EPWData, field: int, switch: bool,
                            global_colorset: str) -> Figure:
     """Create daily chart figure.
 
     Args:
-        data: An HourlyContinuousCollection object.
+        epw: An EPWData object.
+        field: EPW field number of the hourly data.
         switch: A boolean to indicate whether to reverse the colorset.
         global_colorset: A string representing the name of a Colorset.
 
@@ -298,25 +379,24 @@ def get_daily_chart_figure(data: HourlyContinuousCollection, switch: bool,
         A plotly figure.
     """
     colors = get_colors(switch, global_colorset)
-    data = data.average_daily()
+    data = aggregated_collection(epw, field, 'daily', 'average')
 
     return data.bar_chart(color=colors[-1], title=data.header.data_type.name,
                           show_title=True)
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func, EPW: epw_hash_func}, allow_output_mutation=True)
-def get_sunpath_figure(sunpath_type: str, global_colorset: str, epw: EPW = None,
-                       switch: bool = False,
-                       data: HourlyContinuousCollection = None, ) -> Figure:
+@styled_figure
+@cache_figure
+def get_sunpath_figure(sunpath_type: str, global_colorset: str, epw: EPWData = None,
+                       switch: bool = False, field: int = None) -> Figure:
     """Create sunpath figure.
 
     Args:
         sunpath_type: A string representing the type of sunpath to be plotted.
         global_colorset: A string representing the name of a Colorset.
-        epw: An EPW object.
+        epw: An EPWData object.
         switch: A boolean to indicate whether to reverse the colorset.
-        data: Hourly data to load on sunpath.
+        field: EPW field number of the hourly data to load on sunpath.
 
 
     Returns:
@@ -328,21 +408,19 @@ def get_sunpath_figure(sunpath_type: str, global_colorset: str, epw: EPW = None,
         return lb_sunpath.plot(colorset=colors)
     else:
         lb_sunpath = Sunpath.from_location(epw.location)
-        colors = colorsets[global_colorset]
-        return lb_sunpath.plot(colorset=colors, data=data)
+        colors = get_colorset(global_colorset)
+        return lb_sunpath.plot(colorset=colors, data=epw.collection(field))
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func}, allow_output_mutation=True)
+@styled_figure
+@cache_figure
 def get_degree_days_figure(
-    dbt: HourlyContinuousCollection, _heat_base_: int, _cool_base_: int,
-    stack: bool, switch: bool, global_colorset: str) -> Tuple[Figure,
-                                                              HourlyContinuousCollection,
-                                                              HourlyContinuousCollection]:
+    epw: EPWData, _heat_base_: int, _cool_base_: int,
+    stack: bool, switch: bool, global_colorset: str) -> Tuple[Figure, float, float]:
     """Create HDD and CDD figure.
 
     Args:
-        dbt: A HourlyContinuousCollection object.
+        epw: An EPWData object.
         _heat_base_: A number representing the heat base temperature.
         _cool_base_: A number representing the cool base temperature.
         stack: A boolean to indicate whether to stack the data.
@@ -354,35 +432,90 @@ def get_degree_days_figure(
 
         -   A plotly figure.
 
-        -   Heating degree days as a HourlyContinuousCollection.
+        -   Total heating degree days.
 
-        -   Cooling degree days as a HourlyContinuousCollection.
+        -   Total cooling degree days.
     """
-
-    hourly_heat = HourlyContinuousCollection.compute_function_aligned(
-        heating_degree_time, [dbt, _heat_base_],
-        HeatingDegreeTime(), 'degC-hours')
-    hourly_heat.convert_to_unit('degC-days')
-
-    hourly_cool = HourlyContinuousCollection.compute_function_aligned(
-        cooling_degree_time, [dbt, _cool_base_],
-        CoolingDegreeTime(), 'degC-hours')
-    hourly_cool.convert_to_unit('degC-days')
+    heat, total_heat = base_degree_days(epw, _heat_base_, heating=True)
+    cool, total_cool = base_degree_days(epw, _cool_base_, heating=False)
 
     colors = get_colors(switch, global_colorset)
 
     lb_lp = LegendParameters(colors=colors)
-    monthly_chart = MonthlyChart([hourly_cool.total_monthly(),
-                                  hourly_heat.total_monthly()], legend_parameters=lb_lp)
+    monthly_chart = MonthlyChart([monthly_collection(epw, cool, heating=False),
+                                  monthly_collection(epw, heat, heating=True)],
+                                 legend_parameters=lb_lp)
 
-    return monthly_chart.plot(stack=stack), hourly_heat, hourly_cool
+    return monthly_chart.plot(stack=stack), total_heat, total_cool
 
 
-@st.cache(hash_funcs={Color: color_hash_func, EPW: epw_hash_func}, allow_output_mutation=True)
+@styled_figure
+@cache_figure
+def get_degree_days_sensitivity_figure(epw: EPWData, _heat_base_: int, _cool_base_: int,
+                                       switch: bool, global_colorset: str) -> Figure:
+    """Create a figure of the annual HDD and CDD for a range of base temperatures.
+
+    Args:
+        epw: An EPWData object.
+        _heat_base_: A number representing the heat base temperature.
+        _cool_base_: A number representing the cool base temperature.
+        switch: A boolean to indicate whether to reverse the colorset.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    table = degree_day_table(epw)
+    colors = get_colors(switch, global_colorset)
+    heat_color, cool_color = colors[0], colors[-1]
+
+    figure = go.Figure()
+    for name, totals, color, base, heating in (
+            ('Heating degree days', table.annual_heating, heat_color, _heat_base_,
+             True),
+            ('Cooling degree days', table.annual_cooling, cool_color, _cool_base_,
+             False)):
+        line_color = f'rgb({color.r},{color.g},{color.b})'
+        figure.add_trace(
+            go.Scatter(
+                x=BASE_TEMPERATURES, y=totals.round(1), mode='lines', name=name,
+                line=dict(color=line_color, width=2),
+                hovertemplate='%{y} degC-days<br>Base %{x} C<extra></extra>'
+            )
+        )
+        # mark the selected base temperature
+        _, total = base_degree_days(epw, base, heating)
+        figure.add_trace(
+            go.Scatter(
+                x=[base], y=[round(total, 1)], mode='markers', showlegend=False,
+                marker=dict(color=line_color, size=10),
+                hovertemplate='%{y} degC-days<br>Base %{x} C<extra></extra>'
+            )
+        )
+
+    figure.update_layout(
+        template='plotly_white',
+        margin=dict(l=20, r=20, t=33, b=20),
+        title={'text': 'Base Temperature Sensitivity', 'y': 1, 'x': 0.5,
+               'xanchor': 'center', 'yanchor': 'top'},
+        legend=dict(yanchor='top', y=0.99, xanchor='center', x=0.5)
+    )
+    figure.update_xaxes(title_text='Base temperature (°C)', showline=True, linewidth=1,
+                        linecolor='black', mirror=True)
+    figure.update_yaxes(title_text='Annual degree days (degC-days)', showline=True,
+                        linewidth=1, linecolor='black', mirror=True)
+    return figure
+
+
+@styled_figure
+@cache_figure
 def get_windrose_figure(st_month: int, st_day: int, st_hour: int, end_month: int,
                         end_day: int, end_hour: int, epw, global_colorset) -> Figure:
     """Create windrose figure.
 
+    The histogram of the analysis period is read from the cumulative counts of the
+    wind direction and speed bins of the EPW file. See wind_rose.WindHistogram.
+
     Args:
         st_month: A number representing the start month.
         st_day: A number representing the start day.
@@ -390,46 +523,68 @@ def get_windrose_figure(st_month: int, st_day: int, st_hour: int, end_month: int
         end_month: A number representing the end month.
         end_day: A number representing the end day.
         end_hour: A number representing the end hour.
-        epw: An EPW object.
+        epw: An EPWData object.
         global_colorset: A string representing the name of a Colorset.
 
     Returns:
         A plotly figure.
     """
-
-    lb_ap = AnalysisPeriod(st_month, st_day, st_hour, end_month, end_day, end_hour)
-    wind_dir = epw.wind_direction.filter_by_analysis_period(lb_ap)
-    wind_spd = epw.wind_speed.filter_by_analysis_period(lb_ap)
-
-    lb_lp = LegendParameters(colors=colorsets[global_colorset])
-    lb_wind_rose = WindRose(wind_dir, wind_spd)
-    lb_wind_rose.legend_parameters = lb_lp
-
-    return lb_wind_rose.plot()
+    histogram = wind_histogram(epw)
+    st_hoy, end_hoy = analysis_period_hoys(
+        st_month, st_day, st_hour, end_month, end_day, end_hour, epw.is_leap_year)
+    counts, total = histogram.histogram(st_hoy, end_hoy, st_hour, end_hour)
+    frequency = counts / total * 100
+
+    labels = histogram.speed_labels(EPWFields.field_by_number(21).unit)
+    color_range = ColorRange(colors=get_colorset(global_colorset),
+                             domain=[0, len(labels) - 1])
+    directions = np.arange(DIRECTION_COUNT) * 360 / DIRECTION_COUNT
+
+    figure = go.Figure()
+    for i, label in enumerate(labels):
+        color = color_range.color(i)
+        figure.add_trace(
+            go.Barpolar(
+                r=frequency[:, i], theta=directions, name=label, text=DIRECTION_NAMES,
+                marker_color=f'rgb({color.r},{color.g},{color.b})',
+                hovertemplate='frequency: %{r:.2f}%<br>direction: %{theta:.2f}\u00B0 deg'
+                '<br>'
+            )
+        )
+    figure.update_layout(
+        template='plotly_white',
+        autosize=True,
+        polar_angularaxis_rotation=90,
+        polar_angularaxis_direction='clockwise',
+        dragmode=False,
+        margin=dict(l=20, r=20, t=55, b=20)
+    )
+    return figure
 
 
-@st.cache(hash_funcs={HourlyContinuousCollection: hourly_data_hash_func,
-                      Color: color_hash_func, EPW: epw_hash_func}, allow_output_mutation=True)
-def get_psy_chart_figure(epw: EPW, global_colorset: str, selected_strategy: str,
+@styled_figure
+@cache_figure
+def get_psy_chart_figure(epw: EPWData, global_colorset: str, selected_strategy: str,
                          load_data: bool, draw_polygons: bool,
-                         data: HourlyContinuousCollection) -> Figure:
+                         field: int = None) -> Figure:
     """Create psychrometric chart figure.
 
     Args:
-        epw: An EPW object.
+        epw: An EPWData object.
         global_colorset: A string representing the name of a Colorset.
         selected_strategy: A string representing the name of a psychrometric strategy.
         load_data: A boolean to indicate whether to load the data.
         draw_polygons: A boolean to indicate whether to draw the polygons.
-        data: Hourly data to load on psychrometric chart.
+        field: EPW field number of the hourly data to load on psychrometric chart.
 
     Returns:
         A plotly figure.
     """
 
-    lb_lp = LegendParameters(colors=colorsets[global_colorset])
-    lb_psy = PsychrometricChart(epw.dry_bulb_temperature,
-                                epw.relative_humidity, legend_parameters=lb_lp)
+    lb_lp = LegendParameters(colors=get_colorset(global_colorset))
+    lb_psy = PsychrometricChart(epw.collection(6),
+                                epw.collection(8), legend_parameters=lb_lp)
+    data = epw.collection(field) if load_data else None
 
     if selected_strategy == 'All':
         strategies = [Strategy.comfort, Strategy.evaporative_cooling,
@@ -454,14 +609,319 @@ def get_psy_chart_figure(epw: EPW, global_colorset: str, selected_strategy: str,
         if draw_polygons:
             figure = lb_psy.plot(data=data, polygon_pmv=pmv,
                                  strategies=strategies,
-                                 solar_data=epw.direct_normal_radiation,)
+                                 solar_data=epw.collection(14),)
         else:
             figure = lb_psy.plot(data=data)
     else:
         if draw_polygons:
             figure = lb_psy.plot(polygon_pmv=pmv, strategies=strategies,
-                                 solar_data=epw.direct_normal_radiation)
+                                 solar_data=epw.collection(14))
         else:
             figure = lb_psy.plot()
 
     return figure
+
+
+@styled_figure
+@cache_figure
+def get_binned_psy_chart_figure(epw: EPWData, global_colorset: str,
+                                selected_strategy: str, load_data: bool,
+                                draw_polygons: bool, field: int = None) -> Figure:
+    """Create a psychrometric chart figure with the hours binned into cells.
+
+    The hours are binned into cells of 1 degree Celsius and 0.001 humidity ratio that
+    are drawn as a single heatmap. The chart and the polygons are calculated for the
+    average atmospheric pressure of the EPW file.
+
+    Args:
+        epw: An EPWData object.
+        global_colorset: A string representing the name of a Colorset.
+        selected_strategy: A string representing the name of a psychrometric strategy.
+        load_data: A boolean to indicate whether to load the data.
+        draw_polygons: A boolean to indicate whether to draw the polygons.
+        field: EPW field number of the hourly data to load on psychrometric chart.
+
+    Returns:
+        A plotly figure.
+    """
+    pressure = chart_pressure(epw.column(9))
+    temperature = epw.collection_values(6)
+    humidity = humidity_ratio(temperature, epw.column(8), pressure)
+
+    if load_data:
+        data_type = EPWFields.field_by_number(field).name
+        unit = EPWFields.field_by_number(field).unit
+        t_centers, hr_centers, cells = bin_hours(
+            temperature, humidity, epw.column(field))
+        chart_title = f'Psychrometric Chart - {data_type.name}'
+        legend_title, hover = unit, f'%{{z:.1f}} {unit}'
+    else:
+        t_centers, hr_centers, cells = bin_hours(temperature, humidity)
+        chart_title = 'Psychrometric Chart - Frequency'
+        legend_title, hover = 'Hours', '%{z} hours'
+
+    colors = [f'rgb({c.r},{c.g},{c.b})' for c in get_colorset(global_colorset)]
+    colorscale = [[i / (len(colors) - 1), color] for i, color in enumerate(colors)]
+    figure = go.Figure()
+    figure.add_trace(
+        go.Heatmap(
+            x=t_centers, y=hr_centers, z=cells, colorscale=colorscale,
+            colorbar=dict(thickness=10, title=legend_title), hoverongaps=False,
+            hovertemplate=f'{hover}<br>%{{x}} C, %{{y:.4f}}<extra></extra>'
+        )
+    )
+
+    # relative humidity, enthalpy, temperature and humidity ratio lines
+    x, y, text = chart_lines(pressure)
+    figure.add_trace(
+        go.Scatter(
+            x=x, y=y, text=text, mode='lines', showlegend=False,
+            line=dict(width=1, color='#85837f'), hovertemplate='%{text}<extra></extra>'
+        )
+    )
+
+    if draw_polygons:
+        if selected_strategy == 'All':
+            strategies = STRATEGIES
+        else:
+            strategies = tuple(
+                name for name in STRATEGIES
+                if name.lower() == selected_strategy.strip().lower()
+            )
+        for name, vertices, hours in evaluate_strategies(
+                temperature, humidity, epw.column(14), strategies, pressure):
+            figure.add_trace(
+                go.Scatter(
+                    x=np.append(vertices[:, 0], vertices[0, 0]),
+                    y=np.append(vertices[:, 1], vertices[0, 1]),
+                    mode='lines', line=dict(width=4, color=STRATEGY_COLORS[name]),
+                    name=f'{name}: {round(hours.mean() * 100)}% of time',
+                    hovertemplate='<extra></extra>'
+                )
+            )
+
+    figure.update_layout(
+        template='plotly_white',
+        margin=dict(l=20, r=20, t=33, b=20),
+        title={'text': chart_title, 'y': 1, 'x': 0.5, 'xanchor': 'center',
+               'yanchor': 'top'},
+        legend=dict(yanchor='top', y=0.99, xanchor='left', x=0.01)
+    )
+    figure.update_xaxes(
+        title_text='Temperature (°C)', range=[MIN_TEMPERATURE, MAX_TEMPERATURE],
+        showline=True, linewidth=1, linecolor='black', mirror=True, dtick=5
+    )
+    figure.update_yaxes(
+        title_text='Humidity Ratio (KG water/KG air)', range=[0, MAX_HUMIDITY_RATIO],
+        showline=True, linewidth=1, linecolor='black', mirror=True
+    )
+    return figure
+
+
+def _comparison_colors(count: int, global_colorset: str) -> List[str]:
+    """Get a color for each EPW file of a comparison."""
+    color_range = ColorRange(colors=get_colorset(global_colorset),
+                             domain=[0, max(count - 1, 1)])
+    colors = [color_range.color(i) for i in range(count)]
+    return [f'rgb({color.r},{color.g},{color.b})' for color in colors]
+
+
+def _comparison_layout(figure: Figure, title: str, x_title: str, y_title: str) -> Figure:
+    figure.update_layout(
+        template='plotly_white',
+        margin=dict(l=20, r=20, t=33, b=20),
+        title={'text': title, 'y': 1, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'}
+    )
+    figure.update_xaxes(title_text=x_title, showline=True, linewidth=1,
+                        linecolor='black', mirror=True)
+    figure.update_yaxes(title_text=y_title, showline=True, linewidth=1,
+                        linecolor='black', mirror=True)
+    return figure
+
+
+def get_comparison_monthly_figure(comparison: Comparison, field: int,
+                                  global_colorset: str, total: bool = False) -> Figure:
+    """Create a figure of the monthly values of a field for all the compared EPW files.
+
+    Args:
+        comparison: A Comparison object.
+        field: A number representing the EPW field.
+        global_colorset: A string representing the name of a Colorset.
+        total: A boolean to show the monthly totals instead of the monthly averages.
+
+    Returns:
+        A plotly figure.
+    """
+    values = comparison.monthly(field, total).round(2)
+    months = list(AnalysisPeriod.MONTHNAMES.values())
+    colors = _comparison_colors(len(comparison), global_colorset)
+    figure = go.Figure()
+    for name, row, color in zip(comparison.names, values, colors):
+        figure.add_trace(
+            go.Scatter(x=months, y=row, mode='lines+markers', name=name,
+                       line=dict(color=color, width=2))
+        )
+    title = 'Monthly total' if total else 'Monthly average'
+    return _comparison_layout(figure, title, 'Month', field_label(field))
+
+
+def get_comparison_diurnal_figure(comparison: Comparison, field: int,
+                                  global_colorset: str) -> Figure:
+    """Create a figure of the average day of a field for all the compared EPW files.
+
+    Args:
+        comparison: A Comparison object.
+        field: A number representing the EPW field.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    values = comparison.diurnal(field).round(2)
+    colors = _comparison_colors(len(comparison), global_colorset)
+    figure = go.Figure()
+    for name, row, color in zip(comparison.names, values, colors):
+        figure.add_trace(
+            go.Scatter(x=np.arange(24), y=row, mode='lines', name=name,
+                       line=dict(color=color, width=2))
+        )
+    return _comparison_layout(figure, 'Average day', 'Hour', field_label(field))
+
+
+def get_comparison_distribution_figure(comparison: Comparison, field: int,
+                                       global_colorset: str) -> Figure:
+    """Create box plots of the hourly values of a field for all the compared EPW files.
+
+    The boxes are drawn from the precomputed percentiles. The whiskers are the 1st and
+    the 99th percentiles.
+
+    Args:
+        comparison: A Comparison object.
+        field: A number representing the EPW field.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    values = comparison.percentiles(field, [1, 25, 50, 75, 99]).round(2)
+    colors = _comparison_colors(len(comparison), global_colorset)
+    figure = go.Figure()
+    for name, row, color in zip(comparison.names, values, colors):
+        figure.add_trace(
+            go.Box(x=[name], lowerfence=[row[0]], q1=[row[1]], median=[row[2]],
+                   q3=[row[3]], upperfence=[row[4]], name=name, marker_color=color)
+        )
+    figure.update_layout(showlegend=False)
+    return _comparison_layout(figure, 'Distribution', 'EPW file', field_label(field))
+
+
+def _series_colorscale(global_colorset: str) -> List[List]:
+    colors = get_colorset(global_colorset)
+    return [
+        [i / max(len(colors) - 1, 1), f'rgb({color.r},{color.g},{color.b})']
+        for i, color in enumerate(colors)
+    ]
+
+
+def get_series_hourly_figure(series: WeatherSeries, field: int, statistic: str,
+                             global_colorset: str) -> Figure:
+    """Create a heatmap of a field for each hour of the day of each month of a series.
+
+    Args:
+        series: A WeatherSeries object.
+        field: A number representing the EPW field.
+        statistic: One of the statistics of the aggregation module.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    values = series.monthly_per_hour(field, statistic).reshape(-1, 24)
+    labels = np.array([f'{year}-{month:02d}' for year in series.years
+                       for month in range(1, 13)])
+    # skip the months that are not in the series
+    months = ~np.all(np.isnan(values), axis=1)
+    figure = go.Figure(go.Heatmap(
+        x=labels[months], y=np.arange(24), z=values[months].T.round(2),
+        colorscale=_series_colorscale(global_colorset),
+        colorbar=dict(title=field_label(field))
+    ))
+    figure.update_xaxes(type='category', nticks=min(len(series.years) * 2, 40))
+    return _comparison_layout(figure, f'Monthly {statistic} per hour', 'Month', 'Hour')
+
+
+def get_series_monthly_figure(series: WeatherSeries, field: int, statistic: str,
+                              global_colorset: str) -> Figure:
+    """Create a heatmap of a field for each month of each year of a series.
+
+    Args:
+        series: A WeatherSeries object.
+        field: A number representing the EPW field.
+        statistic: One of the statistics of the aggregation module.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    values = series.monthly(field, statistic).round(2)
+    figure = go.Figure(go.Heatmap(
+        x=list(AnalysisPeriod.MONTHNAMES.values()), y=series.years, z=values,
+        colorscale=_series_colorscale(global_colorset),
+        colorbar=dict(title=field_label(field))
+    ))
+    figure.update_yaxes(type='category')
+    return _comparison_layout(figure, f'Monthly {statistic}', 'Month', 'Year')
+
+
+def get_series_yearly_figure(series: WeatherSeries, field: int, statistic: str,
+                             global_colorset: str) -> Figure:
+    """Create a bar chart of a field for each year of a series with a linear trend.
+
+    Args:
+        series: A WeatherSeries object.
+        field: A number representing the EPW field.
+        statistic: One of the statistics of the aggregation module.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    values = series.yearly(field, statistic)
+    colors = _series_colorscale(global_colorset)
+    figure = go.Figure(go.Bar(
+        x=series.years, y=values.round(2), name=statistic.capitalize(),
+        marker=dict(color=values, colorscale=colors)
+    ))
+    if len(series.years) > 1:
+        slope, intercept = np.polyfit(series.years, values, 1)
+        figure.add_trace(go.Scatter(
+            x=series.years, y=(slope * series.years + intercept).round(2), mode='lines',
+            name=f'Trend ({slope:+.3f} per year)', line=dict(color='black', dash='dash')
+        ))
+    figure.update_xaxes(type='category')
+    return _comparison_layout(figure, f'Yearly {statistic}', 'Year', field_label(field))
+
+
+def get_series_degree_days_figure(series: WeatherSeries, heat_base: float,
+                                  cool_base: float, global_colorset: str) -> Figure:
+    """Create a bar chart of the heating and the cooling degree-days of each year.
+
+    Args:
+        series: A WeatherSeries object.
+        heat_base: Base heating temperature in Celsius.
+        cool_base: Base cooling temperature in Celsius.
+        global_colorset: A string representing the name of a Colorset.
+
+    Returns:
+        A plotly figure.
+    """
+    heating, cooling = series.degree_days(heat_base, cool_base)
+    colors = _comparison_colors(2, global_colorset)
+    figure = go.Figure()
+    figure.add_trace(go.Bar(x=series.years, y=heating.round(1), marker_color=colors[0],
+                            name=f'Heating degree days (base {heat_base} C)'))
+    figure.add_trace(go.Bar(x=series.years, y=cooling.round(1), marker_color=colors[1],
+                            name=f'Cooling degree days (base {cool_base} C)'))
+    figure.update_layout(barmode='group')
+    figure.update_xaxes(type='category')
+    return _comparison_layout(figure, 'Degree days', 'Year', 'degC-days')
@@ -0,0 +1,348 @@
+"""Binned psychrometric chart with cached comfort and strategy polygons.
+
+ladybug's psychrometric chart draws every cell of the chart as a separate Plotly trace
+and the strategy polygons are created and evaluated again for every chart. Here the
+hours are binned into cells of temperature and humidity ratio with NumPy and the cells
+are drawn as a single heatmap trace.
+
+The chart lines and the strategy polygons only depend on the strategies and the
+atmospheric pressure so they are created once with ladybug and are cached as arrays of
+vertices. The hours in each polygon are then counted with a vectorized point in polygon
+test. The polygons are in the same coordinates as the chart where x is the dry bulb
+temperature in Celsius and y is the humidity ratio.
+"""
+
+import threading
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ladybug.psychchart import PsychrometricChart
+from ladybug_comfort.chart.polygonpmv import PolygonPMV
+from ladybug_geometry.geometry2d.pointvector import Point2D
+from ladybug_charts.utils import StrategyParameters
+
+# the range of the chart is the same as the psychrometric chart of ladybug_charts
+MIN_TEMPERATURE = -20
+MAX_TEMPERATURE = 50
+MAX_HUMIDITY_RATIO = 0.03
+# size of the cells of the binned chart
+TEMPERATURE_STEP = 1
+HUMIDITY_RATIO_STEP = 0.001
+# the pressure is rounded to this value in Pa so similar locations share the polygons
+PRESSURE_STEP = 100
+
+STRATEGY_COLORS = {
+    'Comfort': '#009402',
+    'Evaporative Cooling': '#008dff',
+    'Mass + Night Ventilation': '#333333',
+    'Occupant Use of Fans': '#3d17ff',
+    'Capture Internal Heat': '#f58700',
+    'Passive Solar Heating': '#ff0400'
+}
+STRATEGIES = tuple(STRATEGY_COLORS.keys())
+
+# ladybug objects are not thread safe and the figures are created in worker threads
+_geometry_lock = threading.RLock()
+# direction of the ray for the point in polygon test in ladybug_geometry
+_RAY_VECTOR = (1, 0.00001)
+
+
+def saturated_vapor_pressure(t_kelvin: np.ndarray) -> np.ndarray:
+    """Saturated vapor pressure (Pa) at the dry bulb temperatures (K).
+
+    The same formula as ladybug.psychrometrics.saturated_vapor_pressure for an array.
+    """
+    t = np.asarray(t_kelvin, dtype=np.float64)
+    ln_ice = -5.6745359E+03 / t + 6.3925247 - 9.677843E-03 * t + \
+        6.2215701E-07 * t ** 2 + 2.0747825E-09 * t ** 3 - \
+        9.484024E-13 * t ** 4 + 4.1635019 * np.log(t)
+    ln_water = -5.8002206E+03 / t + 1.3914993 - 4.8640239E-02 * t + \
+        4.1764768E-05 * t ** 2 - 1.4452093E-08 * t ** 3 + 6.5459673 * np.log(t)
+    return np.exp(np.where(t <= 273.15, ln_ice, ln_water))
+
+
+def humidity_ratio(temperature: np.ndarray, relative_humidity: np.ndarray,
+                   pressure: float = 101325) -> np.ndarray:
+    """Humidity ratio (kg water/kg air) from the dry bulb temperatures (C) and the
+    relative humidity (%).
+
+    The same formula as ladybug.psychrometrics.humid_ratio_from_db_rh for arrays.
+    """
+    p_ws = saturated_vapor_pressure(np.asarray(temperature, dtype=np.float64) + 273.15)
+    p_w = p_ws * (np.asarray(relative_humidity, dtype=np.float64) / 100)
+    return (p_w * 0.621945) / (pressure - p_w)
+
+
+def chart_x(temperature: np.ndarray) -> np.ndarray:
+    """Get the x coordinates of the temperatures on the chart.
+
+    The x coordinates are the temperatures but they are calculated in the same way as
+    PsychrometricChart.t_x_value so the points on the edges of the polygons are
+    counted in the same way as ladybug.
+    """
+    return MIN_TEMPERATURE + (np.asarray(temperature, dtype=np.float64) - MIN_TEMPERATURE)
+
+
+def chart_pressure(pressure: np.ndarray) -> float:
+    """Get the average of the hourly atmospheric pressure rounded to PRESSURE_STEP."""
+    average = float(np.nanmean(pressure))
+    return float(round(average / PRESSURE_STEP) * PRESSURE_STEP)
+
+
+def bin_hours(temperature: np.ndarray, humidity: np.ndarray,
+              values: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bin the hours into the cells of the chart.
+
+    Args:
+        temperature: Hourly dry bulb temperature in Celsius.
+        humidity: Hourly humidity ratio.
+        values: Optional hourly values to average in each cell.
+
+    Returns:
+        A tuple with the centers of the temperature cells, the centers of the humidity
+        ratio cells and an array with the shape of (humidity ratio, temperature) with
+        the number of hours in each cell or the average of the values. Empty cells
+        are NaN.
+    """
+    t_edges = np.arange(MIN_TEMPERATURE, MAX_TEMPERATURE + TEMPERATURE_STEP,
+                        TEMPERATURE_STEP, dtype=np.float64)
+    hr_edges = np.linspace(
+        0, MAX_HUMIDITY_RATIO, int(round(MAX_HUMIDITY_RATIO / HUMIDITY_RATIO_STEP)) + 1
+    )
+    bins = (hr_edges, t_edges)
+    counts, _, _ = np.histogram2d(humidity, temperature, bins=bins)
+    if values is None:
+        cells = counts
+    else:
+        totals, _, _ = np.histogram2d(
+            humidity, temperature, bins=bins,
+            weights=np.asarray(values, dtype=np.float64)
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cells = totals / counts
+    cells[counts == 0] = np.nan
+    return (t_edges[:-1] + t_edges[1:]) / 2, (hr_edges[:-1] + hr_edges[1:]) / 2, cells
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Check which points are inside a polygon using ray casting.
+
+    The test is the same as Polygon2D.is_point_inside_bound_rect in ladybug_geometry
+    so the points on the edges of the polygon are counted in the same way. Note that
+    the ray of ladybug_geometry is not horizontal.
+
+    Args:
+        x: X coordinates of the points.
+        y: Y coordinates of the points.
+        polygon: An array of the vertices of the polygon with the shape of (n, 2).
+
+    Returns:
+        A boolean array.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    ray_x, ray_y = _RAY_VECTOR
+    crossings = np.zeros(x.shape, dtype=np.int64)
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for ax, ay, bx, by in zip(x1, y1, x2, y2):
+            vx, vy = bx - ax, by - ay
+            d = ray_y * vx - ray_x * vy
+            if d == 0:
+                continue
+            dx, dy = ax - x, ay - y
+            # the position of the intersection on the edge and on the ray
+            u_edge = (ray_x * dy - ray_y * dx) / d
+            u_ray = (vx * dy - vy * dx) / d
+            crossings += (u_edge >= 0) & (u_edge <= 1) & (u_ray >= 0)
+    in_bounds = (x >= x1.min()) & (x <= x1.max()) & (y >= y1.min()) & (y <= y1.max())
+    return in_bounds & (crossings % 2 == 1)
+
+
+def _vertices(polygon) -> np.ndarray:
+    """Convert a ladybug polygon made of lines and polylines to an array of vertices."""
+    joined = PolygonPMV._lines_to_polygon(polygon, 0.01)
+    vertices = np.array([(pt.x, pt.y) for pt in joined.vertices], dtype=np.float64)
+    vertices.flags.writeable = False
+    return vertices
+
+
+@lru_cache(maxsize=16)
+def _polygon_pmv(pressure: float) -> PolygonPMV:
+    """A PolygonPMV with the default comfort parameters for a pressure.
+
+    The chart has a single data point since only its geometry is used.
+    """
+    chart = PsychrometricChart(
+        20, 50, average_pressure=pressure, base_point=Point2D(MIN_TEMPERATURE, 0),
+        y_dim=1, min_temperature=MIN_TEMPERATURE, max_temperature=MAX_TEMPERATURE,
+        max_humidity_ratio=MAX_HUMIDITY_RATIO
+    )
+    return PolygonPMV(chart)
+
+
+@lru_cache(maxsize=16)
+def chart_lines(pressure: float) -> Tuple[List, List, List]:
+    """Get the relative humidity, enthalpy, temperature and humidity ratio lines.
+
+    Returns:
+        A tuple of the x coordinates, the y coordinates and the hover text of all the
+        lines. The lines are separated by None so they can be drawn as one trace.
+    """
+    with _geometry_lock:
+        chart = _polygon_pmv(pressure).psychrometric_chart
+        lines = [
+            (chart.rh_lines, ['RH ' + label + '%' for label in chart.rh_labels]),
+            (chart.enthalpy_lines,
+             ['Enthalpy ' + label for label in chart.enthalpy_labels]),
+            (chart.temperature_lines,
+             ['Temperature ' + label + ' C' for label in chart.temperature_labels]),
+            (chart.hr_lines, ['Humidity Ratio ' + label for label in chart.hr_labels])
+        ]
+        x, y, text = [], [], []
+        for geometries, labels in lines:
+            for geometry, label in zip(geometries, labels):
+                for pt in geometry.vertices:
+                    x.append(pt.x)
+                    y.append(pt.y)
+                    text.append(label)
+                x.append(None)
+                y.append(None)
+                text.append(None)
+    return x, y, text
+
+
+@lru_cache(maxsize=16)
+def comfort_limits(pressure: float) -> Tuple[float, float, float]:
+    """Get the minimum and the maximum temperature and the maximum humidity ratio of
+    the merged comfort polygon."""
+    with _geometry_lock:
+        pmv = _polygon_pmv(pressure)
+        comfort = pmv.merged_comfort_polygon
+        min_temperature = pmv._x_to_t(comfort[0][-1].x)[1]
+        max_temperature = pmv._x_to_t(comfort[2][0].x)[1]
+        return min_temperature, max_temperature, comfort[0][0].y
+
+
+@lru_cache(maxsize=64)
+def strategy_polygons(strategies: Tuple[str], pressure: float,
+                      parameters: StrategyParameters = StrategyParameters()
+                      ) -> Dict[str, np.ndarray]:
+    """Get the vertices of the polygons for a set of strategies.
+
+    The passive solar heating polygon depends on the data. See passive_solar_polygon.
+
+    Args:
+        strategies: A tuple of the names of the strategies in STRATEGIES.
+        pressure: Atmospheric pressure in Pa.
+        parameters: Parameters of the strategies.
+
+    Returns:
+        A dictionary of the strategy names to an array of vertices. The value is None
+        if the polygon does not fit on the chart.
+    """
+    polygons = {}
+    with _geometry_lock:
+        pmv = _polygon_pmv(pressure)
+        for name in strategies:
+            if name == 'Comfort':
+                polygon = pmv.comfort_polygons[0]
+            elif name == 'Evaporative Cooling':
+                polygon = pmv.evaporative_cooling_polygon()
+            elif name == 'Mass + Night Ventilation':
+                polygon = pmv.night_flush_polygon(parameters.day_above_comfort)
+            elif name == 'Occupant Use of Fans':
+                polygon = pmv.fan_use_polygon(parameters.fan_air_speed)
+            elif name == 'Capture Internal Heat':
+                polygon = pmv.internal_heat_polygon(parameters.balance_temperature)
+            else:
+                continue
+            polygons[name] = _vertices(polygon) if polygon else None
+    return polygons
+
+
+@lru_cache(maxsize=64)
+def passive_solar_polygon(pressure: float, temperature_delta: float,
+                          balance_temperature: float = None) -> np.ndarray:
+    """Get the vertices of the passive solar heating polygon.
+
+    Returns:
+        An array of vertices or None if the polygon does not fit on the chart.
+    """
+    with _geometry_lock:
+        polygon = _polygon_pmv(pressure).passive_solar_polygon(
+            temperature_delta, balance_temperature)
+    return _vertices(polygon) if polygon else None
+
+
+def _past_hours(values: np.ndarray, hours: int, fill: float) -> np.ndarray:
+    """Get the values of the previous hours for each hour with the shape of
+    (values, hours). The first hours don't have previous hours and are set to fill."""
+    past = np.full((len(values), hours), fill, dtype=np.float64)
+    past[hours:] = sliding_window_view(values, hours)[:-1]
+    return past
+
+
+def evaluate_strategies(temperature: np.ndarray, humidity: np.ndarray,
+                        solar: np.ndarray, strategies: Tuple[str], pressure: float,
+                        parameters: StrategyParameters = StrategyParameters()
+                        ) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """Find the hours in each strategy polygon.
+
+    This follows the evaluation of ladybug_comfort.chart.polygonpmv.PolygonPMV.
+
+    Args:
+        temperature: Hourly dry bulb temperature in Celsius for a year.
+        humidity: Hourly humidity ratio.
+        solar: Hourly global horizontal radiation for the passive solar heating.
+        strategies: A tuple of the names of the strategies in STRATEGIES.
+        pressure: Atmospheric pressure in Pa.
+        parameters: Parameters of the strategies.
+
+    Returns:
+        A list of tuples with the name of the strategy, the vertices of the polygon
+        and a boolean array of the hours in the polygon. The strategies that do not
+        fit on the chart are not included.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    x = chart_x(temperature)
+    polygons = strategy_polygons(tuple(strategies), pressure, parameters)
+    time_constant = int(parameters.time_constant)
+    results = []
+    for name in strategies:
+        if name == 'Passive Solar Heating':
+            min_temperature, _, max_humidity = comfort_limits(pressure)
+            balance = parameters.balance_temperature \
+                if 'Capture Internal Heat' in strategies else None
+            balance_temperature = max(
+                balance if balance is not None else min_temperature, 5)
+            comfort = points_in_polygon(
+                x, humidity, strategy_polygons(('Comfort',), pressure)['Comfort'])
+            # solar heat collected over the time constant. The recent hours count more.
+            weights = np.arange(1, time_constant + 1) / time_constant
+            past = _past_hours(np.asarray(solar, dtype=np.float64), time_constant, 0)
+            solar_heat = past @ weights
+            delta = balance_temperature - temperature
+            hours = ~comfort & (humidity <= max_humidity) & \
+                (temperature <= balance_temperature) & \
+                (solar_heat > parameters.solar_heating_capacity * delta)
+            max_delta = float(delta[hours].max()) if hours.any() else 20.0
+            vertices = passive_solar_polygon(pressure, round(max_delta, 2), balance)
+        else:
+            vertices = polygons.get(name)
+            if vertices is None:
+                continue
+            hours = points_in_polygon(x, humidity, vertices)
+            if name == 'Mass + Night Ventilation':
+                # the night before should be cool enough to flush the building
+                _, max_temperature, _ = comfort_limits(pressure)
+                target = max_temperature - parameters.night_below_comfort
+                past = _past_hours(temperature, time_constant, np.inf)
+                hours &= past.min(axis=1) < target
+        if vertices is not None:
+            results.append((name, vertices, hours))
+    return results
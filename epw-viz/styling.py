@@ -0,0 +1,138 @@
+"""Apply a colorset to a figure that is already created.
+
+The figures are created with probe colors instead of the colors of a colorset. The
+probe colors of a colorset with N colors have the same blue value. Their red value
+goes from 0 to 255 along the colorset and their green value goes back and forth
+between 0 and 255 from one color to the next. The charts blend the colors of a
+colorset linearly so the red value of a blended color shows between which two colors
+of the colorset it is and the green value shows where it is between them.
+apply_colors finds these colors in the figure and replaces them with the color at
+the same position of the colorset.
+
+Since the probe colors only depend on the number of colors, a figure that is created
+with them is the same for all the colorsets with the same number of colors and for
+the reversed colorsets. Changing the colorset only needs apply_colors which is much
+faster than creating the figure again.
+"""
+
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from ladybug.color import Color, ColorRange
+from plotly.graph_objects import Figure
+
+# the blue value of the probe colors
+PROBE_BLUE = 7
+
+_HEX = re.compile(r'^#([0-9a-fA-F]{2})([0-9a-fA-F]{2})([0-9a-fA-F]{2})$')
+_RGB = re.compile(r'^rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*(,\s*[\d.]+\s*)?\)$')
+
+
+def probe_colors(count: int) -> List[Color]:
+    """Get the probe colors for a colorset with count colors."""
+    if count < 2:
+        return [Color(0, 0, PROBE_BLUE)] * count
+    return [
+        Color(round(255 * i / (count - 1)), 255 * (i % 2), PROBE_BLUE)
+        for i in range(count)
+    ]
+
+
+class _Recolor:
+    """Replace the probe colors in texts with the colors of a colorset."""
+
+    def __init__(self, colors: Sequence[Color]):
+        colors = list(colors)
+        self.count = len(colors)
+        self.color_range = ColorRange(colors=colors, domain=[0, max(self.count - 1, 1)])
+        self._texts: Dict[str, str] = {}
+
+    def _color(self, red: int, green: int) -> Color:
+        if self.count < 2:
+            return self.color_range.color(0)
+        segments = self.count - 1
+        position = red / 255 * segments
+        # the green value goes up in the even segments and down in the odd ones
+        candidates = []
+        for segment in range(int(position) - 1, int(position) + 2):
+            if 0 <= segment < segments:
+                factor = green / 255 if segment % 2 == 0 else 1 - green / 255
+                candidates.append(segment + factor)
+        # the red value is rounded so it can't tell the two sides of a color of the
+        # colorset apart if they are very close to it. Use the color in between.
+        tolerance = segments / 510
+        close = [p for p in candidates if abs(p - position) <= tolerance]
+        if len(close) > 1:
+            return self.color_range.color(sum(close) / len(close))
+        return self.color_range.color(min(candidates, key=lambda p: abs(p - position)))
+
+    def text(self, text: str) -> str:
+        if text in self._texts:
+            return self._texts[text]
+        new_text = text
+        match = _HEX.match(text)
+        if match:
+            red, green, blue = (int(v, 16) for v in match.groups())
+            if blue == PROBE_BLUE:
+                color = self._color(red, green)
+                new_text = f'#{color.r:02x}{color.g:02x}{color.b:02x}'
+        else:
+            match = _RGB.match(text)
+            if match and int(match.group(3)) == PROBE_BLUE:
+                color = self._color(int(match.group(1)), int(match.group(2)))
+                if match.group(4):
+                    new_text = f'rgba({color.r},{color.g},{color.b}{match.group(4)})'
+                else:
+                    new_text = f'rgb({color.r},{color.g},{color.b})'
+        self._texts[text] = new_text
+        return new_text
+
+    def colors(self, value):
+        """Replace the probe colors in a color input of a figure."""
+        if isinstance(value, str):
+            return self.text(value)
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind in 'OU':
+                return np.array([self.colors(v) for v in value.tolist()], dtype=object)
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.colors(v) for v in value)
+        return value
+
+    def value(self, value):
+        """Replace the probe colors in the color inputs of a dictionary of a figure."""
+        if isinstance(value, dict):
+            return {
+                k: self.colors(v) if 'color' in k else self.value(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+            return type(value)(self.value(v) for v in value)
+        return value
+
+
+def apply_colors(figure: Figure, colors: Sequence[Color]) -> Figure:
+    """Create a copy of a figure with the probe colors replaced by a colorset.
+
+    Args:
+        figure: A figure that is created with the probe_colors of the same number of
+            colors as colors.
+        colors: The colors of the colorset.
+
+    Returns:
+        A new figure. The input figure is not changed.
+    """
+    recolor = _Recolor(colors)
+    data = figure.to_plotly_json()
+    layout = dict(data.get('layout', {}))
+    # the template never has the probe colors
+    template = layout.pop('template', None)
+    layout = recolor.value(layout)
+    if template is not None:
+        layout['template'] = template
+    return Figure(
+        {'data': recolor.value(data['data']), 'layout': layout,
+         'frames': data.get('frames', [])}
+    )
@@ -0,0 +1,424 @@
+"""Multi-year weather series that are kept on disk instead of in data collections.
+
+A series is one or more EPW files or CSV files with the same columns as the hourly
+data of an EPW file such as the actual meteorological years of a station. The files
+are parsed in chunks of CHUNK_HOURS rows and every field is appended to its own binary
+file so the hourly values of a series are a column store on disk that is read with
+np.memmap. The whole series is never loaded in memory.
+
+The sum, the count, the minimum and the maximum of every field for each hour of each
+month of each year are updated chunk by chunk while the files are parsed. The yearly
+and the monthly statistics are combined from this table so the charts never go
+through the hourly values. The heating and the cooling degree-hours for
+BASE_TEMPERATURES are accumulated in the same way.
+
+The values are used as they are in the files. Unlike EPWData, the point in time values
+are not moved by an hour so each value stays in the year of its row.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from aggregation import STATISTICS
+from degree_time import BASE_TEMPERATURES, degree_hours
+
+SERIES_FOLDER = pathlib.Path('./data/series')
+# number of rows to parse at once
+CHUNK_HOURS = 24 * 365
+# number of lines before the hourly data of an EPW file
+HEADER_LINES = 8
+TIME_COLUMNS = ('year', 'month', 'day', 'hour')
+# the EPW fields that are numbers after the date, the time and the uncertainty flags
+DATA_FIELDS = tuple(range(6, 35))
+DRY_BULB_TEMPERATURE = 6
+# number of series to keep in memory and on disk
+MAX_CACHED_SERIES = 4
+MAX_STORED_SERIES = 16
+
+_series = OrderedDict()
+_series_lock = threading.Lock()
+
+Source = Union[str, pathlib.Path, BinaryIO]
+
+
+class _RunningTable:
+    """Sums, counts, minimums and maximums of groups of hours that are updated chunk by
+    chunk.
+
+    Args:
+        rows: Number of rows of the values.
+        extremes: A boolean to also keep the minimums and the maximums.
+    """
+
+    def __init__(self, rows: int, extremes: bool = True):
+        self.extremes = extremes
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros((rows, 0))
+        self.count = np.zeros(0, dtype=np.int64)
+        self.minimum = np.zeros((rows, 0))
+        self.maximum = np.zeros((rows, 0))
+
+    def _grow(self, keys: np.ndarray) -> None:
+        """Add the empty groups of the keys that are not in the table yet."""
+        all_keys = np.union1d(self.keys, keys)
+        if len(all_keys) == len(self.keys):
+            return
+        index = np.searchsorted(all_keys, self.keys)
+        rows = self.total.shape[0]
+        for name, fill in (('total', 0), ('minimum', np.inf), ('maximum', -np.inf)):
+            table = np.full((rows, len(all_keys)), fill, dtype=np.float64)
+            table[:, index] = getattr(self, name)
+            setattr(self, name, table)
+        count = np.zeros(len(all_keys), dtype=np.int64)
+        count[index] = self.count
+        self.keys, self.count = all_keys, count
+
+    def add(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Add hourly values with the shape of (rows, hours) to the groups of keys."""
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[:, order].astype(np.float64)
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        self._grow(keys[starts])
+        index = np.searchsorted(self.keys, keys[starts])
+        self.total[:, index] += np.add.reduceat(values, starts, axis=1)
+        self.count[index] += np.diff(np.append(starts, len(keys)))
+        if self.extremes:
+            self.minimum[:, index] = np.minimum(
+                self.minimum[:, index], np.minimum.reduceat(values, starts, axis=1))
+            self.maximum[:, index] = np.maximum(
+                self.maximum[:, index], np.maximum.reduceat(values, starts, axis=1))
+
+    def combine(self, divisor: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Combine the groups that have the same key // divisor.
+
+        Returns:
+            A tuple with the new keys and an array with the shape of
+            (statistics, rows, keys).
+        """
+        coarse = self.keys // divisor
+        starts = np.flatnonzero(np.diff(coarse, prepend=-1))
+        total = np.add.reduceat(self.total, starts, axis=1)
+        count = np.add.reduceat(self.count, starts)
+        return coarse[starts], np.stack([
+            total / count, total,
+            np.minimum.reduceat(self.minimum, starts, axis=1),
+            np.maximum.reduceat(self.maximum, starts, axis=1)
+        ])
+
+    def save(self) -> Dict[str, np.ndarray]:
+        return {'keys': self.keys, 'total': self.total, 'count': self.count,
+                'minimum': self.minimum, 'maximum': self.maximum}
+
+    @classmethod
+    def load(cls, arrays: Dict[str, np.ndarray], extremes: bool = True):
+        table = cls(arrays['total'].shape[0], extremes)
+        for name in ('keys', 'total', 'count', 'minimum', 'maximum'):
+            setattr(table, name, arrays[name])
+        return table
+
+
+@contextmanager
+def _open_source(source: Source):
+    if isinstance(source, (str, pathlib.Path)):
+        with open(source, 'rb') as inf:
+            yield inf
+    else:
+        source.seek(0)
+        yield source
+        source.seek(0)
+
+
+def _source_hash(source: Source) -> str:
+    sha256 = hashlib.sha256()
+    with _open_source(source) as inf:
+        for block in iter(lambda: inf.read(1024 ** 2), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _skip_rows(inf: BinaryIO) -> int:
+    """Get the number of lines before the hourly data of an EPW file or a CSV file."""
+    first_line = inf.readline()
+    inf.seek(0)
+    if first_line.startswith(b'LOCATION'):
+        return HEADER_LINES
+    # a CSV file can have a row of column names
+    first_cell = first_line.split(b',')[0].strip()
+    return 0 if first_cell.lstrip(b'-').isdigit() else 1
+
+
+def _read_chunks(source: Source):
+    """Parse the hourly data of a file in chunks.
+
+    Yields:
+        A tuple with the year, the month, the day and the hour of each row and an
+        array of the values of DATA_FIELDS with the shape of (fields, rows).
+    """
+    columns = list(range(len(TIME_COLUMNS))) + list(DATA_FIELDS)
+    with _open_source(source) as inf:
+        skip_rows = _skip_rows(inf)
+        try:
+            reader = pd.read_csv(
+                inf, header=None, skiprows=skip_rows, usecols=columns,
+                chunksize=CHUNK_HOURS, encoding='latin-1', skip_blank_lines=True
+            )
+            for chunk in reader:
+                times = chunk[columns[:len(TIME_COLUMNS)]].to_numpy(dtype=np.int64).T
+                values = chunk[list(DATA_FIELDS)].to_numpy(dtype=np.float32).T
+                yield times, values
+        except (ValueError, pd.errors.ParserError) as error:
+            raise ValueError(
+                f'{getattr(source, "name", source)} does not have the columns of the'
+                f' hourly data of an EPW file: {error}'
+            ) from error
+
+
+def _ingest(sources: Sequence[Source], names: Sequence[str],
+            folder: pathlib.Path) -> None:
+    """Parse the files of a series and write the columns and the tables in a folder."""
+    statistics = _RunningTable(len(DATA_FIELDS))
+    degree_time = _RunningTable(2 * len(BASE_TEMPERATURES), extremes=False)
+    outputs = {
+        name: open(folder.joinpath(f'{name}.i16'), 'wb') for name in TIME_COLUMNS
+    }
+    outputs.update(
+        {field: open(folder.joinpath(f'{field}.f32'), 'wb') for field in DATA_FIELDS})
+    hours = 0
+    try:
+        for source in sources:
+            for times, values in _read_chunks(source):
+                year, month, _, hour = times
+                if not (np.all((month >= 1) & (month <= 12)) and
+                        np.all((hour >= 1) & (hour <= 24))):
+                    raise ValueError(
+                        f'{getattr(source, "name", source)} has months or hours out of'
+                        ' range.')
+                for name, column in zip(TIME_COLUMNS, times):
+                    outputs[name].write(column.astype(np.int16).tobytes())
+                for field, column in zip(DATA_FIELDS, values):
+                    outputs[field].write(column.tobytes())
+
+                months = year * 12 + month - 1
+                statistics.add(months * 24 + hour - 1, values)
+                temperature = values[DATA_FIELDS.index(DRY_BULB_TEMPERATURE)]
+                degree_time.add(months, np.concatenate([
+                    degree_hours(temperature, BASE_TEMPERATURES, heating)
+                    for heating in (True, False)
+                ]))
+                hours += len(year)
+    finally:
+        for output in outputs.values():
+            output.close()
+
+    if hours == 0:
+        raise ValueError('The files have no hourly data.')
+    np.savez(folder.joinpath('statistics.npz'), **statistics.save())
+    np.savez(folder.joinpath('degree_time.npz'), **degree_time.save())
+    folder.joinpath('series.json').write_text(
+        json.dumps({'hours': hours, 'names': list(names)}))
+
+
+class WeatherSeries:
+    """An hourly weather series on disk with its yearly and monthly statistics.
+
+    Args:
+        folder: Path to the folder of a series that is created by load_series.
+    """
+
+    def __init__(self, folder: pathlib.Path):
+        self.folder = pathlib.Path(folder)
+        info = json.loads(self.folder.joinpath('series.json').read_text())
+        self.hours = info['hours']
+        self.names = info['names']
+        with np.load(self.folder.joinpath('statistics.npz')) as arrays:
+            self._statistics = _RunningTable.load(dict(arrays))
+        with np.load(self.folder.joinpath('degree_time.npz')) as arrays:
+            self._degree_time = _RunningTable.load(dict(arrays), extremes=False)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+        self.years = np.unique(self._statistics.keys // (12 * 24))
+
+    def __str__(self) -> str:
+        # the name of the folder is the SHA-256 of the files so it is also used in the
+        # keys of the figures
+        return self.folder.name
+
+    def column(self, field: int) -> np.memmap:
+        """Get the hourly values of a field as a read-only array on disk."""
+        return np.memmap(self.folder.joinpath(f'{field}.f32'), dtype=np.float32,
+                         mode='r', shape=(self.hours,))
+
+    def time_column(self, name: str) -> np.memmap:
+        """Get one of the TIME_COLUMNS as a read-only array on disk."""
+        return np.memmap(self.folder.joinpath(f'{name}.i16'), dtype=np.int16,
+                         mode='r', shape=(self.hours,))
+
+    def _table(self, divisor: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            if divisor not in self._tables:
+                self._tables[divisor] = self._statistics.combine(divisor)
+            return self._tables[divisor]
+
+    def _values(self, field: int, statistic: str, divisor: int,
+                size: int) -> np.ndarray:
+        """Place the statistic of the groups in an array of size values for each year.
+
+        The groups that have no hours are NaN.
+        """
+        keys, table = self._table(divisor)
+        values = np.full(len(self.years) * size, np.nan)
+        year_index = np.searchsorted(self.years, keys // size)
+        values[year_index * size + keys % size] = \
+            table[STATISTICS.index(statistic), DATA_FIELDS.index(field)]
+        return values.reshape(len(self.years), size)
+
+    def hours_per_year(self) -> np.ndarray:
+        """Get the number of hours of each year of the series."""
+        return np.bincount(
+            np.searchsorted(self.years, self._statistics.keys // (12 * 24)),
+            weights=self._statistics.count, minlength=len(self.years)
+        ).astype(np.int64)
+
+    def yearly(self, field: int, statistic: str = 'average') -> np.ndarray:
+        """Get a statistic of a field for each year.
+
+        Args:
+            field: EPW field number.
+            statistic: One of the STATISTICS of aggregation.
+
+        Returns:
+            An array with the shape of (years,).
+        """
+        return self._values(field, statistic, 12 * 24, 1)[:, 0]
+
+    def monthly(self, field: int, statistic: str = 'average') -> np.ndarray:
+        """Get a statistic of a field for each month of each year.
+
+        Returns:
+            An array with the shape of (years, 12).
+        """
+        return self._values(field, statistic, 24, 12)
+
+    def monthly_per_hour(self, field: int, statistic: str = 'average') -> np.ndarray:
+        """Get a statistic of a field for each hour of the day of each month of each
+        year.
+
+        Returns:
+            An array with the shape of (years, 12, 24).
+        """
+        return self._values(field, statistic, 1, 12 * 24).reshape(-1, 12, 24)
+
+    def degree_days(self, heat_base: float,
+                    cool_base: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the heating and the cooling degree-days of each year in degC-days.
+
+        The degree-days are read from the table of BASE_TEMPERATURES if the base
+        temperatures are in it. Otherwise, the dry bulb temperature is read from disk
+        in chunks.
+
+        Returns:
+            A tuple with the heating and the cooling degree-days with the shape of
+            (years,).
+        """
+        year_index = np.searchsorted(self.years, self._degree_time.keys // 12)
+        results = []
+        for row, base, heating in ((0, heat_base, True),
+                                   (len(BASE_TEMPERATURES), cool_base, False)):
+            index = np.flatnonzero(np.isclose(BASE_TEMPERATURES, base))
+            if len(index):
+                results.append(np.bincount(
+                    year_index, weights=self._degree_time.total[row + index[0]],
+                    minlength=len(self.years)) / 24)
+            else:
+                results.append(self._degree_days(base, heating))
+        return results[0], results[1]
+
+    def _degree_days(self, base: float, heating: bool) -> np.ndarray:
+        temperature = self.column(DRY_BULB_TEMPERATURE)
+        years = self.time_column('year')
+        totals = np.zeros(len(self.years))
+        for start in range(0, self.hours, CHUNK_HOURS):
+            hourly = degree_hours(temperature[start:start + CHUNK_HOURS], [base], heating)
+            totals += np.bincount(
+                np.searchsorted(self.years, years[start:start + CHUNK_HOURS]),
+                weights=hourly[0], minlength=len(self.years))
+        return totals / 24
+
+
+def _evict() -> None:
+    """Remove the least recently used series until there are MAX_STORED_SERIES."""
+    folders = [path for path in SERIES_FOLDER.iterdir()
+               if path.joinpath('series.json').is_file()]
+    folders.sort(key=lambda path: path.stat().st_mtime)
+    for path in folders[:-MAX_STORED_SERIES]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_series(sources: Sequence[Source], names: Sequence[str]) -> WeatherSeries:
+    """Load a multi-year series from EPW files or CSV files.
+
+    The files are parsed once and are kept on disk in a folder that is named after the
+    SHA-256 of their contents so the series are shared between the sessions.
+
+    Args:
+        sources: Paths to the files or binary file objects in the order of the series.
+        names: A name for each file.
+
+    Returns:
+        A WeatherSeries object.
+    """
+    key = hashlib.sha256(
+        '\n'.join(_source_hash(source) for source in sources).encode('utf-8')
+    ).hexdigest()
+    with _series_lock:
+        if key in _series:
+            _series.move_to_end(key)
+            return _series[key]
+
+    folder = SERIES_FOLDER.joinpath(key)
+    if not folder.joinpath('series.json').is_file():
+        SERIES_FOLDER.mkdir(parents=True, exist_ok=True)
+        # each ingestion uses its own folder so the other sessions never read a
+        # partial series
+        temp_folder = pathlib.Path(tempfile.mkdtemp(dir=SERIES_FOLDER, suffix='.tmp'))
+        try:
+            _ingest(sources, names, temp_folder)
+            os.replace(temp_folder, folder)
+        except OSError:
+            # another session saved the same series first
+            if not folder.joinpath('series.json').is_file():
+                raise
+        finally:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+        _evict()
+    # update the modified time so the series is the last one to be removed
+    os.utime(folder, (time.time(), time.time()))
+
+    series = WeatherSeries(folder)
+    with _series_lock:
+        _series[key] = series
+        while len(_series) > MAX_CACHED_SERIES:
+            _series.popitem(last=False)
+    return series
+
+
+def field_statistics(series: WeatherSeries, field: int) -> pd.DataFrame:
+    """Create a table of the yearly statistics of a field."""
+    table = pd.DataFrame({'Hours': series.hours_per_year()},
+                         index=pd.Index(series.years, name='Year'))
+    for statistic in STATISTICS:
+        table[statistic.capitalize()] = series.yearly(field, statistic).round(2)
+    return table
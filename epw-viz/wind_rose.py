@@ -0,0 +1,148 @@
+"""Wind rose histograms for any analysis period from cumulative count tables.
+
+Each hour of the EPW file is assigned a direction bin and a wind speed bin once. The
+counts of the bins are then accumulated over the days of the year and the hours of the
+day. The histogram for a range of days and a range of hours is the difference of four
+rows of this table so changing the analysis period of the wind rose does not go
+through the hourly data again.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+
+from epw_data import EPWData
+
+# number of direction bins. The first bin is centered on north.
+DIRECTION_COUNT = 16
+DIRECTION_NAMES = (
+    'North', 'N-N-E', 'N-E', 'E-N-E', 'East', 'E-S-E', 'S-E', 'S-S-E',
+    'South', 'S-S-W', 'S-W', 'W-S-W', 'West', 'W-N-W', 'N-W', 'N-N-W'
+)
+# number of wind speed values that split the speed bins which is the default number
+# of segments of a ladybug legend
+SPEED_SEGMENT_COUNT = 11
+# number of speed bins between the speed values
+SPEED_BIN_COUNT = SPEED_SEGMENT_COUNT - 1
+# number of WindHistogram objects to keep in memory. Each one is about 7 MB.
+MAX_CACHED_HISTOGRAMS = 8
+
+_histograms = OrderedDict()
+_histograms_lock = threading.Lock()
+
+
+class WindHistogram:
+    """Cumulative counts of the wind direction and speed bins of a year.
+
+    The speed bins are similar to the wind rose of ladybug_charts. The edges are
+    SPEED_SEGMENT_COUNT values from the lowest speed that is not zero to the highest
+    speed of the year and each bin includes its upper edge. The last bin also has the
+    speeds that are above its edge after the edges are rounded. The hours with no wind
+    are calm and are not in any bin but they count towards the total number of hours.
+
+    Args:
+        direction: Hourly wind direction in degrees for a year.
+        speed: Hourly wind speed for a year.
+    """
+
+    def __init__(self, direction: np.ndarray, speed: np.ndarray):
+        direction = np.asarray(direction, dtype=np.float64)
+        speed = np.asarray(speed, dtype=np.float64)
+        self.days = len(speed) // 24
+        self.bin_count = DIRECTION_COUNT * (SPEED_BIN_COUNT + 1)
+        self.speed_edges = np.linspace(
+            speed[speed > 0].min(), speed.max(), SPEED_SEGMENT_COUNT).round(2)
+
+        step = 360 / DIRECTION_COUNT
+        direction_ids = np.floor((direction + step / 2) % 360 / step).astype(np.int64)
+        # 0 is for the calm hours and the bins start from 1
+        speed_ids = np.clip(
+            np.searchsorted(self.speed_edges, speed, side='left'), 1, SPEED_BIN_COUNT)
+        speed_ids[speed <= 0] = 0
+        bin_ids = direction_ids * (SPEED_BIN_COUNT + 1) + speed_ids
+
+        # counts of each bin for each hour with the shape of (days, hours, bins)
+        hours = self.days * 24
+        flat = np.arange(hours) * self.bin_count + bin_ids[:hours]
+        counts = np.bincount(flat, minlength=hours * self.bin_count).reshape(
+            self.days, 24, self.bin_count)
+        self._table = np.zeros((self.days + 1, 25, self.bin_count), dtype=np.int32)
+        self._table[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+
+    def _count(self, st_day: int, end_day: int, st_hour: int,
+               end_hour: int) -> np.ndarray:
+        """Count the bins for a range of days and a range of hours of the day."""
+        if st_day > end_day or st_hour > end_hour:
+            return np.zeros(self.bin_count, dtype=np.int32)
+        table = self._table
+        return table[end_day + 1, end_hour + 1] - table[st_day, end_hour + 1] - \
+            table[end_day + 1, st_hour] + table[st_day, st_hour]
+
+    def _count_hoys(self, st_hoy: int, end_hoy: int, st_hour: int,
+                    end_hour: int) -> np.ndarray:
+        """Count the bins for a range of hours of the year and a range of hours of the
+        day."""
+        st_day, st_day_hour = divmod(st_hoy, 24)
+        end_day, end_day_hour = divmod(end_hoy, 24)
+        if st_day == end_day:
+            return self._count(st_day, st_day, max(st_hour, st_day_hour),
+                               min(end_hour, end_day_hour))
+        # the first day, the whole days in between and the last day
+        return self._count(st_day, st_day, max(st_hour, st_day_hour), end_hour) + \
+            self._count(st_day + 1, end_day - 1, st_hour, end_hour) + \
+            self._count(end_day, end_day, st_hour, min(end_hour, end_day_hour))
+
+    def histogram(self, st_hoy: int, end_hoy: int, st_hour: int,
+                  end_hour: int) -> Tuple[np.ndarray, int]:
+        """Get the histogram for an analysis period.
+
+        The hours are the same as the hours of a ladybug AnalysisPeriod that starts
+        at st_hoy and ends at end_hoy including the periods that go over the end of
+        the year and the hours that go over midnight.
+
+        Args:
+            st_hoy: Start hour of the year.
+            end_hoy: End hour of the year.
+            st_hour: Start hour of the day.
+            end_hour: End hour of the day.
+
+        Returns:
+            A tuple with an array of counts with the shape of (directions, speed bins)
+            and the total number of hours in the period including the calm hours.
+        """
+        last_hoy = self.days * 24 - 1
+        hoys = [(st_hoy, end_hoy)] if st_hoy <= end_hoy else \
+            [(st_hoy, last_hoy), (0, end_hoy)]
+        hours = [(st_hour, end_hour)] if st_hour <= end_hour else \
+            [(st_hour, 23), (0, end_hour)]
+        counts = sum(
+            self._count_hoys(st, end, hour_st, hour_end)
+            for st, end in hoys for hour_st, hour_end in hours
+        )
+        counts = counts.reshape(DIRECTION_COUNT, SPEED_BIN_COUNT + 1)
+        return counts[:, 1:], int(counts.sum())
+
+    def speed_labels(self, unit: str) -> List[str]:
+        """Get the labels of the speed bins in the same format as ladybug_charts."""
+        edges = [float(v) for v in self.speed_edges]
+        return [f'{left} - {right} {unit}' for left, right in zip(edges[:-1], edges[1:])]
+
+
+def wind_histogram(epw: EPWData) -> WindHistogram:
+    """Get the WindHistogram of an EPW file.
+
+    The histograms are cached by the SHA-256 of the EPW file.
+    """
+    with _histograms_lock:
+        if epw.sha256 in _histograms:
+            _histograms.move_to_end(epw.sha256)
+            return _histograms[epw.sha256]
+
+    histogram = WindHistogram(epw.collection_values(20), epw.collection_values(21))
+    with _histograms_lock:
+        _histograms[epw.sha256] = histogram
+        while len(_histograms) > MAX_CACHED_HISTOGRAMS:
+            _histograms.popitem(last=False)
+    return histogram
@@ -1,14 +1,14 @@
 """Pollination outdoor comfort app."""
 
-import pathlib
 import streamlit as st
 
-from ladybug.epw import EPW
 from ladybug.color import Colorset
 from ladybug.analysisperiod import AnalysisPeriod
 
+from epw_upload import load_epw
 from helper import get_comfort_objs_and_title, get_legend_info, get_data, \
     get_figure_config, write_pdf
+from styling import apply_colors, probe_colors
 
 # make it look good by setting up the title, icon, etc.
 st.set_page_config(
@@ -29,14 +29,8 @@ def main():
         # epw file
         with st.expander('Upload an EPW file'):
             epw_data = st.file_uploader('', type='epw')
-            if epw_data:
-                epw_file = pathlib.Path('./data/sample.epw')
-                epw_file.parent.mkdir(parents=True, exist_ok=True)
-                epw_file.write_bytes(epw_data.read())
-            else:
-                epw_file = './assets/sample.epw'
-
-            epw = EPW(epw_file)
+            # the uploads are parsed in memory so the sessions never share a file
+            epw = load_epw(epw_data if epw_data else './assets/sample.epw')
 
         # analysis period
         with st.expander('Apply analysis period'):
@@ -160,14 +154,17 @@ def main():
         comf_objs, title_scenario = get_comfort_objs_and_title(scenario, epw)
 
         # generate figures, text to show on the side and the result texts to go into report
+        # the figures are created with the probe colors and the colorset is applied to
+        # a copy of them so changing the colorset doesn't create them again
         result = get_data(
             analysis_type, comf_objs, title_scenario, lb_ap, conditional_statement,
-            colorset)
+            probe_colors(len(colorset)))
 
         if isinstance(result, str):
             st.error(result)
         else:
             figures, percentage_html_objs, result_txts = result
+            figures = [apply_colors(figure, colorset) for figure in figures]
 
             # add figures and text on the side
             for count, figure in enumerate(figures):
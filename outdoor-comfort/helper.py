@@ -15,10 +15,13 @@ from ladybug.color import Colorset, Color
 from ladybug.epw import EPW
 from ladybug_comfort.collection.utci import UTCI
 
+from epw_upload import epw_sha256
+from masks import analysis_period_mask, statement_mask, filter_collection
+
 
 def epw_hash_func(epw: EPW) -> str:
     """Function to help streamlit hash an EPW object."""
-    return epw.location.city
+    return epw_sha256(epw)
 
 
 def utci_hash_func(utci: UTCI) -> float:
@@ -133,14 +136,22 @@ def get_figure_and_percentage(
     # prepare figure
     title = f'{scenario}'
 
+    mask = None
     if analysis_period:
-        hourly_data = hourly_data.filter_by_analysis_period(analysis_period)
+        ap = analysis_period
+        mask = analysis_period_mask(ap.st_month, ap.st_day, ap.st_hour, ap.end_month,
+                                    ap.end_day, ap.end_hour, ap.is_leap_year)
 
     if conditional_statement:
         try:
-            hourly_data = hourly_data.filter_by_conditional_statement(
-                conditional_statement)
-        except AssertionError:
+            statement = statement_mask(hourly_data.values, conditional_statement)
+        except ValueError:
+            return 'Invalid conditional statement.'
+        mask = statement if mask is None else mask & statement
+
+    if mask is not None:
+        hourly_data = filter_collection(hourly_data, mask, analysis_period)
+        if hourly_data is None:
             return 'No values found for that conditional statement.'
 
     figure = hourly_data.heat_map(title=title, show_title=True,
@@ -240,7 +251,8 @@ def get_data(analysis_type: str, comf_objs: List[UTCI],
         title_scenario: Dictionary with the title of each scenario.
         lb_ap: Ladybug analysis period object.
         conditional_statement: Conditional statement to filter data. Default is None.
-        colorset: Ladybug Colorset to be used to color the figure.
+        colorset: Ladybug Colorset to be used to color the figure. Use the probe
+            colors of styling.probe_colors to apply the colorset later.
 
     Returns:
         A tuple of three elements
@@ -0,0 +1,247 @@
+"""Vectorized masks for the conditional statements and the analysis periods.
+
+ladybug filters the data collections one value at a time and evaluates the conditional
+statement with ``eval`` for every hour. Here the conditional statement is compiled once
+to a function that evaluates it on a NumPy array and the analysis period is turned into
+a boolean array of hours. Both are cached so every chart can reuse them.
+
+A conditional statement uses the same syntax as ladybug. The values are named ``a``
+and the statement can use numbers, the comparison operators, ``and``, ``or``, ``not``
+and the arithmetic operators. For example ``a > 20 and a < 30`` or ``a % 5 == 0``.
+
+The numbers are evaluated as 64-bit floats so a large power like ``9 ** 9 ** 9`` can't
+hang the app with a huge integer. A statement raises a ValueError if it divides by zero
+or overflows for any of the values where ladybug raises an error.
+"""
+
+import ast
+import operator
+from functools import lru_cache
+from typing import Callable, Tuple
+
+import numpy as np
+
+from ladybug.datacollection import HourlyContinuousCollection, \
+    HourlyDiscontinuousCollection
+from ladybug.analysisperiod import AnalysisPeriod
+
+
+def _checked_division(func: Callable) -> Callable:
+    """Raise a ValueError for a division by zero instead of returning inf or NaN."""
+    def divide(left, right):
+        if np.any(np.asarray(right) == 0):
+            raise ValueError('Division by zero in the conditional statement.')
+        return func(left, right)
+    return divide
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: _checked_division(operator.truediv),
+    ast.FloorDiv: _checked_division(operator.floordiv),
+    ast.Mod: _checked_division(operator.mod),
+    ast.Pow: operator.pow
+}
+
+_COMPARE_OPERATORS = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: np.logical_not
+}
+
+_DAYS_EACH_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_DAYS_EACH_MONTH_LEAP = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _compile_node(node: ast.AST) -> Callable:
+    """Compile an AST node to a function of the values."""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Name):
+        if node.id != 'a':
+            raise ValueError(f'Invalid variable name: {node.id}. Use a for the values.')
+        return lambda a: a
+
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif type(node).__name__ == 'Num':
+        # numbers are parsed as ast.Num before Python 3.8
+        value = node.n
+    else:
+        value = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            value = np.float64(value)
+        except OverflowError as e:
+            raise ValueError(f'Number is too large: {value}') from e
+        return lambda a: value
+
+    if isinstance(node, ast.BoolOp):
+        func = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        values = [_compile_node(v) for v in node.values]
+
+        def bool_op(a):
+            result = values[0](a)
+            for value in values[1:]:
+                result = func(result, value(a))
+            return result
+        return bool_op
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        func = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda a: func(operand(a))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        func = _BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda a: func(left(a), right(a))
+
+    if isinstance(node, ast.Compare) and \
+            all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+        # a chained comparison like 20 < a < 30 is 20 < a and a < 30
+        funcs = [_COMPARE_OPERATORS[type(op)] for op in node.ops]
+        operands = [_compile_node(node.left)] + \
+            [_compile_node(c) for c in node.comparators]
+
+        def compare(a):
+            values = [operand(a) for operand in operands]
+            result = funcs[0](values[0], values[1])
+            for func, left, right in zip(funcs[1:], values[1:], values[2:]):
+                result = np.logical_and(result, func(left, right))
+            return result
+        return compare
+
+    raise ValueError(f'Unsupported expression in the conditional statement: '
+                     f'{type(node).__name__}')
+
+
+@lru_cache(maxsize=128)
+def compile_statement(statement: str) -> Callable[[np.ndarray], np.ndarray]:
+    """Compile a conditional statement to a function that works on NumPy arrays.
+
+    Args:
+        statement: A conditional statement as a string (e.g. a > 25 and a % 5 == 0).
+
+    Returns:
+        A function that takes an array of values and returns a boolean array.
+    """
+    try:
+        tree = ast.parse(statement.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'Invalid conditional statement: {statement}') from e
+    func = _compile_node(tree)
+
+    def evaluate(values: np.ndarray) -> np.ndarray:
+        try:
+            with np.errstate(divide='raise', over='raise', invalid='ignore'):
+                result = func(values)
+        except (FloatingPointError, OverflowError) as e:
+            raise ValueError(
+                f'Failed to evaluate the conditional statement: {statement}. {e}'
+            ) from e
+        return np.broadcast_to(np.asarray(result, dtype=bool), np.shape(values))
+    return evaluate
+
+
+def statement_mask(values: np.ndarray, statement: str) -> np.ndarray:
+    """Get a boolean array of the values that meet a conditional statement."""
+    return compile_statement(statement)(np.asarray(values, dtype=np.float64))
+
+
+def analysis_period_hoys(st_month: int = 1, st_day: int = 1, st_hour: int = 0,
+                         end_month: int = 12, end_day: int = 31, end_hour: int = 23,
+                         is_leap_year: bool = False) -> Tuple[int, int]:
+    """Get the first and the last hour of the year of an analysis period.
+
+    The start hour is after the end hour for the analysis periods that go over the
+    end of the year.
+    """
+    days = _DAYS_EACH_MONTH_LEAP if is_leap_year else _DAYS_EACH_MONTH
+    st_month, st_day, st_hour = int(st_month), int(st_day), int(st_hour)
+    end_month, end_day, end_hour = int(end_month), int(end_day), int(end_hour)
+    if not 1 <= st_month <= 12 or not 1 <= end_month <= 12:
+        raise ValueError('Month should be between 1 and 12.')
+    if not 1 <= st_day <= days[st_month - 1]:
+        raise ValueError(f'Invalid day {st_day} for month {st_month}.')
+    if not 0 <= st_hour <= 23 or not 0 <= end_hour <= 23:
+        raise ValueError('Hour should be between 0 and 23.')
+    # ladybug moves an end day that is out of range to the last day of the month
+    end_day = min(end_day, days[end_month - 1])
+
+    st_hoy = (sum(days[:st_month - 1]) + st_day - 1) * 24 + st_hour
+    end_hoy = (sum(days[:end_month - 1]) + end_day - 1) * 24 + end_hour
+    return st_hoy, end_hoy
+
+
+@lru_cache(maxsize=256)
+def analysis_period_mask(st_month: int = 1, st_day: int = 1, st_hour: int = 0,
+                         end_month: int = 12, end_day: int = 31, end_hour: int = 23,
+                         is_leap_year: bool = False) -> np.ndarray:
+    """Get a boolean array of the hours of the year in an analysis period.
+
+    The hours are the same as the hours of ladybug's AnalysisPeriod with the same
+    inputs including the analysis periods that go over the end of the year and the
+    hours that go over midnight.
+
+    Returns:
+        A read-only boolean array with 8760 values or 8784 values for a leap year.
+    """
+    st_hoy, end_hoy = analysis_period_hoys(
+        st_month, st_day, st_hour, end_month, end_day, end_hour, is_leap_year)
+    st_hour, end_hour = int(st_hour), int(end_hour)
+    hoys = np.arange((366 if is_leap_year else 365) * 24)
+    hours = hoys % 24
+
+    if st_hoy <= end_hoy:
+        mask = (hoys >= st_hoy) & (hoys <= end_hoy)
+    else:
+        mask = (hoys >= st_hoy) | (hoys <= end_hoy)
+    if st_hour <= end_hour:
+        mask &= (hours >= st_hour) & (hours <= end_hour)
+    else:
+        mask &= (hours >= st_hour) | (hours <= end_hour)
+    mask.flags.writeable = False
+    return mask
+
+
+def filter_collection(data: HourlyContinuousCollection, mask: np.ndarray,
+                      analysis_period: AnalysisPeriod = None):
+    """Filter an annual hourly data collection with a boolean array.
+
+    Args:
+        data: An annual HourlyContinuousCollection.
+        mask: A boolean array with a value for each hour of the year.
+        analysis_period: The analysis period to set for the filtered data. Default
+            is the analysis period of the data.
+
+    Returns:
+        The same collection if all the hours are in the mask, otherwise an
+        HourlyDiscontinuousCollection. None if no hour is in the mask.
+    """
+    indices = np.flatnonzero(mask)
+    if not len(indices):
+        return None
+    if len(indices) == len(data.values):
+        return data
+    values, datetimes = data.values, data.datetimes
+    header = data.header.duplicate()
+    if analysis_period is not None:
+        header._analysis_period = analysis_period
+    collection = HourlyDiscontinuousCollection(
+        header, [values[i] for i in indices], [datetimes[i] for i in indices]
+    )
+    collection._validated_a_period = True
+    return collection
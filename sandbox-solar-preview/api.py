@@ -0,0 +1,294 @@
+"""Headless API to query the results for the design options without Streamlit.
+
+The results are calculated from the precomputed data in ``sim_data`` using the same
+logic as the app. Use it as a Python module, from the command line or as a local HTTP
+service.
+
+    python api.py results --configuration "Bifacial Solar Fence" --transparency 20 \
+        --location Boise --season Apr Oct
+    python api.py batch requests.json --workers 4 > results.json
+    python api.py serve --port 8000
+
+A batch file is a JSON list of requests with the same keys as the arguments of
+``get_results``. Requests with latitude and longitude instead of a location blend the
+results of the nearest stations. See ``get_blended_results``. The HTTP service
+answers GET requests to ``/results`` with the same keys as query parameters and POST
+requests to ``/batch`` with a JSON list of requests.
+"""
+import argparse
+import json
+import pathlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from blending import blended_results_folder
+from crops import CropResponse
+from economics import calculate_economics, mismatch_loss
+from par import calc_ppfd_clf
+from results import (
+    configuration_index, location_index, read_cec_module, read_ground_irradiance,
+    read_monthly_average, read_panel_irradiance, read_weather, results_folder,
+    season_indices, transparency_index, CONFIGURATIONS, GROUND_ADJUSTMENT, LOCATIONS,
+    MONTHS, TRANSPARENCIES
+)
+
+DEFAULT_SEASON = ('Apr', 'Oct')
+
+
+@lru_cache(maxsize=256)
+def _economics(folder: pathlib.Path, configuration: int, location: int) -> Dict:
+    irradiance = read_panel_irradiance(folder)
+    temperature, wind_speed = read_weather(location, folder)
+    total_electricity, monthly_electricity, adjusted_installed_cost, payback_cash_flow = \
+        calculate_economics(
+            irradiance, temperature, wind_speed, read_cec_module(), configuration
+        )
+    economics = {
+        # NOTE: the value is divided by 30 to match SAM's output
+        'net_ac_electricity': int(total_electricity / 30),
+        'monthly_electricity': [
+            round(float(v), 3) for v in monthly_electricity['Thousand kWh']
+        ],
+        'adjusted_installed_cost': float(adjusted_installed_cost),
+        'payback_cash_flow': [float(v) for v in payback_cash_flow[1:]]
+    }
+    if irradiance.shape[1] > 1:
+        # an estimate that is not included in the electricity values
+        economics['mismatch_loss'] = round(
+            100 * mismatch_loss(irradiance.values, configuration), 2
+        )
+    return economics
+
+
+@lru_cache(maxsize=256)
+def _ground(folder: pathlib.Path):
+    irradiance = read_ground_irradiance(folder).values / GROUND_ADJUSTMENT
+    return irradiance, CropResponse(irradiance)
+
+
+def get_results(configuration, transparency, location, season=DEFAULT_SEASON) -> Dict:
+    """Get the results for a design option.
+
+    Args:
+        configuration: Index or name of the panel configuration. See
+            ``results.CONFIGURATIONS``.
+        transparency: Panel transparency in percent. See ``results.TRANSPARENCIES``.
+        location: Index, name or EPW file name of the location. See
+            ``results.LOCATIONS``.
+        season: A tuple of the start and the end month of the growing season. Months
+            can be names like Apr or indices from 0 to 11. Default is Apr to Oct.
+
+    Returns:
+        A dictionary with the economic outputs, the monthly average irradiance, the
+        PPFD classification of the ground for the growing season and the relative
+        yield for the crops in ``crops.CROPS``.
+    """
+    cfg = configuration_index(configuration)
+    tr = transparency_index(transparency)
+    loc = location_index(location)
+    location_name = [
+        info['value'] for info in LOCATIONS.values() if info['index'] == loc
+    ][0]
+    return {
+        'configuration': CONFIGURATIONS[cfg],
+        'transparency': TRANSPARENCIES[tr],
+        'location': location_name,
+        **_folder_results(results_folder(cfg, tr, loc), cfg, loc, season)
+    }
+
+
+def get_blended_results(configuration, transparency, latitude: float, longitude: float,
+                        season=DEFAULT_SEASON, count: int = 3, power: float = 2) -> Dict:
+    """Get the results for a location by blending the results of the nearest stations.
+
+    See ``blending.blend_results`` for more information.
+
+    Args:
+        configuration: Index or name of the panel configuration.
+        transparency: Panel transparency in percent.
+        latitude: Latitude of the location.
+        longitude: Longitude of the location.
+        season: A tuple of the start and the end month of the growing season.
+        count: Number of stations to blend.
+        power: Power of the inverse distance.
+
+    Returns:
+        A dictionary with the same outputs as ``get_results`` and the list of stations
+        with their distance and weight.
+    """
+    cfg = configuration_index(configuration)
+    tr = transparency_index(transparency)
+    folder = blended_results_folder(
+        cfg, tr, float(latitude), float(longitude), int(count), float(power)
+    )
+    stations = json.loads(folder.joinpath('stations.json').read_text())
+    return {
+        'configuration': CONFIGURATIONS[cfg],
+        'transparency': TRANSPARENCIES[tr],
+        'location': [float(latitude), float(longitude)],
+        'stations': stations,
+        **_folder_results(folder, cfg, stations[0]['index'], season)
+    }
+
+
+def _folder_results(folder: pathlib.Path, configuration: int, location: int,
+                    season) -> Dict:
+    """Calculate the outputs for the results in a folder."""
+    st_index, end_index = season_indices(season)
+    ground, crop_response = _ground(folder)
+    average_values = ground[:, st_index: end_index + 1].mean(axis=1)
+    _, ppfd_classification = calc_ppfd_clf(average_values)
+    field_yield = crop_response.field_yield(st_index, end_index)
+    return {
+        'season': [MONTHS[st_index], MONTHS[end_index]],
+        **_economics(folder, configuration, location),
+        'monthly_average_irradiance': read_monthly_average(folder),
+        'ppfd_classification': ppfd_classification,
+        'relative_yield': {
+            name: round(float(v), 4)
+            for name, v in zip(crop_response.names, np.asarray(field_yield))
+        }
+    }
+
+
+def _get_results(request: Dict) -> Dict:
+    """Get the results for a request and return the error instead of raising it.
+
+    Requests with latitude and longitude are answered using ``get_blended_results``.
+    Any error is caught so one failed request doesn't stop a batch or the service.
+    """
+    try:
+        if 'latitude' in request:
+            return get_blended_results(**request)
+        return get_results(**request)
+    except Exception as e:
+        return {'request': request, 'error': f'{type(e).__name__}: {e}'}
+
+
+def get_batch_results(requests: List[Dict], max_workers: int = 4) -> List[Dict]:
+    """Get the results for a list of requests.
+
+    Args:
+        requests: A list of dictionaries with the arguments of ``get_results`` or
+            ``get_blended_results``.
+        max_workers: Number of workers to calculate the results.
+
+    Returns:
+        A list of results in the same order as the requests. The result for a
+        request that fails is a dictionary with the request and the error message.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_get_results, requests))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    max_workers = 4
+
+    def _send(self, data, status=200):
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/results':
+            return self._send({'error': f'Invalid path: {url.path}'}, 404)
+        request = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if 'season' in request:
+            request['season'] = request['season'].split(',')
+        result = _get_results(request)
+        self._send(result, 400 if 'error' in result else 200)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/batch':
+            return self._send({'error': f'Invalid path: {url.path}'}, 404)
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            requests = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            return self._send({'error': f'Invalid JSON: {e}'}, 400)
+        if not isinstance(requests, list):
+            return self._send({'error': 'The request must be a list.'}, 400)
+        self._send(get_batch_results(requests, self.max_workers))
+
+
+def serve(host: str = '127.0.0.1', port: int = 8000, max_workers: int = 4):
+    """Start a local HTTP service for the results."""
+    _RequestHandler.max_workers = max_workers
+    server = ThreadingHTTPServer((host, port), _RequestHandler)
+    print(f'Serving the results on http://{host}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command')
+
+    results_parser = commands.add_parser('results', help='Get results for one option.')
+    results_parser.add_argument('--configuration', required=True)
+    results_parser.add_argument('--transparency', required=True, type=float)
+    location_group = results_parser.add_mutually_exclusive_group(required=True)
+    location_group.add_argument('--location')
+    location_group.add_argument(
+        '--coordinates', nargs=2, type=float, metavar=('LATITUDE', 'LONGITUDE'),
+        help='Blend the results of the nearest stations for these coordinates.'
+    )
+    results_parser.add_argument('--stations', type=int, default=3)
+    results_parser.add_argument('--season', nargs=2, default=DEFAULT_SEASON)
+
+    batch_parser = commands.add_parser('batch', help='Get results for a JSON file.')
+    batch_parser.add_argument('requests', help='Path to a JSON file or - for stdin.')
+    batch_parser.add_argument('--workers', type=int, default=4)
+
+    serve_parser = commands.add_parser('serve', help='Start a local HTTP service.')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--workers', type=int, default=4)
+
+    args = parser.parse_args(args)
+    if args.command == 'results':
+        request = {
+            'configuration': args.configuration, 'transparency': args.transparency,
+            'season': args.season
+        }
+        if args.coordinates:
+            request['latitude'], request['longitude'] = args.coordinates
+            request['count'] = args.stations
+        else:
+            request['location'] = args.location
+        result = _get_results(request)
+        print(json.dumps(result, indent=2))
+        return 1 if 'error' in result else 0
+    if args.command == 'batch':
+        if args.requests == '-':
+            requests = json.load(sys.stdin)
+        else:
+            with open(args.requests) as inf:
+                requests = json.load(inf)
+        print(json.dumps(get_batch_results(requests, args.workers), indent=2))
+        return 0
+    if args.command == 'serve':
+        serve(args.host, args.port, args.workers)
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,9 @@ import streamlit as st
 import pandas as pd
 from streamlit_elements import Elements
 
-from location import add_map
+from location import add_map, add_epw_upload
 from configuration import add_pv_config
-from explorer import add_parallel_coordinates
+from explorer import add_parallel_coordinates, add_surrogate_explorer
 
 
 st.set_page_config(
@@ -61,7 +61,7 @@ city = st.text_input(
     "Type in the city and the state separated by a comma. Currently, only locations in the United States are supported.",
     "Denver, CO"
 )
-location = add_map(city=city)
+location = add_epw_upload() or add_map(city=city)
 
 # start configuration section
 st.header('2. Panel Configuration')
@@ -77,5 +77,12 @@ fig = add_parallel_coordinates(0)
 # fig = add_parallel_coordinates(location['index'])
 st.plotly_chart(fig, use_container_width=True)
 
+st.write(
+    'Use these sliders to estimate the results for the designs between the sampled '
+    'options. The estimates are calculated using a surrogate model that is trained '
+    'on the sampled options and the values after ± show the uncertainty.'
+)
+add_surrogate_explorer(location['index'])
+
 _, _, logo, _, _ = st.columns(5)
 logo.image('AMC-solarPrize-logo-color_edited.webp')
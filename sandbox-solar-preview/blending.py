@@ -0,0 +1,215 @@
+"""Blend the precomputed results of the nearest stations for a location.
+
+Instead of using the results for the closest station, the results of the k nearest
+stations are blended using inverse distance weights. The hourly panel irradiance, the
+monthly ground irradiance and the weather data for the economic model are blended in
+a single weighted sum over the stations.
+
+The blended results are written in the same format as the files in ``sim_data`` so
+they can be used in place of the results for a single station.
+"""
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+from results import (
+    read_ground_irradiance, read_monthly_average, read_panel_irradiance, read_weather,
+    results_folder, LOCATIONS, MONTHS
+)
+
+__here__ = pathlib.Path(__file__).parent
+
+# radius of the earth in kilometers
+EARTH_RADIUS = 6371
+
+
+@lru_cache()
+def station_coordinates() -> Tuple[np.ndarray, np.ndarray]:
+    """Get the latitude and the longitude of the stations ordered by their index.
+
+    The coordinates are read from the LOCATION line of the EPW files.
+    """
+    coordinates = np.zeros((len(LOCATIONS), 2))
+    for name, info in LOCATIONS.items():
+        with __here__.joinpath('epw', f'{name}.epw').open() as inf:
+            fields = inf.readline().split(',')
+        coordinates[info['index']] = float(fields[6]), float(fields[7])
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def haversine(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """Calculate the distance between a location and a list of locations in km."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def station_weights(latitude: float, longitude: float, count: int = 3,
+                    power: float = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the inverse distance weights of the nearest stations.
+
+    Args:
+        latitude: Latitude of the location.
+        longitude: Longitude of the location.
+        count: Number of stations to blend.
+        power: Power of the inverse distance. Larger values give more weight to the
+            closest station.
+
+    Returns:
+        A tuple of station indices, distances in km and normalized weights.
+    """
+    if count < 1:
+        raise ValueError(f'The number of stations must be at least 1. Got {count}.')
+    distances = haversine(latitude, longitude, *station_coordinates())
+    indices = np.argsort(distances)[:count]
+    distances = distances[indices]
+    if distances[0] < 1e-3:
+        # the location is on top of a station
+        weights = (distances < 1e-3).astype(np.float64)
+    else:
+        weights = 1 / distances ** power
+    return indices, distances, weights / weights.sum()
+
+
+def _read_grid(folder: pathlib.Path, name: str) -> np.ndarray:
+    """Read the annual average values of a sensor grid from its CSV file."""
+    return np.loadtxt(folder.joinpath(f'{name}.csv'), delimiter=',', ndmin=2)
+
+
+def blend_results(configuration: int, transparency: int, latitude: float,
+                  longitude: float, count: int = 3, power: float = 2) -> Dict:
+    """Blend the results of the nearest stations.
+
+    Args:
+        configuration: Index of the panel configuration.
+        transparency: Index of the panel transparency.
+        latitude: Latitude of the location.
+        longitude: Longitude of the location.
+        count: Number of stations to blend.
+        power: Power of the inverse distance.
+
+    Returns:
+        A dictionary with the blended hourly panel irradiance with the shape of
+        (hours, sensors), the monthly ground irradiance with the shape of
+        (sensors, 12), the hourly temperature and wind speed, the monthly averages
+        for the panels and the crops, the annual averages of the panel and the
+        ground sensors in the layout of the CSV files in ``sim_data`` as panel_grid
+        and ground_grid and the list of stations with their distance and weight.
+    """
+    indices, distances, weights = station_weights(latitude, longitude, count, power)
+    folders = [results_folder(configuration, transparency, i) for i in indices]
+    weather = [read_weather(i) for i in indices]
+    monthly = [read_monthly_average(f) for f in folders]
+    # (stations, ...) arrays which are blended with a single weighted sum
+    stacked = {
+        'panel': np.stack([read_panel_irradiance(f).values for f in folders]),
+        'ground': np.stack([read_ground_irradiance(f).values for f in folders]),
+        'temperature': np.stack([t.values[:, 0] for t, _ in weather]),
+        'wind_speed': np.stack([w.values[:, 0] for _, w in weather]),
+        'monthly_panel': np.array([m['panel'] for m in monthly]),
+        'monthly_crops': np.array([m['crops'] for m in monthly]),
+        # the stations share the sensor grids so the CSV files have the same layout
+        'panel_grid': np.stack([_read_grid(f, 'Agrivoltaic_Panel') for f in folders]),
+        'ground_grid': np.stack([_read_grid(f, 'Crops_Surface') for f in folders])
+    }
+    blended = {
+        key: np.tensordot(weights, values, axes=1).astype(np.float32)
+        for key, values in stacked.items()
+    }
+    names = {info['index']: info['value'] for info in LOCATIONS.values()}
+    blended['stations'] = [
+        {
+            'index': int(i), 'location': names[i], 'distance': round(float(d), 2),
+            'weight': round(float(w), 4)
+        }
+        for i, d, w in zip(indices, distances, weights)
+    ]
+    return blended
+
+
+def write_blended_results(blended: Dict, folder: pathlib.Path) -> pathlib.Path:
+    """Write the blended results in the same format as the files in sim_data.
+
+    Args:
+        blended: Blended results from ``blend_results``.
+        folder: Folder to write the results.
+
+    Returns:
+        Path to the results folder.
+    """
+    folder = pathlib.Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    panel, ground = blended['panel'], blended['ground']
+    np.save(folder.joinpath('Agrivoltaic_Panel.npy'), panel)
+    np.savetxt(folder.joinpath('Agrivoltaic_Panel.ill'), panel.mean(axis=1), fmt='%.6g')
+    np.savetxt(
+        folder.joinpath('Agrivoltaic_Panel.csv'), blended['panel_grid'], fmt='%.2f',
+        delimiter=','
+    )
+    np.savetxt(
+        folder.joinpath('Crops_Surface.ill'), ground, fmt='%.6g', delimiter=',',
+        header=','.join(MONTHS), comments=''
+    )
+    np.savetxt(
+        folder.joinpath('Crops_Surface.csv'), blended['ground_grid'], fmt='%.2f',
+        delimiter=','
+    )
+    np.savetxt(folder.joinpath('temperature.txt'), blended['temperature'], fmt='%.1f')
+    np.savetxt(folder.joinpath('wind_speed.txt'), blended['wind_speed'], fmt='%.1f')
+
+    folder.joinpath('stations.json').write_text(json.dumps(blended['stations']))
+    folder.joinpath('average_monthly.json').write_text(
+        json.dumps(
+            {
+                'panel': [round(float(v), 2) for v in blended['monthly_panel']],
+                'crops': [round(float(v), 2) for v in blended['monthly_crops']]
+            }
+        )
+    )
+    return folder
+
+
+def blended_results_folder(configuration: int, transparency: int, latitude: float,
+                           longitude: float, count: int = 3, power: float = 2,
+                           folder=None) -> pathlib.Path:
+    """Blend and write the results of the nearest stations for a location.
+
+    The results are reused if they already exist. The results are written to a
+    temporary folder first which is then moved into place so the sessions that blend
+    the same location at the same time never see each other's partial results.
+
+    Returns:
+        Path to the results folder.
+    """
+    folder = pathlib.Path(folder or __here__.joinpath('temp_res', 'blended'))
+    target = folder.joinpath(
+        f'{configuration}_{transparency}_{latitude:.3f}_{longitude:.3f}_{count}_{power:g}'
+    )
+    if target.joinpath('average_monthly.json').exists():
+        return target
+    blended = blend_results(
+        configuration, transparency, latitude, longitude, count, power
+    )
+    folder.mkdir(parents=True, exist_ok=True)
+    temp_folder = pathlib.Path(tempfile.mkdtemp(prefix=f'.{target.name}_', dir=folder))
+    try:
+        write_blended_results(blended, temp_folder)
+        try:
+            os.replace(temp_folder, target)
+        except OSError:
+            # another session has already moved the same results into place
+            if not target.joinpath('average_monthly.json').exists():
+                # an incomplete folder from before the results were written this way
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(temp_folder, target)
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+    return target
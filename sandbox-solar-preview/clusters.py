@@ -0,0 +1,245 @@
+"""Cluster the hourly skies of a location into a small number of representative skies.
+
+The sun-up hours of an annual hourly sky matrix are clustered using k-means on the
+radiance of the sky patches. The hours of each month are clustered separately. Each
+cluster is represented by the average sky of its hours and the number of hours is used
+as its weight. The daylight coefficient matrices are then multiplied by k skies
+instead of 8760 and the hourly results are approximated by the results of the cluster
+of each hour.
+
+Since the representative skies are the average of the hours in each cluster, the
+monthly and the annual averages are exact and only the distribution of the values
+between the hours of each month is approximated.
+
+The app doesn't use the representative skies. The monthly and the annual averages are
+the same as the results of the 12 monthly averaged skies and the relative error of the
+hourly values is around 50% with 96 skies which is too much for the economic model.
+The panel DC matrices are also small enough that the full hourly multiplication takes
+about the same time. Run this module to compare the results for an EPW file.
+
+    python clusters.py path/to/weather.epw 96
+"""
+import calendar
+from typing import Dict
+
+import numpy as np
+
+from matrix import multiply
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 30, seed: int = 0):
+    """Cluster the rows of a matrix using k-means with k-means++ initialization.
+
+    Args:
+        data: An array with the shape of (samples, features).
+        k: Number of clusters.
+        iterations: Maximum number of iterations.
+        seed: Seed for the random generator.
+
+    Returns:
+        A tuple with the centers as an array with the shape of (k, features) and the
+        label for each sample.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    k = min(k, len(data))
+    rng = np.random.RandomState(seed)
+    squared_norms = (data ** 2).sum(axis=1)
+
+    # k-means++ initialization
+    centers = [data[rng.randint(len(data))]]
+    distances = ((data - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distances.sum()
+        if total <= 0:
+            index = rng.randint(len(data))
+        else:
+            index = rng.choice(len(data), p=distances / total)
+        centers.append(data[index])
+        distances = np.minimum(distances, ((data - data[index]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    labels = None
+    for _ in range(iterations):
+        # |x - c|^2 without the |x|^2 term which is the same for all the centers
+        dist = (centers ** 2).sum(axis=1)[None, :] - 2 * data @ centers.T
+        new_labels = dist.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, data)
+        empty = counts == 0
+        centers[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            # move the empty clusters to the samples that are the farthest away
+            error = squared_norms + dist[np.arange(len(data)), labels]
+            centers[empty] = data[np.argsort(error)[::-1][:empty.sum()]]
+    return centers, labels
+
+
+def cluster_sky(sky_matrix: np.ndarray, k: int = 96, seed: int = 0) -> Dict:
+    """Cluster the sun-up hours of an annual sky matrix.
+
+    The hours of each month are clustered separately with k / 12 clusters per month
+    so the representative skies never mix the hours of different months.
+
+    Args:
+        sky_matrix: A broadband sky matrix with the shape of (patches, 8760).
+        k: Number of representative skies.
+        seed: Seed for the random generator.
+
+    Returns:
+        A dictionary with the following keys.
+
+        * skies: Representative skies with the shape of (patches, k).
+        * weights: Number of hours in each cluster with the shape of (k,).
+        * assignment: Cluster index for each hour. Hours with no sky are set to -1.
+    """
+    up_hours = sky_matrix.any(axis=0)
+    month_hours = _month_hours()
+    month_k = max(k // 12, 1)
+    assignment = np.full(sky_matrix.shape[1], -1, dtype=np.int32)
+    skies, weights = [], []
+    for st, end in zip(month_hours, list(month_hours[1:]) + [sky_matrix.shape[1]]):
+        hours = st + np.flatnonzero(up_hours[st:end])
+        if not len(hours):
+            continue
+        centers, labels = kmeans(sky_matrix[:, hours].T, month_k, seed=seed)
+        # recalculate the centers from the final labels so they are the exact average
+        count = np.bincount(labels, minlength=len(centers))
+        centers = np.zeros((len(centers), sky_matrix.shape[0]), dtype=np.float64)
+        np.add.at(centers, labels, sky_matrix[:, hours].T)
+        # drop the clusters that ended up with no hours
+        used = np.flatnonzero(count)
+        remap = np.cumsum(count > 0) - 1
+        assignment[hours] = len(weights) + remap[labels]
+        skies.extend(centers[used] / count[used, None])
+        weights.extend(count[used])
+    return {
+        'skies': np.array(skies, dtype=np.float32).T,
+        'weights': np.array(weights, dtype=np.int32),
+        'assignment': assignment
+    }
+
+
+def save_clusters(clusters: Dict, npz_file):
+    np.savez(npz_file, **clusters)
+
+
+def load_clusters(npz_file) -> Dict:
+    data = np.load(npz_file)
+    return {key: data[key] for key in ('skies', 'weights', 'assignment')}
+
+
+def expand(results: np.ndarray, clusters: Dict) -> np.ndarray:
+    """Expand the results for the representative skies to hourly values.
+
+    Args:
+        results: Results for the representative skies with the shape of
+            (sensors, k).
+        clusters: Clusters from ``cluster_sky``.
+
+    Returns:
+        Approximate hourly values with the shape of (sensors, hours). The values for
+        the hours with no sky are zero.
+    """
+    results = np.concatenate(
+        [results, np.zeros((results.shape[0], 1), dtype=results.dtype)], axis=1
+    )
+    # -1 picks the zero column that is added to the end
+    return results[:, clusters['assignment']]
+
+
+def average(results: np.ndarray, clusters: Dict, hours=None) -> np.ndarray:
+    """Calculate the weighted average of the results for a period.
+
+    Args:
+        results: Results for the representative skies with the shape of
+            (sensors, k).
+        clusters: Clusters from ``cluster_sky``.
+        hours: An optional boolean array or a list of hour indices for the period.
+            Default is the whole year. The hours with no sky are excluded.
+
+    Returns:
+        The average value for each sensor.
+    """
+    assignment = clusters['assignment']
+    if hours is not None:
+        assignment = assignment[hours]
+    weights = np.bincount(assignment[assignment >= 0], minlength=results.shape[1])
+    return results @ weights / max(weights.sum(), 1)
+
+
+def _month_hours():
+    day_count = [calendar.monthrange(2022, month)[1] for month in range(1, 13)]
+    return np.cumsum([0] + day_count[:-1]) * 24
+
+
+def error_report(dc, sky_matrix: np.ndarray, clusters: Dict, hourly=False) -> Dict:
+    """Compare the approximate results with the exact results for a DC matrix.
+
+    The monthly averages are compared with the exact monthly averages which only need
+    12 sky vectors. The hourly values are only compared if hourly is set to True
+    since it requires the full multiplication.
+
+    Args:
+        dc: A daylight coefficient matrix or a CompressedMatrix.
+        sky_matrix: The sky matrix that was used to create the clusters.
+        clusters: Clusters from ``cluster_sky``.
+        hourly: Set to True to also calculate the error for the hourly values.
+
+    Returns:
+        A dictionary with the maximum relative error of the monthly averages for the
+        sensors as monthly_error, the error of the annual average as annual_error and
+        the relative root mean square error of the hourly values as hourly_error.
+    """
+    results = multiply(dc, clusters['skies'])
+    up_hours = clusters['assignment'] >= 0
+    month_hours = _month_hours()
+    hour_count = np.add.reduceat(up_hours.astype(np.float64), month_hours)
+
+    exact_sky = np.add.reduceat(sky_matrix * up_hours, month_hours, axis=1)
+    exact = multiply(dc, exact_sky / np.maximum(hour_count, 1))
+    approximate = np.stack(
+        [
+            average(results, clusters, slice(st, end))
+            for st, end in zip(month_hours, list(month_hours[1:]) + [len(up_hours)])
+        ], axis=1
+    )
+    scale = np.maximum(np.abs(exact).max(), 1e-9)
+    exact_annual = exact @ hour_count / hour_count.sum()
+    report = {
+        'k': len(clusters['weights']),
+        'monthly_error': float(np.abs(approximate - exact).max() / scale),
+        'annual_error': float(
+            np.abs(average(results, clusters) - exact_annual).max() /
+            max(np.abs(exact_annual).max(), 1e-9)
+        )
+    }
+    if hourly:
+        exact_hourly = multiply(dc, sky_matrix)
+        report['hourly_error'] = float(
+            np.sqrt(((expand(results, clusters) - exact_hourly) ** 2).mean()) /
+            max(np.sqrt((exact_hourly ** 2).mean()), 1e-9)
+        )
+    return report
+
+
+if __name__ == '__main__':
+    import pathlib
+    import sys
+
+    from matrix import load_dc
+    from results import model_mapper
+    from sky import perez_sky_matrix
+
+    epw_file = sys.argv[1]
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 96
+    hourly_sky = perez_sky_matrix(pathlib.Path(epw_file).as_posix())
+    clusters = cluster_sky(hourly_sky, k)
+    models_folder = pathlib.Path(__file__).parent.joinpath('models')
+    for name in model_mapper:
+        dc_file = models_folder.joinpath(name, 'Agrivoltaic_Panel_0.dc')
+        if dc_file.exists():
+            print(name, error_report(load_dc(dc_file), hourly_sky, clusters, hourly=True))
@@ -1,7 +1,9 @@
 import pathlib
+import queue
 from typing import Dict
 import streamlit as st
 import json
+import numpy as np
 import pandas as pd
 
 # from pollination_streamlit_viewer import viewer
@@ -11,21 +13,26 @@ import plotly.express as px
 
 from charts import get_graph
 from sidebar import place_holder_controls
-from economics import calculate_economics
+from economics import calculate_economics, mismatch_loss
 from visualization import ground_visualization
+from results import (
+    model_mapper, read_cec_module, read_panel_irradiance, read_weather, CONFIGURATIONS,
+    GROUND_ADJUSTMENT, TRANSPARENCIES
+)
+from par import calc_ppfd_clf
+from crops import CropResponse
+from blending import blended_results_folder
+import simulation
 
 def active_controls():
     inp_1, inp_2 = st.columns(2)
-    cfg_options = [
-        "Fixed South Facing", "Fixed South Facing Canopy", "North-South Tracking",
-        "Bifacial Solar Fence", "Fixed East-West Peak Canopy"
-    ]
+    cfg_options = CONFIGURATIONS
     configuration = inp_1.selectbox(
         'Select panel configuration',
         options=cfg_options, index=4
     )
 
-    transparency_values = [0, 20, 40, 60, 80, 100]
+    transparency_values = TRANSPARENCIES
     transparency = inp_2.selectbox(
         'Select panel transparency', options=transparency_values, index=0
     )
@@ -132,6 +139,155 @@ def draw_monthly_electricity_chart(data):
     st.plotly_chart(fig, use_container_width=True)
 
 
+@st.cache()
+def get_economics(irradiance: pd.DataFrame, temperature: pd.DataFrame,
+                  wind_speed: pd.DataFrame, CECMod: pd.DataFrame, configuration: int):
+    return calculate_economics(irradiance, temperature, wind_speed, CECMod, configuration)
+
+
+@st.experimental_singleton
+def get_simulation_service():
+    return simulation.SimulationService()
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def get_custom_model(geometry: Dict):
+    """Create the model of a custom geometry and its geometry hash.
+
+    They are only created once for each geometry input instead of on every rerun. Do
+    not modify the cached model.
+    """
+    model = simulation.create_model(geometry)
+    return model, simulation.geometry_hash(model)
+
+
+def add_custom_geometry(transparency, location):
+    """Add controls and results for a live simulation of a custom geometry.
+
+    The simulation runs on a local service and this function never waits for it. Use
+    the refresh button to check the progress.
+    """
+    available = simulation.is_available()
+    geometry = place_holder_controls(disabled=not available)
+    if not available:
+        st.info(
+            'Live simulations for custom geometries are not available on this server.'
+        )
+        return
+
+    service = get_simulation_service()
+    model, model_hash = get_custom_model(geometry)
+    tr = transparency['value'] / 100
+    key = service.job_key(model_hash, tr, location['index'])
+    job = service.get_job(key)
+
+    if job is None or job.status in ('failed', 'cancelled'):
+        if job is not None and job.status == 'failed':
+            st.error(f'The simulation failed: {job.error}')
+        if st.button('Run simulation for this geometry'):
+            try:
+                # the simulation changes the modifiers of the model so it gets a copy
+                job = service.submit(
+                    model.duplicate(), tr, location['index'], model_hash
+                )
+            except queue.Full:
+                st.warning(
+                    'The simulation queue is full. Try again in a few minutes.'
+                )
+                return
+        else:
+            return
+
+    if not job.done:
+        st.progress(job.progress)
+        st.write(f'Simulation is {job.status}: {job.message}')
+        refresh, cancel = st.columns(2)
+        refresh.button('Refresh', key='custom-geometry-refresh')
+        if cancel.button('Cancel', key='custom-geometry-cancel'):
+            job.cancel()
+        return
+
+    panel, ground = job.result['panel'], job.result['ground']
+    _, ppfd_values = calc_ppfd_clf(ground.mean(axis=1) / GROUND_ADJUSTMENT)
+    st.write(
+        f'**Average panel irradiance: {round(float(panel.mean()), 2)} W/m2**'
+    )
+    st.write(
+        f'Low light area: {ppfd_values["low"]}% - Medium light area: '
+        f'{ppfd_values["medium"]}% - High light area: {ppfd_values["high"]}%'
+    )
+
+
+@st.cache(show_spinner=False)
+def get_epw_results(epw_file: pathlib.Path, configuration_index: int,
+                    transparency_index: int) -> pathlib.Path:
+    return simulation.results_from_epw(epw_file, configuration_index, transparency_index)
+
+
+@st.cache(show_spinner=False)
+def get_blended_results(configuration_index: int, transparency_index: int,
+                        latitude: float, longitude: float) -> pathlib.Path:
+    return blended_results_folder(
+        configuration_index, transparency_index, latitude, longitude
+    )
+
+
+@st.cache(allow_output_mutation=True)
+def get_crop_response(results_folder: pathlib.Path) -> CropResponse:
+    par_df = pd.read_csv(results_folder.joinpath('Crops_Surface.ill'))
+    return CropResponse(par_df.values / GROUND_ADJUSTMENT)
+
+
+@st.cache(allow_output_mutation=True)
+def get_sensor_positions(configuration_index: int) -> np.ndarray:
+    here = pathlib.Path(__file__).parent
+    pts_file = here.joinpath(
+        'models', model_mapper[configuration_index], 'resources', 'Crops_Surface.pts'
+    )
+    return np.loadtxt(pts_file.as_posix(), usecols=(0, 1), ndmin=2)
+
+
+def draw_crop_yield(crop_response: CropResponse, configuration_index: int,
+                    st_index: int, end_index: int):
+    """Draw the expected relative yield for the crops in the library."""
+    field_yield = crop_response.field_yield(st_index, end_index)
+    data = pd.DataFrame(
+        {
+            'crop': crop_response.names,
+            'family': [c['family'] for c in crop_response.crops.values()],
+            'Relative yield (%)': np.round(100 * field_yield, 1)
+        }
+    )
+    fig = px.bar(
+        data, x='crop', y='Relative yield (%)', hover_data=['family'],
+        title='Expected Relative Yield for the Growing Season',
+        color_discrete_sequence=['rgb(184,216,190)'] * len(data)
+    )
+    fig.update_yaxes(range=[0, 100])
+    st.plotly_chart(fig, use_container_width=True)
+
+    crop = st.selectbox('Select a crop to see the yield map', crop_response.names)
+    yield_map = crop_response.yield_map(st_index, end_index)[
+        crop_response.names.index(crop)
+    ]
+    positions = get_sensor_positions(configuration_index)
+    fig = go.Figure(
+        data=go.Scattergl(
+            x=positions[:, 0], y=positions[:, 1], mode='markers',
+            marker=dict(
+                color=100 * yield_map, colorscale='greens', cmin=0, cmax=100,
+                symbol='square', size=8, colorbar=dict(title='%')
+            )
+        )
+    )
+    fig.update_layout(
+        title=f'Relative Yield Map for {crop}', height=500,
+        margin=dict(l=10, r=10, t=40, b=10)
+    )
+    fig.update_yaxes(scaleanchor='x', scaleratio=1)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def add_pv_config(location):
     here = pathlib.Path(__file__).parent
 
@@ -142,9 +298,14 @@ def add_pv_config(location):
     selection_name = f'{configuration["value"]}_{location["value"]}_{transparency["value"]}%'
 
     # add additional inputs here
-    with st.expander('Click here for additional inputs (coming soon)'):
-        # add place holder controls
-        place_holder_controls()
+    with st.expander('Click here to simulate a custom panel geometry'):
+        if 'epw' in location:
+            st.info(
+                'Custom geometries are not currently available for uploaded '
+                'weather files.'
+            )
+        else:
+            add_custom_geometry(transparency, location)
 
     model_viz = here.joinpath('models_viz', f'{configuration["index"]}.vtkjs')
 
@@ -159,8 +320,31 @@ def add_pv_config(location):
         st.warning('Data for north-south tracking panels is not currently available.')
         st.stop()
 
-    results_folder = here.joinpath('sim_data', f'{selection_index}')
-    weather_folder = here.joinpath('weather_data')
+    if 'epw' in location:
+        with st.spinner('Calculating the results for the uploaded weather file...'):
+            results_folder = get_epw_results(
+                location['epw'], configuration['index'], transparency['index']
+            )
+    elif st.checkbox(
+        'Blend the results of the 3 nearest stations',
+        help='The results are interpolated between the nearest stations using '
+        'inverse distance weights.'
+    ):
+        results_folder = get_blended_results(
+            configuration['index'], transparency['index'], location['latitude'],
+            location['longitude']
+        )
+        # use a unique index for the visualization of the blended results
+        selection_index = results_folder.name
+        stations = json.loads(results_folder.joinpath('stations.json').read_text())
+        st.caption(
+            'Blended results from ' + ', '.join(
+                f'{s["location"]} ({s["distance"]} km, {round(100 * s["weight"])}%)'
+                for s in stations
+            )
+        )
+    else:
+        results_folder = here.joinpath('sim_data', f'{selection_index}')
 
     # show the outcome here
     st.header('3. PV Economic Modeling')
@@ -187,30 +371,27 @@ def add_pv_config(location):
             '* Energy Usage'
         )
     # calculate economics for this location and configuration
-    # Read the SAM module from the JSON file
-    CECMod = pd.DataFrame.from_dict(json.loads(
-        here.joinpath('cec_mod.json').read_text()))
-    # Solution - parse the csv file and create the item from the csv file directly.
-    irr_file = results_folder.joinpath(f'Agrivoltaic_Panel.ill')
-    irradiance = pd.read_csv(irr_file.as_posix(), header=None)
-    temperature = pd.read_csv(
-        weather_folder.joinpath(f'{location["index"]}_temperature.txt').as_posix(),
-        header=None
-    )
-    wind_speed = pd.read_csv(
-        weather_folder.joinpath(f'{location["index"]}_wind_speed.txt').as_posix(),
-        header=None
-    )
+    irradiance = read_panel_irradiance(results_folder)
+    temperature, wind_speed = read_weather(location['index'], results_folder)
 
     total_electricity, monthly_electricity, adjusted_installed_cost, payback_cash_flow = \
-        calculate_economics(irradiance, temperature,
-                            wind_speed, CECMod, configuration["index"])
+        get_economics(irradiance, temperature,
+                      wind_speed, read_cec_module(), configuration["index"])
 
     ec_clo1, ec_col2 = st.columns(2)
     with ec_clo1:
         # NOTE: I'm dividing this value by 30 to match SAM's output
         total_electricity = '{:,}'.format(int(total_electricity / 30))
         st.write(f'**Net AC electricity to grid: {total_electricity} kWh**')
+        if irradiance.shape[1] > 1:
+            loss = mismatch_loss(irradiance.values, configuration['index'])
+            st.write(
+                f'Estimated mismatch loss from partial shading: {round(100 * loss, 2)}%'
+            )
+        st.caption(
+            'The mismatch loss from partial shading is not included in the electricity '
+            'values. It is only estimated for uploaded weather files.'
+        )
     with ec_col2:
         adjusted_installed_cost = '{:,}'.format(int(adjusted_installed_cost))
         st.markdown(
@@ -242,11 +423,9 @@ def add_pv_config(location):
     st_index = months.index(st_month)
     end_index = months.index(end_month)
     par_df = pd.read_csv(results_folder.joinpath('Crops_Surface.ill'))
-    # Note: the results of the new method are about 1.5 times more than the original
-    # hourly runs. I'm diving the values by 1.5 to adjust for that until I get a chance
-    # to review the workflow. It is most likely an adjustment in the sky that I hacked
-    # together from several skies.
-    average_values = par_df[months[st_index: end_index + 1]].mean(axis=1) / 1.2
+    # see the note on GROUND_ADJUSTMENT in results.py
+    average_values = par_df[months[st_index: end_index + 1]].mean(axis=1) / \
+        GROUND_ADJUSTMENT
 
     vtkjs_index = f'{selection_index}_{st_index}_{end_index}'
     ppfd_values, ppfd_viz = ground_visualization(average_values.values.tolist(), vtkjs_index)
@@ -266,6 +445,15 @@ def add_pv_config(location):
 
     st.text('ℹ Hold down the Alt button to rotate around the cursor.')
 
+    st.markdown('#### Expected Relative Yield')
+    st.write(
+        '*Relative yield is estimated from the light-response curve of each crop and '
+        'the average PPFD during the growing season. The values are indicative.'
+    )
+    draw_crop_yield(
+        get_crop_response(results_folder), configuration['index'], st_index, end_index
+    )
+
     # add a table for predictive outcome
     with st.expander('Click here to learn more about the metrics'):
         st.markdown(
@@ -290,6 +478,11 @@ def add_pv_config(location):
     )
 
     with st.expander("Click here to download data in CSV format"):
+        if 'epw' in location:
+            st.caption(
+                'The annual average values have one line for each sensor in the order '
+                'of the sensors in the model.'
+            )
         c1, c2, c3 = st.columns(3)
         c1.download_button(
             label="Crops Annual Average Values",
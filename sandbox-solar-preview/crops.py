@@ -0,0 +1,108 @@
+"""Estimate the relative crop yield from PPFD values.
+
+Each crop has a light-response curve that is defined by a compensation point and a
+saturation point. There is no growth below the compensation point and the yield does
+not increase above the saturation point. In between the response follows an
+exponential saturation curve.
+
+The curves are applied to every sensor and every month for all the crops at once
+using NumPy broadcasting.
+
+Note: The values in the library are indicative and are in the same units as the
+PPFD values that are calculated in ``par.calculate_ppfd``.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from par import calculate_ppfd
+
+# crop name: family, compensation point, saturation point
+CROPS = {
+    'Tomato': {'family': 'Solanaceae', 'compensation': 150, 'saturation': 800},
+    'Pepper': {'family': 'Solanaceae', 'compensation': 120, 'saturation': 700},
+    'Squash': {'family': 'Cucurbitaceae', 'compensation': 150, 'saturation': 800},
+    'Bean': {'family': 'Fabaceae', 'compensation': 100, 'saturation': 600},
+    'Onion': {'family': 'Amaryllidaceae', 'compensation': 100, 'saturation': 600},
+    'Carrot': {'family': 'Apiaceae', 'compensation': 80, 'saturation': 500},
+    'Basil': {'family': 'Lamiaceae', 'compensation': 80, 'saturation': 500},
+    'Lettuce': {'family': 'Asteraceae', 'compensation': 50, 'saturation': 350},
+    'Kale': {'family': 'Brassicaceae', 'compensation': 50, 'saturation': 350},
+    'Spinach': {'family': 'Chenopodiaceae', 'compensation': 40, 'saturation': 300},
+}
+
+# curvature of the light-response curve. Larger values reach the saturation faster.
+CURVATURE = 3.0
+
+
+def light_response(ppfd: np.ndarray, crops: Dict = None) -> np.ndarray:
+    """Calculate the relative yield for a set of crops.
+
+    Args:
+        ppfd: PPFD values as an array with any shape. Usually (sensors, months).
+        crops: A dictionary of crops. Default is ``CROPS``.
+
+    Returns:
+        A float32 array of relative yield between 0 and 1 with the shape of
+        (crops, *ppfd.shape).
+    """
+    crops = crops or CROPS
+    ppfd = np.asarray(ppfd, dtype=np.float32)
+    shape = (-1,) + (1,) * ppfd.ndim
+    compensation = np.array(
+        [c['compensation'] for c in crops.values()], dtype=np.float32
+    ).reshape(shape)
+    saturation = np.array(
+        [c['saturation'] for c in crops.values()], dtype=np.float32
+    ).reshape(shape)
+
+    relative = np.clip((ppfd - compensation) / (saturation - compensation), 0, 1)
+    return (1 - np.exp(-CURVATURE * relative)) / (1 - np.exp(-CURVATURE))
+
+
+class CropResponse:
+    """Relative yield for all the crops and all the months of a design option.
+
+    The monthly values are stored as a cumulative sum so the average for any growing
+    season can be calculated without recalculating the curves.
+
+    Args:
+        irradiance: Monthly average irradiance values for the ground with the shape of
+            (sensors, 12).
+        crops: A dictionary of crops. Default is ``CROPS``.
+    """
+
+    def __init__(self, irradiance: np.ndarray, crops: Dict = None):
+        self.crops = crops or CROPS
+        ppfd = calculate_ppfd(np.asarray(irradiance, dtype=np.float32))
+        response = light_response(ppfd, self.crops)
+        self._cumulative = np.concatenate(
+            [
+                np.zeros(response.shape[:-1] + (1,), dtype=np.float32),
+                np.cumsum(response, axis=-1, dtype=np.float32)
+            ],
+            axis=-1
+        )
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.crops.keys())
+
+    def yield_map(self, st_month: int = 0, end_month: int = 11) -> np.ndarray:
+        """Return the average relative yield for a growing season.
+
+        Args:
+            st_month: Index of the first month of the growing season (0-11).
+            end_month: Index of the last month of the growing season (0-11).
+
+        Returns:
+            An array with the shape of (crops, sensors).
+        """
+        count = end_month - st_month + 1
+        return (
+            self._cumulative[:, :, end_month + 1] - self._cumulative[:, :, st_month]
+        ) / count
+
+    def field_yield(self, st_month: int = 0, end_month: int = 11) -> np.ndarray:
+        """Return the field-level relative yield for each crop for a growing season."""
+        return self.yield_map(st_month, end_month).mean(axis=1)
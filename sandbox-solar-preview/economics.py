@@ -6,9 +6,11 @@ The code is based on the sample code provided by the SAM and pvlib teams from NR
 
 import json
 import pathlib
+import numpy as np
 import pandas as pd
 import calendar
-import streamlit as st
+from functools import lru_cache
+from typing import Tuple
 
 import pvlib
 
@@ -16,6 +18,8 @@ import PySAM.Grid as Grid
 import PySAM.Utilityrate5 as UtilityRate
 import PySAM.Cashloan as Cashloan
 
+from results import model_mapper
+
 
 def find_module(data_source: pathlib.Path) -> pd.DataFrame:
     """Return the selected module as a pd.DataFrame.
@@ -67,7 +71,124 @@ def calculate_dc_output(irradiance, air_temperature, wind_speed, CECMod):
     return [v[0] for v in p_out]
 
 
-@st.cache(suppress_st_warning=True)
+# cells in series for each bypass diode. The module in ``find_module`` has 3 bypass
+# diodes for its 72 cells in series.
+CELLS_PER_BYPASS_DIODE = 24
+# relative difference from the average of a string that is considered to be the noise
+# of the simulated sensor values. The hourly values of the sensors in the unshaded rows
+# of the tables are typically 3-5% apart.
+MISMATCH_TOLERANCE = 0.1
+
+
+@lru_cache()
+def panel_strings(configuration: int) -> Tuple[np.ndarray, ...]:
+    """Group the panel sensors of a configuration into strings.
+
+    The modules that face the same direction at the same height are connected in one
+    string and each string has its own MPPT input so the strings don't limit each
+    other. The sensors are read from the Agrivoltaic_Panel.pts file of the model.
+
+    Returns:
+        A tuple with the indices of the sensors of each string.
+    """
+    __here__ = pathlib.Path(__file__).parent
+    pts_file = __here__.joinpath(
+        'models', model_mapper[configuration], 'resources', 'Agrivoltaic_Panel.pts'
+    )
+    sensors = np.loadtxt(pts_file.as_posix(), ndmin=2)
+    # the height and the direction of the sensors
+    _, strings = np.unique(sensors[:, 2:6].round(1), axis=0, return_inverse=True)
+    strings = strings.ravel()
+    return tuple(np.flatnonzero(strings == i) for i in range(strings.max() + 1))
+
+
+def string_irradiance(irradiance, substring_count: int) -> np.ndarray:
+    """Calculate the effective irradiance of a string of partially shaded substrings.
+
+    Each substring is protected by a bypass diode. The current of a substring is
+    limited by its most shaded sensor and the current of the string is limited by its
+    weakest active substring. The bypass diodes turn off the weakest substrings when
+    that increases the output of the string. For every hour the string delivers the
+    best of these options which is ``max(k * G_k) / N`` where ``G_k`` is the k-th
+    highest substring irradiance and N is the number of substrings.
+
+    The values that are within MISMATCH_TOLERANCE of the average of the string are
+    set to the average so the noise of the simulation doesn't add a loss. The
+    calculation is vectorized for all the hours.
+
+    Args:
+        irradiance: Hourly irradiance values for the sensors of a string as an array
+            with the shape of (hours, sensors).
+        substring_count: Number of bypass diode substrings in the string. The
+            sensors are split into this many groups in order. If there are fewer
+            sensors than substrings each sensor is a substring.
+
+    Returns:
+        Hourly effective irradiance for the string as a float32 array.
+    """
+    irradiance = np.asarray(irradiance, dtype=np.float32)
+    average = irradiance.mean(axis=1, keepdims=True)
+    irradiance = np.where(
+        np.abs(irradiance - average) <= MISMATCH_TOLERANCE * average, average,
+        irradiance
+    )
+    sensor_count = irradiance.shape[1]
+    if substring_count < sensor_count:
+        st_indices = [
+            len(group) for group in
+            np.array_split(np.arange(sensor_count), substring_count)
+        ]
+        st_indices = np.cumsum([0] + st_indices[:-1])
+        irradiance = np.minimum.reduceat(irradiance, st_indices, axis=1)
+
+    ordered = -np.sort(-irradiance, axis=1)
+    active_count = np.arange(1, ordered.shape[1] + 1, dtype=np.float32)
+    return (ordered * active_count).max(axis=1) / ordered.shape[1]
+
+
+def mismatch_irradiance(irradiance, configuration: int) -> np.ndarray:
+    """Calculate the effective irradiance of the panels of a configuration.
+
+    The sensors are grouped into the ``panel_strings`` of the configuration and the
+    ``substring_count`` of the configuration is split between the strings by their
+    number of sensors. The effective irradiance of each string is calculated using
+    ``string_irradiance``.
+
+    Args:
+        irradiance: Hourly irradiance values for each sensor as an array with the
+            shape of (hours, sensors).
+        configuration: Index of the panel configuration.
+
+    Returns:
+        Hourly effective irradiance for all the panels as a float32 array.
+    """
+    irradiance = np.asarray(irradiance, dtype=np.float32)
+    sensor_count = irradiance.shape[1]
+    substrings = substring_count(configuration)
+    effective = np.zeros(irradiance.shape[0], dtype=np.float32)
+    for sensors in panel_strings(configuration):
+        count = max(round(substrings * len(sensors) / sensor_count), 1)
+        effective += string_irradiance(irradiance[:, sensors], count) * len(sensors)
+    return effective / sensor_count
+
+
+def mismatch_loss(irradiance, configuration: int) -> float:
+    """Return the annual mismatch loss as a fraction of the average irradiance.
+
+    Args:
+        irradiance: Hourly irradiance values for each sensor as an array with the
+            shape of (hours, sensors).
+        configuration: Index of the panel configuration.
+    """
+    irradiance = np.asarray(irradiance, dtype=np.float32)
+    total = irradiance.mean(axis=1).sum()
+    if not total:
+        return 0
+    effective = mismatch_irradiance(irradiance, configuration).sum()
+    return float(1 - effective / total)
+
+
+@lru_cache()
 def read_sam_data(configuration: int = 0):
     names = {
         0: 'Fixed_South_Facing',
@@ -87,7 +208,18 @@ def read_sam_data(configuration: int = 0):
     return data
 
 
-@st.cache()
+@lru_cache()
+def substring_count(configuration: int = 0) -> int:
+    """Get the number of bypass diode substrings in a string of a configuration.
+
+    The number is calculated from the modules per string and the cells in series of
+    the PySAM inputs for the configuration.
+    """
+    pvsam = read_sam_data(configuration)[-1]
+    return int(pvsam['subarray1_modules_per_string']) * int(pvsam['cec_n_s']) // \
+        CELLS_PER_BYPASS_DIODE
+
+
 def calculate_economics(
         irradiance: pd.DataFrame, temperature: pd.DataFrame, wind_speed: pd.DataFrame,
         CECMod: pd.DataFrame, configuration: float = 1
@@ -95,12 +227,18 @@ def calculate_economics(
     """Calculate economics using PySAM.
 
     Args:
-        irradiance: Annual hourly irradiance values as a DataFrame.
+        irradiance: Annual hourly irradiance values as a DataFrame. If the DataFrame
+            has more than one column each column is considered to be a sensor on the
+            panels and their average is used. The mismatch loss is not included
+            since the precomputed results in ``sim_data`` only have the average
+            values. Use ``mismatch_loss`` to estimate it separately.
         temperature: Annual hourly air temperature values as a DataFrame.
         wind_speed: Annual hourly wind speed values as a DataFrame. The values are for
             10 m above the ground.
         panel_area: Total panel area in m2.
     """
+    if irradiance.shape[1] > 1:
+        irradiance = irradiance.mean(axis=1).to_frame()
     p_out = calculate_dc_output(irradiance, temperature, wind_speed, CECMod=CECMod)
 
     # convert dc to AC - considering a flat loss of 14%
@@ -6,7 +6,10 @@ from honeybee_radiance.lightsource.sky.skydome import SkyDome
 from honeybee_radiance_command._command_util import run_command
 import calendar
 
-from location import LOCATIONS
+import numpy as np
+
+from results import LOCATIONS
+from matrix import read_matrix, multiply
 
 CFG_OPTIONS = [
     "1_fixed_south_facing_tables", "2_fixed_south_facing_canopy",
@@ -88,25 +91,30 @@ def calculate_pv_values(sky, dc, working_dir: pathlib.Path):
     """
     Calculate irradiance and energy production values for a Photovoltaic panel.
 
-    The inputs are a sky file and a daylight coefficient file.
-    It averages the results into a single file if needed.
+    The inputs are a sky file and a daylight coefficient file. The hourly irradiance
+    for each sensor is saved as a float32 matrix with the shape of (hours, sensors) in
+    Agrivoltaic_Panel.npy. The values are also averaged into Agrivoltaic_Panel.ill.
     """
-    temp_file = working_dir.joinpath('Agrivoltaic_Panel_Temp.ill')
-    cmd = f'rmtxop -fa {dc} {sky} -c 0.265 0.670 0.065 -t > Agrivoltaic_Panel_Temp.ill'
-    print(cmd)
-    run_command(cmd, cwd=working_dir.as_posix())
+    working_dir = pathlib.Path(working_dir)
+    values = multiply(read_matrix(dc), read_matrix(sky)).T
+    write_pv_values(values, working_dir)
+    return values
+
+
+def write_pv_values(values: np.ndarray, working_dir: pathlib.Path):
+    """Write hourly per-sensor and averaged irradiance values for the panels.
+
+    Args:
+        values: A matrix of hourly irradiance values with the shape of
+            (hours, sensors).
+        working_dir: Folder to write Agrivoltaic_Panel.npy and Agrivoltaic_Panel.ill.
+    """
+    working_dir.mkdir(parents=True, exist_ok=True)
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    np.save(working_dir.joinpath('Agrivoltaic_Panel.npy'), values)
     res_file = working_dir.joinpath('Agrivoltaic_Panel.ill')
     print(f'Calculating average values: {res_file}')
-    with temp_file.open() as inf, res_file.open('w') as outf:
-        for _ in range(10):
-            line = next(inf)
-            if line.startswith('FORMAT='):
-                next(inf)
-                break
-        for line in inf:
-            values = list(map(float, line.split()))
-            outf.write(str(sum(values) / len(values)) + '\n')
-    temp_file.unlink()
+    np.savetxt(res_file, values.mean(axis=1), fmt='%.6g')
 
 
 def create_dc_for_all_folders(folder):
@@ -251,4 +259,6 @@ def generate_parametric_dc():
     # generate_pv_irradiance_parametric(sky_folder, dc_folder, ill_folder)
     generate_ground_irradiance_parametric(monthly_sky_folder, dc_folder, ill_folder)
 
-generate_parametric_dc()
+
+if __name__ == '__main__':
+    generate_parametric_dc()
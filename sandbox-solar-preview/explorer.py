@@ -8,6 +8,12 @@ import streamlit as st
 
 from economics import calculate_economics
 from par import calc_ppfd_clf
+from results import GROUND_ADJUSTMENT
+from surrogate import Surrogate, INPUTS
+
+__here__ = pathlib.Path(__file__).parent
+# inputs that can only be whole numbers
+INTEGER_INPUTS = ('Panel Count',)
 
 
 def get_input_values(folder) -> Dict:
@@ -79,11 +85,8 @@ def _calculate_economic_outputs(folder: pathlib.Path):
 
 def _calculate_ppdf_values(results_folder):
     par_df = pd.read_csv(results_folder.joinpath('Crops_Surface.ill'))
-    # Note: the results of the new method are about 1.5 times more than the original
-    # hourly runs. I'm diving the values by 1.5 to adjust for that until I get a chance
-    # to review the workflow. It is most likely an adjustment in the sky that I hacked
-    # together from several skies.
-    average_values = par_df.mean(axis=1) / 1.2
+    # see the note on GROUND_ADJUSTMENT in results.py
+    average_values = par_df.mean(axis=1) / GROUND_ADJUSTMENT
     _, ppfd_classification = calc_ppfd_clf(average_values)
     return ppfd_classification
 
@@ -228,3 +231,58 @@ def add_parallel_coordinates(location_index):
     )
 
     return fig
+
+
+@st.cache(allow_output_mutation=True)
+def load_surrogate(location_index) -> Surrogate:
+    return Surrogate(location_index)
+
+
+def has_surrogate(location_index) -> bool:
+    """Check if the surrogate models are trained for a location."""
+    return __here__.joinpath(
+        'parametric_data', 'surrogates', f'{location_index}.json'
+    ).exists()
+
+
+def add_surrogate_explorer(location_index):
+    """Add continuous sliders to predict the results between the sampled cases."""
+    if not has_surrogate(location_index):
+        st.info(
+            'The estimates are only available for the listed locations with sampled '
+            'options. Contact us for an assessment of your location.'
+        )
+        return
+    surrogate = load_surrogate(location_index)
+    configuration = st.selectbox(
+        'Select panel configuration', options=surrogate.configurations,
+        key='surrogate-configuration'
+    )
+    ranges = surrogate.input_range(configuration)
+    values = {}
+    columns = st.columns(len(INPUTS))
+    for col, name in zip(columns, INPUTS):
+        min_value, max_value = ranges[name]
+        if min_value == max_value:
+            col.write(f'{name}: {min_value:g}')
+            values[name] = min_value
+            continue
+        if name in INTEGER_INPUTS:
+            min_value, max_value = int(min_value), int(max_value)
+            values[name] = col.slider(
+                name, min_value=min_value, max_value=max_value,
+                value=(min_value + max_value) // 2, step=1, key=f'surrogate-{name}'
+            )
+            continue
+        values[name] = col.slider(
+            name, min_value=min_value, max_value=max_value,
+            value=(min_value + max_value) / 2, key=f'surrogate-{name}'
+        )
+
+    predictions = surrogate.predict(configuration, values)
+    columns = st.columns(len(predictions))
+    for col, (name, (mean, std)) in zip(columns, predictions.items()):
+        if name.endswith('(%)'):
+            col.metric(name, f'{mean:.1f}', f'± {std:.1f}', delta_color='off')
+        else:
+            col.metric(name, f'{int(mean):,}', f'± {int(std):,}', delta_color='off')
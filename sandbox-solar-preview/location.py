@@ -8,41 +8,12 @@ from geopy.exc import GeocoderUnavailable, GeocoderTimedOut
 from ladybug_geometry.geometry2d import Point2D
 from ladybug.epw import EPW
 
+import hashlib
 import pathlib
 from math import radians, cos, sin, asin, sqrt
 
-LOCATIONS = {
-    'USA_CO_Golden-NREL.724666_TMY3': {'value': 'Denver Golden', 'index': 0},
-    'USA_CO_Fort.Collins.AWOS.724769_TMY3': {'value': 'Fort Collins', 'index': 1},
-    'USA_CO_Grand.Junction-Walker.Field.724760_TMY3': {'value': 'Grand Junction', 'index': 2},
-    'USA_MN_Minneapolis-St.Paul.Intl.AP.726580_TMY3': {'value': 'Minneapolis', 'index': 3},
-    'USA_NE_Omaha.WSFO.725530_TMY3': {'value': 'Omaha', 'index': 4},
-    'USA_MO_Kansas.City.Downtown.AP.724463_TMY3': {'value': 'Kansas City', 'index': 5},
-    'USA_ID_Boise.Air.Terminal.726810_TMY3': {'value': 'Boise', 'index': 6},
-    'USA_WA_Seattle-Tacoma.Intl.AP.727930_TMY3': {'value': 'Seattle', 'index': 7},
-    'USA_OR_Eugene-Mahlon.Sweet.AP.726930_TMY3': {'value': 'Eugene', 'index': 8},
-    'USA_CA_Sacramento.724835_TMY2': {'value': 'Sacramento', 'index': 9},
-    'USA_CA_Fresno.Air.Terminal.723890_TMY3': {'value': 'Fresno Yosemite', 'index': 10},
-    'USA_CA_San.Diego-Lindbergh.Field.722900_TMY3': {'value': 'San Diego', 'index': 11},
-    'USA_NV_Las.Vegas-McCarran.Intl.AP.723860_TMY3': {'value': 'Las Vegas', 'index': 12},
-    'USA_AZ_Davis-Monthan.AFB.722745_TMY3': {'value': 'Tucson', 'index': 13},
-    'USA_TX_Houston-William.P.Hobby.AP.722435_TMY3': {'value': 'Houston', 'index': 14},
-    'USA_OK_Oklahoma.City-Tinker.AFB.723540_TMY3': {'value': 'Oklahoma City', 'index': 15},
-    'USA_TN_Memphis.Intl.AP.723340_TMY3': {'value': 'Memphis', 'index': 16},
-    'USA_KY_Louisville.Intl.AP.724230_TMY3': {'value': 'Louisville', 'index': 17},
-    'USA_IL_Springfield-Capital.AP.724390_TMY3': {'value': 'Springfield IL', 'index': 18},
-    'USA_MI_Lansing-Capital.City.AP.725390_TMY3': {'value': 'Lansing', 'index': 19},
-    'USA_IA_Des.Moines.Intl.AP.725460_TMY3': {'value': 'Des Moines', 'index': 20},
-    'USA_MA_Boston-Logan.Intl.AP.725090_TMY3': {'value': 'Boston', 'index': 21},
-    'USA_GA_Atlanta-Hartsfield-Jackson.Intl.AP.722190_TMY3': {'value': 'Atlanta', 'index': 22},
-    'USA_VA_Richmond.Intl.AP.724010_TMY3': {'value': 'Richmond', 'index': 23},
-    'USA_FL_Miami.Intl.AP.722020_TMY3': {'value': 'Miami', 'index': 24},
-    'USA_AK_Juneau.Intl.AP.703810_TMY3': {'value': 'Juneau', 'index': 25},
-    'USA_HI_Honolulu.Intl.AP.911820_TMY3': {'value': 'Honolulu', 'index': 26},
-    'CAN_ON_Toronto.716240_CWEC': {'value': 'Toronto', 'index': 27},
-    'MEX_Mexico.City.766790_IWEC': {'value': 'Cuidad Mexico', 'index': 28},
-    'PRI_SJ_San.Juan.994043_TMYx': {'value': 'San Juan', 'index': 29},
-}
+from results import LOCATIONS
+
 
 @st.cache()
 def load_location_data(weather_folder):
@@ -157,4 +128,46 @@ def add_map(city, country='United States'):
     figure = epw.diurnal_average_chart()
     st.plotly_chart(figure_or_data=figure)
 
-    return closet_location['info']
+    return {**closet_location['info'], 'latitude': lat, 'longitude': lon}
+
+
+def add_epw_upload():
+    """Add an uploader to use a custom EPW file instead of the available locations.
+
+    Returns:
+        Location information for the uploaded EPW file or None if no file is
+        uploaded. The index of the location is the hash of the file and the path to
+        the EPW file is under the epw key.
+    """
+    __here__ = pathlib.Path(__file__).parent
+    epw_data = st.file_uploader(
+        'Or upload an EPW file to run the study for your exact location.', type='epw'
+    )
+    if not epw_data:
+        return None
+
+    content = epw_data.getvalue()
+    epw_hash = hashlib.sha256(content).hexdigest()[:16]
+    epw_file = __here__.joinpath('temp_res', 'epw', 'uploads', f'{epw_hash}.epw')
+    epw_file.parent.mkdir(parents=True, exist_ok=True)
+    if not epw_file.exists():
+        epw_file.write_bytes(content)
+    try:
+        epw = EPW(epw_file)
+        location = epw.location
+    except Exception:
+        epw_file.unlink()
+        st.error('Failed to read the EPW file. Check the file and try again.')
+        st.stop()
+
+    map_data = pd.DataFrame({'lat': [location.latitude], 'lon': [location.longitude]})
+    st.map(map_data, zoom=5)
+    st.info(
+        f'The results are calculated for **{location.city}** '
+        f'(Lat: {location.latitude}, Lon: {location.longitude}) using the uploaded '
+        'weather file. You can review the weather data summary below. 👇'
+    )
+    figure = epw.diurnal_average_chart()
+    st.plotly_chart(figure_or_data=figure)
+
+    return {'value': location.city, 'index': epw_hash, 'epw': epw_file}
@@ -0,0 +1,237 @@
+"""Read Radiance matrices and multiply them with NumPy.
+
+This module replaces the ``rmtxop`` calls for the sky multiplication step. The
+daylight coefficient matrices are written by ``rfluxmtx`` in binary float format and
+the sky matrices are written by ``gendaymtx`` in ascii format. Both are loaded as
+float32 arrays with the shape of (rows, columns, components).
+
+The daylight coefficient matrices can also be compressed offline to truncated SVD
+factors using ``compress_models``. The compressed matrices are saved next to the
+original files as ``.npz`` files and ``load_dc`` loads them when they are available.
+
+    python matrix.py [max_error]
+"""
+import pathlib
+import sys
+
+import numpy as np
+
+# RGB weights that are used to convert the 3 channels to a single value. These are the
+# same values that are used with ``rmtxop -c``.
+CHANNEL_WEIGHTS = np.array([0.265, 0.670, 0.065], dtype=np.float32)
+
+
+def _read_header(inf):
+    """Read a Radiance header and return it as a dictionary."""
+    first_line = inf.readline()
+    if not first_line.startswith(b'#?RADIANCE'):
+        raise ValueError('Input file is not a valid Radiance matrix.')
+    header = {}
+    for line in iter(inf.readline, b''):
+        line = line.strip()
+        if not line:
+            # an empty line marks the end of the header
+            break
+        key, sep, value = line.decode('utf-8', 'ignore').partition('=')
+        if sep:
+            header[key.strip()] = value.strip()
+    return header
+
+
+def read_matrix(matrix_file) -> np.ndarray:
+    """Read a Radiance matrix file.
+
+    Args:
+        matrix_file: Path to a daylight coefficient or a sky matrix file. Both ascii
+            and float formats are supported.
+
+    Returns:
+        A float32 array with the shape of (rows, columns, components).
+    """
+    matrix_file = pathlib.Path(matrix_file)
+    with matrix_file.open('rb') as inf:
+        header = _read_header(inf)
+        rows = int(header['NROWS'].split()[-1])
+        cols = int(header['NCOLS'])
+        comps = int(header.get('NCOMP', 3))
+        fmt = header.get('FORMAT', 'ascii')
+        if fmt == 'float':
+            byte_order = '>' if header.get('BigEndian', '0') == '1' else '<'
+            values = np.frombuffer(inf.read(), dtype=f'{byte_order}f4')
+        elif fmt == 'double':
+            byte_order = '>' if header.get('BigEndian', '0') == '1' else '<'
+            values = np.frombuffer(inf.read(), dtype=f'{byte_order}f8')
+        else:
+            values = np.array(inf.read().split(), dtype=np.float32)
+
+    return values.astype(np.float32, copy=False).reshape(rows, cols, comps)
+
+
+def to_broadband(matrix: np.ndarray) -> np.ndarray:
+    """Collapse the components of a matrix into a single weighted value.
+
+    Args:
+        matrix: An array with the shape of (rows, columns, 3).
+
+    Returns:
+        An array with the shape of (rows, columns).
+    """
+    return matrix @ CHANNEL_WEIGHTS
+
+
+class CompressedMatrix:
+    """A daylight coefficient matrix as truncated SVD factors.
+
+    The matrix is collapsed to a broadband matrix with the shape of (sensors, patches)
+    and is factorized as U * S * Vt. Only U and S * Vt are stored. This is exact for
+    the models in this app since all the materials are grey and the 3 channels of the
+    daylight coefficient matrices are the same.
+
+    Args:
+        u: Left singular vectors with the shape of (sensors, rank).
+        sv: S * Vt with the shape of (rank, patches).
+        error: Relative error of the truncated matrix in Frobenius norm.
+        spectral_error: Largest discarded singular value divided by the largest
+            singular value. For any sky vector the error of the result is smaller than
+            spectral_error * |sky| * |dc| where |dc| is the largest singular value.
+    """
+
+    def __init__(self, u: np.ndarray, sv: np.ndarray, error: float = 0,
+                 spectral_error: float = 0):
+        self.u = np.asarray(u, dtype=np.float32)
+        self.sv = np.asarray(sv, dtype=np.float32)
+        self.error = float(error)
+        self.spectral_error = float(spectral_error)
+
+    @classmethod
+    def from_matrix(cls, dc: np.ndarray, max_error: float = 0.01):
+        """Compress a daylight coefficient matrix.
+
+        Args:
+            dc: Daylight coefficient matrix with the shape of (sensors, patches, 3).
+            max_error: Maximum relative error of the compressed matrix in Frobenius
+                norm. The smallest rank that meets this error is used.
+        """
+        if not (np.allclose(dc[:, :, 0], dc[:, :, 1]) and
+                np.allclose(dc[:, :, 0], dc[:, :, 2])):
+            raise ValueError(
+                'Only daylight coefficient matrices with the same values for all the '
+                'channels can be compressed.'
+            )
+        u, s, vt = np.linalg.svd(to_broadband(dc).astype(np.float64), full_matrices=False)
+        energy = s ** 2
+        # relative error for each rank from the discarded singular values
+        errors = np.sqrt(
+            np.append(np.cumsum(energy[::-1])[::-1], 0) / max(energy.sum(), 1e-30)
+        )
+        rank = max(int(np.argmax(errors <= max_error)), 1)
+        spectral_error = s[rank] / s[0] if rank < len(s) else 0
+        return cls(u[:, :rank], s[:rank, None] * vt[:rank], errors[rank], spectral_error)
+
+    @classmethod
+    def from_file(cls, npz_file):
+        data = np.load(npz_file)
+        return cls(data['u'], data['sv'], data['error'], data['spectral_error'])
+
+    def to_file(self, npz_file):
+        np.savez(
+            npz_file, u=self.u, sv=self.sv, error=self.error,
+            spectral_error=self.spectral_error
+        )
+
+    @property
+    def shape(self):
+        return self.u.shape[0], self.sv.shape[1], 3
+
+    @property
+    def rank(self) -> int:
+        return self.u.shape[1]
+
+    def multiply(self, sky: np.ndarray) -> np.ndarray:
+        """Multiply the matrix by a sky matrix as U * (S * Vt * sky).
+
+        Args:
+            sky: Sky matrix with the shape of (patches, steps, 3) or a broadband sky
+                with the shape of (patches, steps).
+
+        Returns:
+            A float32 array with the shape of (sensors, steps).
+        """
+        if sky.ndim == 3:
+            sky = to_broadband(sky)
+        return self.u @ (self.sv @ sky.astype(np.float32, copy=False))
+
+
+def load_dc(dc_file, compressed: bool = True):
+    """Load a daylight coefficient matrix.
+
+    Args:
+        dc_file: Path to a daylight coefficient matrix file.
+        compressed: Load the compressed matrix if there is a ``.npz`` file next to
+            the matrix file. Default is True.
+
+    Returns:
+        A CompressedMatrix or a float32 array with the shape of
+        (sensors, patches, 3).
+    """
+    dc_file = pathlib.Path(dc_file)
+    npz_file = dc_file.with_suffix('.npz')
+    if compressed and npz_file.exists():
+        return CompressedMatrix.from_file(npz_file)
+    return read_matrix(dc_file)
+
+
+def compress_models(folder=None, max_error: float = 0.01):
+    """Compress all the daylight coefficient matrices in the models folder.
+
+    Args:
+        folder: Path to the models folder.
+        max_error: Maximum relative error of each compressed matrix.
+    """
+    folder = pathlib.Path(folder or pathlib.Path(__file__).parent.joinpath('models'))
+    for dc_file in sorted(folder.glob('*/*.dc')):
+        dc = read_matrix(dc_file)
+        name = f'{dc_file.parent.name}/{dc_file.name}'
+        try:
+            compressed = CompressedMatrix.from_matrix(dc, max_error)
+        except ValueError as e:
+            print(f'{name}: {e}')
+            continue
+        compressed.to_file(dc_file.with_suffix('.npz'))
+        print(
+            f'{name}: rank {compressed.rank} of {min(dc.shape[:2])} - error '
+            f'{compressed.error:.4f} - spectral error {compressed.spectral_error:.4f}'
+        )
+
+
+def multiply(dc: np.ndarray, sky: np.ndarray) -> np.ndarray:
+    """Multiply a daylight coefficient matrix by a sky matrix.
+
+    This is the NumPy equivalent of ``rmtxop -fa dc sky -c 0.265 0.670 0.065``.
+
+    Args:
+        dc: Daylight coefficient matrix with the shape of (sensors, patches, 3) or a
+            CompressedMatrix.
+        sky: Sky matrix with the shape of (patches, steps, 3). A broadband sky with
+            the shape of (patches, steps) is also accepted.
+
+    Returns:
+        A float32 array with the shape of (sensors, steps).
+    """
+    if dc.shape[1] != sky.shape[0]:
+        raise ValueError(
+            f'The number of sky patches in the daylight coefficient matrix '
+            f'({dc.shape[1]}) does not match the sky matrix ({sky.shape[0]}).'
+        )
+    if isinstance(dc, CompressedMatrix):
+        return dc.multiply(sky)
+    if sky.ndim == 2:
+        return to_broadband(dc) @ sky.astype(np.float32, copy=False)
+    result = np.zeros((dc.shape[0], sky.shape[1]), dtype=np.float32)
+    for channel, weight in enumerate(CHANNEL_WEIGHTS):
+        result += weight * (dc[:, :, channel] @ sky[:, :, channel])
+    return result
+
+
+if __name__ == '__main__':
+    compress_models(max_error=float(sys.argv[1]) if len(sys.argv) > 1 else 0.01)
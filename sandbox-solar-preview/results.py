@@ -0,0 +1,227 @@
+"""Read the precomputed results for the design options.
+
+This module does not depend on Streamlit and is shared between the app and the
+headless API in ``api.py``. A design option is a combination of a panel
+configuration, a panel transparency and a location. The results for each option are
+in ``sim_data/{configuration}_{transparency}_{location}``.
+"""
+import json
+import pathlib
+from functools import lru_cache
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+__here__ = pathlib.Path(__file__).parent
+
+LOCATIONS = {
+    'USA_CO_Golden-NREL.724666_TMY3': {'value': 'Denver Golden', 'index': 0},
+    'USA_CO_Fort.Collins.AWOS.724769_TMY3': {'value': 'Fort Collins', 'index': 1},
+    'USA_CO_Grand.Junction-Walker.Field.724760_TMY3': {'value': 'Grand Junction', 'index': 2},
+    'USA_MN_Minneapolis-St.Paul.Intl.AP.726580_TMY3': {'value': 'Minneapolis', 'index': 3},
+    'USA_NE_Omaha.WSFO.725530_TMY3': {'value': 'Omaha', 'index': 4},
+    'USA_MO_Kansas.City.Downtown.AP.724463_TMY3': {'value': 'Kansas City', 'index': 5},
+    'USA_ID_Boise.Air.Terminal.726810_TMY3': {'value': 'Boise', 'index': 6},
+    'USA_WA_Seattle-Tacoma.Intl.AP.727930_TMY3': {'value': 'Seattle', 'index': 7},
+    'USA_OR_Eugene-Mahlon.Sweet.AP.726930_TMY3': {'value': 'Eugene', 'index': 8},
+    'USA_CA_Sacramento.724835_TMY2': {'value': 'Sacramento', 'index': 9},
+    'USA_CA_Fresno.Air.Terminal.723890_TMY3': {'value': 'Fresno Yosemite', 'index': 10},
+    'USA_CA_San.Diego-Lindbergh.Field.722900_TMY3': {'value': 'San Diego', 'index': 11},
+    'USA_NV_Las.Vegas-McCarran.Intl.AP.723860_TMY3': {'value': 'Las Vegas', 'index': 12},
+    'USA_AZ_Davis-Monthan.AFB.722745_TMY3': {'value': 'Tucson', 'index': 13},
+    'USA_TX_Houston-William.P.Hobby.AP.722435_TMY3': {'value': 'Houston', 'index': 14},
+    'USA_OK_Oklahoma.City-Tinker.AFB.723540_TMY3': {'value': 'Oklahoma City', 'index': 15},
+    'USA_TN_Memphis.Intl.AP.723340_TMY3': {'value': 'Memphis', 'index': 16},
+    'USA_KY_Louisville.Intl.AP.724230_TMY3': {'value': 'Louisville', 'index': 17},
+    'USA_IL_Springfield-Capital.AP.724390_TMY3': {'value': 'Springfield IL', 'index': 18},
+    'USA_MI_Lansing-Capital.City.AP.725390_TMY3': {'value': 'Lansing', 'index': 19},
+    'USA_IA_Des.Moines.Intl.AP.725460_TMY3': {'value': 'Des Moines', 'index': 20},
+    'USA_MA_Boston-Logan.Intl.AP.725090_TMY3': {'value': 'Boston', 'index': 21},
+    'USA_GA_Atlanta-Hartsfield-Jackson.Intl.AP.722190_TMY3': {'value': 'Atlanta', 'index': 22},
+    'USA_VA_Richmond.Intl.AP.724010_TMY3': {'value': 'Richmond', 'index': 23},
+    'USA_FL_Miami.Intl.AP.722020_TMY3': {'value': 'Miami', 'index': 24},
+    'USA_AK_Juneau.Intl.AP.703810_TMY3': {'value': 'Juneau', 'index': 25},
+    'USA_HI_Honolulu.Intl.AP.911820_TMY3': {'value': 'Honolulu', 'index': 26},
+    'CAN_ON_Toronto.716240_CWEC': {'value': 'Toronto', 'index': 27},
+    'MEX_Mexico.City.766790_IWEC': {'value': 'Cuidad Mexico', 'index': 28},
+    'PRI_SJ_San.Juan.994043_TMYx': {'value': 'San Juan', 'index': 29},
+}
+
+CONFIGURATIONS = [
+    'Fixed South Facing', 'Fixed South Facing Canopy', 'North-South Tracking',
+    'Bifacial Solar Fence', 'Fixed East-West Peak Canopy'
+]
+
+TRANSPARENCIES = [0, 20, 40, 60, 80, 100]
+
+MONTHS = [
+    'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'
+]
+
+model_mapper = [
+    '1_fixed_south_facing_tables', '2_fixed_south_facing_canopy',
+    '3_north_south_dynamic_single_axis', '4_fixed_east_facing_vertical',
+    '5_fixed_east_west_peaked_canopy'
+]
+
+# Note: the results of the new method are about 1.5 times more than the original
+# hourly runs. The ground values are divided by 1.2 to adjust for that until the
+# workflow is reviewed. It is most likely an adjustment in the sky.
+GROUND_ADJUSTMENT = 1.2
+
+
+def _index(value, name: str) -> int:
+    """Convert a value to an index and reject the values that are not whole numbers."""
+    index = int(value)
+    if index != float(value):
+        raise ValueError(f'Invalid {name} index: {value}.')
+    return index
+
+
+def configuration_index(configuration: Union[int, str]) -> int:
+    """Get the index of a panel configuration from its index or its name."""
+    if isinstance(configuration, str) and not configuration.isdigit():
+        try:
+            return CONFIGURATIONS.index(configuration)
+        except ValueError:
+            raise ValueError(
+                f'Invalid configuration: {configuration}. Valid configurations are: '
+                f'{", ".join(CONFIGURATIONS)}'
+            )
+    index = _index(configuration, 'configuration')
+    if not 0 <= index < len(CONFIGURATIONS):
+        raise ValueError(f'Invalid configuration index: {index}.')
+    return index
+
+
+def transparency_index(transparency: Union[int, float]) -> int:
+    """Get the index of a panel transparency from its value in percent."""
+    value = float(transparency)
+    if value not in TRANSPARENCIES:
+        raise ValueError(
+            f'Invalid transparency: {transparency}. Valid values are: '
+            f'{", ".join(map(str, TRANSPARENCIES))}'
+        )
+    return TRANSPARENCIES.index(value)
+
+
+def location_index(location: Union[int, str]) -> int:
+    """Get the index of a location from its index, its name or its EPW file name."""
+    if isinstance(location, str) and not location.isdigit():
+        if location in LOCATIONS:
+            return LOCATIONS[location]['index']
+        for info in LOCATIONS.values():
+            if info['value'].lower() == location.lower():
+                return info['index']
+        raise ValueError(f'Invalid location: {location}.')
+    index = _index(location, 'location')
+    if not 0 <= index < len(LOCATIONS):
+        raise ValueError(f'Invalid location index: {index}.')
+    return index
+
+
+def season_indices(season) -> Tuple[int, int]:
+    """Get the index of the first and the last month of a growing season.
+
+    Args:
+        season: A tuple of the start and the end month. Months can be names like Apr
+            or indices from 0 to 11. A string is split on the commas and a single
+            month is used as both the start and the end of the season.
+    """
+    if isinstance(season, str):
+        season = season.split(',')
+    indices = []
+    for month in season:
+        if isinstance(month, str):
+            month = month.strip()
+        if isinstance(month, str) and not month.isdigit():
+            month = month[:3].title()
+            if month not in MONTHS:
+                raise ValueError(f'Invalid month: {month}.')
+            indices.append(MONTHS.index(month))
+        else:
+            index = _index(month, 'month')
+            if not 0 <= index < 12:
+                raise ValueError(f'Invalid month index: {index}.')
+            indices.append(index)
+    if len(indices) == 1:
+        indices *= 2
+    if len(indices) != 2:
+        raise ValueError(
+            'The season must have a start and an end month. '
+            f'Got {len(indices)} months.'
+        )
+    st_index, end_index = indices
+    if end_index < st_index:
+        raise ValueError('The end of the season must be after the start of the season.')
+    return st_index, end_index
+
+
+def results_folder(configuration: int, transparency: int, location: int) -> pathlib.Path:
+    """Get the folder for the precomputed results of a design option.
+
+    Args:
+        configuration: Index of the panel configuration.
+        transparency: Index of the panel transparency.
+        location: Index of the location.
+    """
+    if configuration == 2:
+        raise ValueError('Data for north-south tracking panels is not currently available.')
+    return __here__.joinpath('sim_data', f'{configuration}_{transparency}_{location}')
+
+
+def read_panel_irradiance(folder: pathlib.Path) -> pd.DataFrame:
+    """Read the annual hourly irradiance for the panels.
+
+    The hourly values for each sensor are returned when they are available so the
+    mismatch loss from partial shading can be estimated. Otherwise the average values
+    are returned. The values for each sensor are in Agrivoltaic_Panel.npy which is only
+    written for the results that are calculated from EPW files. The precomputed results
+    in ``sim_data`` don't have it.
+    """
+    sensor_file = folder.joinpath('Agrivoltaic_Panel.npy')
+    if sensor_file.exists():
+        return pd.DataFrame(np.load(sensor_file.as_posix()))
+    irr_file = folder.joinpath('Agrivoltaic_Panel.ill')
+    return pd.read_csv(irr_file.as_posix(), header=None)
+
+
+def read_ground_irradiance(folder: pathlib.Path) -> pd.DataFrame:
+    """Read the monthly average irradiance for the ground sensors."""
+    return pd.read_csv(folder.joinpath('Crops_Surface.ill'))
+
+
+def read_weather(location: int, folder: pathlib.Path = None) \
+        -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Read the annual hourly air temperature and wind speed for a location.
+
+    Args:
+        location: Index of the location.
+        folder: An optional results folder. If the folder has temperature.txt and
+            wind_speed.txt files they are used instead of the files for the location.
+    """
+    if folder is not None and folder.joinpath('temperature.txt').exists():
+        temperature_file = folder.joinpath('temperature.txt')
+        wind_speed_file = folder.joinpath('wind_speed.txt')
+    else:
+        weather_folder = __here__.joinpath('weather_data')
+        temperature_file = weather_folder.joinpath(f'{location}_temperature.txt')
+        wind_speed_file = weather_folder.joinpath(f'{location}_wind_speed.txt')
+    return (
+        pd.read_csv(temperature_file.as_posix(), header=None),
+        pd.read_csv(wind_speed_file.as_posix(), header=None)
+    )
+
+
+@lru_cache()
+def read_cec_module() -> pd.DataFrame:
+    """Read the SAM module from the JSON file."""
+    return pd.DataFrame.from_dict(
+        json.loads(__here__.joinpath('cec_mod.json').read_text())
+    )
+
+
+def read_monthly_average(folder: pathlib.Path) -> dict:
+    """Read the monthly average irradiance for the panels and the crops."""
+    return json.loads(folder.joinpath('average_monthly.json').read_text())
@@ -41,60 +41,85 @@ def active_controls():
     ]
 
 
-def place_holder_controls():
+def place_holder_controls(disabled=True):
+    """Add controls for a custom panel geometry.
 
+    Args:
+        disabled: Set to False to enable the controls.
+
+    Returns:
+        A dictionary of geometry parameters that can be used to create a model using
+        ``simulation.create_model``.
+    """
     st.write('Panel Geometry')
     panel_length = st.slider(
-        'Panel Length', min_value=1, max_value=10, value=2, disabled=True
+        'Panel Length', min_value=1, max_value=10, value=2, disabled=disabled
     )
     panel_width = st.slider(
-        'Panel Width', min_value=1, max_value=20, value=12, disabled=True
+        'Panel Width', min_value=1, max_value=20, value=12, disabled=disabled
     )
-    portrait = st.checkbox('Make panels portrait', value=False, disabled=True)
+    portrait = st.checkbox('Make panels portrait', value=False, disabled=disabled)
 
     table, array = st.columns(2)
     with table:
         st.write('Table Geometry')
         panel_count_x = st.slider(
-            'Panels in Row', min_value=1, max_value=10, value=2, disabled=True
+            'Panels in Row', min_value=1, max_value=10, value=2, disabled=disabled
         )
         panel_count_y = st.slider(
-            'Panels in Column', min_value=1, max_value=10, value=2, disabled=True
+            'Panels in Column', min_value=1, max_value=10, value=2, disabled=disabled
         )
         height = st.slider(
-            'Height', min_value=1, max_value=10, value=2, disabled=True
+            'Height', min_value=1, max_value=10, value=2, disabled=disabled
+        )
+        tilt = st.slider(
+            'Tilt [deg]', min_value=0, max_value=90, step=5, value=25,
+            disabled=disabled
         )
         spacing_x = st.slider(
-            'Row Spacing', min_value=1, max_value=10, value=2, disabled=True
+            'Row Spacing', min_value=1, max_value=10, value=2, disabled=disabled
         )
         spacing_y = st.slider(
-            'Column Spacing', min_value=1, max_value=10, value=2, disabled=True
+            'Column Spacing', min_value=1, max_value=10, value=2, disabled=disabled
         )
         mirror_gap = st.slider(
-            'Mirror Gap', min_value=0, max_value=10, value=0, disabled=True
+            'Mirror Gap', min_value=0, max_value=10, value=0, disabled=disabled
         )
 
     with array:
         st.write('Array Geometry')
         spacing_array_x = st.slider(
-            'Row Spacing', min_value=1, max_value=10, value=2, disabled=True,
+            'Row Spacing', min_value=1, max_value=10, value=2, disabled=disabled,
             key='Array Row Spacing'
         )
         spacing_array_y = st.slider(
-            'Column Spacing', min_value=1, max_value=10, value=2, disabled=True,
+            'Column Spacing', min_value=1, max_value=10, value=2, disabled=disabled,
             key='Array Column Spacing'
         )
         surrounding_count_x = st.slider(
-            'Surrounding Column Count', min_value=1, max_value=10, value=2, disabled=True
+            'Surrounding Column Count', min_value=1, max_value=10, value=2,
+            disabled=disabled
         )
         surrounding_count_y = st.slider(
-            'Surrounding Row Count', min_value=1, max_value=10, value=2, disabled=True
+            'Surrounding Row Count', min_value=1, max_value=10, value=2,
+            disabled=disabled
         )
         array_azimuth = st.slider(
             'Azimuth [deg]', min_value=90, max_value=270, step=5,
-            value=180, disabled=True
+            value=180, disabled=disabled
         )
         surface_offset = st.slider(
             'Ground Surface Offset', min_value=0, max_value=10,
-            value=2, disabled=True
+            value=2, disabled=disabled
         )
+
+    return {
+        'panel_length': panel_length, 'panel_width': panel_width,
+        'portrait': portrait, 'panel_count_x': panel_count_x,
+        'panel_count_y': panel_count_y, 'height': height, 'tilt': tilt,
+        'spacing_x': spacing_x, 'spacing_y': spacing_y, 'mirror_gap': mirror_gap,
+        'spacing_array_x': spacing_array_x, 'spacing_array_y': spacing_array_y,
+        'surrounding_count_x': surrounding_count_x,
+        'surrounding_count_y': surrounding_count_y,
+        'array_azimuth': array_azimuth, 'surface_offset': surface_offset
+    }
@@ -0,0 +1,523 @@
+"""Run live simulations for custom panel geometries.
+
+The simulations run on a local pool of worker threads. Each request creates a
+honeybee model from the geometry parameters, calculates the daylight coefficient
+matrices using ``calculate_dc_mtx`` and multiplies them by the annual hourly and the
+monthly averaged skies for the selected location.
+
+The skies are generated in-process from the EPW files using ``sky.perez_sky_matrix``.
+The same skies are used with the precomputed daylight coefficient matrices in the
+models folder, or their compressed version from ``matrix.compress_models``, to
+calculate the results for any uploaded EPW file without running Radiance. See
+``results_from_epw``.
+
+The results are cached by the hash of the geometry so repeated designs return
+instantly. Nothing in this module blocks the Streamlit thread.
+"""
+import calendar
+import hashlib
+import json
+import pathlib
+import queue
+import shutil
+import threading
+from collections import OrderedDict
+from math import cos, sin, radians
+from typing import Dict, List
+
+import numpy as np
+
+from ladybug.epw import EPW
+from ladybug_geometry.geometry3d import Point3D, Face3D
+from honeybee.model import Model
+from honeybee.shade import Shade
+from honeybee_radiance.sensorgrid import SensorGrid
+
+from execute import calculate_dc_mtx, write_pv_values, MONTHS
+from matrix import load_dc, read_matrix, multiply
+from results import LOCATIONS, model_mapper
+from sky import perez_sky_matrix, monthly_averaged_sky_matrix
+
+__here__ = pathlib.Path(__file__).parent
+
+# grid sizes for the panel and the ground sensor grids in meters
+PANEL_GRID_SIZE = 0.5
+GROUND_GRID_SIZE = 1.0
+
+DEFAULT_GEOMETRY = {
+    'panel_length': 2, 'panel_width': 12, 'portrait': False,
+    'panel_count_x': 2, 'panel_count_y': 2, 'height': 2, 'tilt': 25,
+    'spacing_x': 2, 'spacing_y': 2, 'mirror_gap': 0,
+    'spacing_array_x': 2, 'spacing_array_y': 2,
+    'surrounding_count_x': 2, 'surrounding_count_y': 2,
+    'array_azimuth': 180, 'surface_offset': 2
+}
+
+
+def is_available() -> bool:
+    """Check if the Radiance commands for running the simulations are installed."""
+    return all(
+        shutil.which(cmd) for cmd in ('oconv', 'rfluxmtx')
+    )
+
+
+def _table_faces(geometry: Dict, origin_x: float, origin_y: float) -> List[Face3D]:
+    """Create the panels for a single table.
+
+    The table is facing south. The origin is the lower left corner of the table.
+    """
+    if geometry['portrait']:
+        panel_x, panel_y = geometry['panel_length'], geometry['panel_width']
+    else:
+        panel_x, panel_y = geometry['panel_width'], geometry['panel_length']
+    tilt = radians(geometry['tilt'])
+    height = geometry['height']
+    slope_length = geometry['panel_count_y'] * panel_y + \
+        (geometry['panel_count_y'] - 1) * geometry['spacing_y']
+    ridge_y = origin_y + slope_length * cos(tilt) + geometry['mirror_gap'] / 2
+
+    faces = []
+    for i in range(geometry['panel_count_x']):
+        x_0 = origin_x + i * (panel_x + geometry['spacing_x'])
+        x_1 = x_0 + panel_x
+        for j in range(geometry['panel_count_y']):
+            s_0 = j * (panel_y + geometry['spacing_y'])
+            s_1 = s_0 + panel_y
+            y_0, y_1 = origin_y + s_0 * cos(tilt), origin_y + s_1 * cos(tilt)
+            z_0, z_1 = height + s_0 * sin(tilt), height + s_1 * sin(tilt)
+            faces.append(
+                Face3D(
+                    (
+                        Point3D(x_0, y_0, z_0), Point3D(x_1, y_0, z_0),
+                        Point3D(x_1, y_1, z_1), Point3D(x_0, y_1, z_1)
+                    )
+                )
+            )
+            if geometry['mirror_gap']:
+                # mirror the panel to create a peaked canopy
+                faces.append(
+                    Face3D(
+                        (
+                            Point3D(x_0, 2 * ridge_y - y_1, z_1),
+                            Point3D(x_1, 2 * ridge_y - y_1, z_1),
+                            Point3D(x_1, 2 * ridge_y - y_0, z_0),
+                            Point3D(x_0, 2 * ridge_y - y_0, z_0)
+                        )
+                    )
+                )
+    return faces
+
+
+def table_size(geometry: Dict):
+    """Return the width and the depth of a single table in plan."""
+    if geometry['portrait']:
+        panel_x, panel_y = geometry['panel_length'], geometry['panel_width']
+    else:
+        panel_x, panel_y = geometry['panel_width'], geometry['panel_length']
+    width = geometry['panel_count_x'] * panel_x + \
+        (geometry['panel_count_x'] - 1) * geometry['spacing_x']
+    slope_length = geometry['panel_count_y'] * panel_y + \
+        (geometry['panel_count_y'] - 1) * geometry['spacing_y']
+    depth = slope_length * cos(radians(geometry['tilt']))
+    if geometry['mirror_gap']:
+        depth = 2 * depth + geometry['mirror_gap']
+    return width, depth
+
+
+def create_model(geometry: Dict) -> Model:
+    """Create a honeybee model for a custom panel geometry.
+
+    The model includes the panels for the center table and the surrounding tables as
+    shades and two sensor grids. ``Agrivoltaic_Panel`` covers the panels of the center
+    table and ``Crops_Surface`` covers the ground under the center table.
+
+    Args:
+        geometry: A dictionary of geometry parameters. See ``DEFAULT_GEOMETRY`` for
+            the keys.
+    """
+    geometry = dict(DEFAULT_GEOMETRY, **geometry)
+    width, depth = table_size(geometry)
+    pitch_x = width + geometry['spacing_array_x']
+    pitch_y = depth + geometry['spacing_array_y']
+    # rotate the array around the center of the center table
+    center = Point3D(width / 2, depth / 2, 0)
+    angle = radians(180 - geometry['array_azimuth'])
+
+    shades, panel_faces = [], []
+    count_x, count_y = geometry['surrounding_count_x'], geometry['surrounding_count_y']
+    for i in range(-count_x, count_x + 1):
+        for j in range(-count_y, count_y + 1):
+            faces = _table_faces(geometry, i * pitch_x, j * pitch_y)
+            if i == 0 and j == 0:
+                panel_faces = faces
+            for face in faces:
+                shades.append(
+                    Shade(f'Ag_Panel_{len(shades)}', face.rotate_xy(angle, center))
+                )
+
+    # sensor grid for the panels of the center table
+    panel_meshes = []
+    for face in panel_faces:
+        if face.normal.z < 0:
+            face = face.flip()
+        panel_meshes.append(
+            face.rotate_xy(angle, center).mesh_grid(PANEL_GRID_SIZE, offset=0.01)
+        )
+    panel_grid = SensorGrid.from_mesh3d(
+        'Agrivoltaic_Panel', panel_meshes[0].join_meshes(panel_meshes)
+    )
+
+    # sensor grid for the ground - the unit cell around the center table
+    offset = geometry['surface_offset']
+    x_0 = (width - pitch_x) / 2 - offset
+    x_1 = (width + pitch_x) / 2 + offset
+    y_0 = (depth - pitch_y) / 2 - offset
+    y_1 = (depth + pitch_y) / 2 + offset
+    ground = Face3D(
+        (Point3D(x_0, y_0, 0), Point3D(x_1, y_0, 0),
+         Point3D(x_1, y_1, 0), Point3D(x_0, y_1, 0))
+    )
+    ground_mesh = ground.rotate_xy(angle, center).mesh_grid(
+        GROUND_GRID_SIZE, offset=0.01
+    )
+    crops_grid = SensorGrid.from_mesh3d('Crops_Surface', ground_mesh)
+
+    model = Model('Custom_Agrivoltaic', orphaned_shades=shades, units='Meters')
+    model.properties.radiance.sensor_grids = (crops_grid, panel_grid)
+    return model
+
+
+def geometry_hash(model: Model) -> str:
+    """Return a hash for the geometry of the panels and the sensors in a model."""
+    rad_content = model.to.rad(model, False, True)
+    sha = hashlib.sha256(rad_content[0].encode('utf-8'))
+    for grid in model.properties.radiance.sensor_grids:
+        sha.update(grid.to_radiance().encode('utf-8'))
+    return sha.hexdigest()
+
+
+def epw_hash(epw_file) -> str:
+    """Return the SHA-256 hash of the content of an EPW file."""
+    return hashlib.sha256(pathlib.Path(epw_file).read_bytes()).hexdigest()
+
+
+def sky_matrices(epw_file, sky_folder):
+    """Get the annual hourly and the monthly averaged skies for an EPW file.
+
+    The skies are saved to the sky folder and are reused if they already exist.
+
+    Args:
+        epw_file: Path to an EPW file.
+        sky_folder: Folder to save the skies.
+
+    Returns:
+        A tuple of broadband hourly and monthly averaged skies with the shapes of
+        (146, 8760) and (146, 12).
+    """
+    sky_folder = pathlib.Path(sky_folder)
+    hourly_sky = sky_folder.joinpath('hourly.npy')
+    monthly_sky = sky_folder.joinpath('monthly.npy')
+    if hourly_sky.exists() and monthly_sky.exists():
+        return np.load(hourly_sky), np.load(monthly_sky)
+    sky_folder.mkdir(parents=True, exist_ok=True)
+    hourly = perez_sky_matrix(pathlib.Path(epw_file).as_posix())
+    monthly = monthly_averaged_sky_matrix(hourly)
+    np.save(hourly_sky, hourly)
+    np.save(monthly_sky, monthly)
+    return hourly, monthly
+
+
+def results_from_epw(
+    epw_file, configuration_index: int, transparency_index: int, folder=None
+) -> pathlib.Path:
+    """Calculate the results for an EPW file using the precomputed DC matrices.
+
+    The results are written in the same format as the files in ``sim_data``. The
+    weather data that is used for the economic model is also written to the folder
+    as ``temperature.txt`` and ``wind_speed.txt``. The results are reused if they
+    already exist.
+
+    The CSV files have the annual average of each sensor on a separate line in the
+    order of the sensors. The files in ``sim_data`` arrange the same values in the
+    rows of the sensor grids which are not saved with the models.
+
+    Args:
+        epw_file: Path to an EPW file.
+        configuration_index: Index of the panel configuration.
+        transparency_index: Index of the panel transparency.
+        folder: Folder to write the results. Default is ``temp_res/epw``.
+
+    Returns:
+        Path to the results folder.
+    """
+    folder = pathlib.Path(folder or __here__.joinpath('temp_res', 'epw'))
+    epw_folder = folder.joinpath(epw_hash(epw_file)[:16])
+    results_folder = epw_folder.joinpath(f'{configuration_index}_{transparency_index}')
+    if results_folder.joinpath('average_monthly.json').exists():
+        return results_folder
+    results_folder.mkdir(parents=True, exist_ok=True)
+
+    hourly_sky, monthly_sky = sky_matrices(epw_file, epw_folder.joinpath('skies'))
+    model_folder = __here__.joinpath('models', model_mapper[configuration_index])
+    month_hours = np.cumsum(
+        [0] + [24 * calendar.monthrange(2022, m)[1] for m in range(1, 12)]
+    )
+
+    dc = load_dc(model_folder.joinpath(f'Agrivoltaic_Panel_{transparency_index}.dc'))
+    panel = multiply(dc, hourly_sky).T
+    write_pv_values(panel, results_folder)
+    panel_annual = panel.mean(axis=0)
+    # monthly averages for the sun-up hours
+    panel_average = panel.mean(axis=1)
+    sun_up = hourly_sky.any(axis=0)
+    panel_monthly = np.add.reduceat(panel_average * sun_up, month_hours) / \
+        np.maximum(np.add.reduceat(sun_up.astype(np.float32), month_hours), 1)
+    np.savetxt(
+        results_folder.joinpath('Agrivoltaic_Panel.csv'), panel_annual, fmt='%.2f'
+    )
+
+    dc = load_dc(model_folder.joinpath(f'Crops_Surface_{transparency_index}.dc'))
+    ground = multiply(dc, monthly_sky)
+    np.savetxt(
+        results_folder.joinpath('Crops_Surface.ill'), ground, fmt='%.6g',
+        delimiter=',', header=','.join(MONTHS), comments=''
+    )
+    np.savetxt(
+        results_folder.joinpath('Crops_Surface.csv'), ground.mean(axis=1), fmt='%.2f'
+    )
+
+    results_folder.joinpath('average_monthly.json').write_text(
+        json.dumps(
+            {
+                'panel': [round(float(v), 2) for v in panel_monthly],
+                'crops': [round(float(v), 2) for v in ground.mean(axis=0)]
+            }
+        )
+    )
+
+    epw = EPW(pathlib.Path(epw_file).as_posix())
+    np.savetxt(
+        results_folder.joinpath('temperature.txt'),
+        epw.dry_bulb_temperature.values[:8760], fmt='%.1f'
+    )
+    np.savetxt(
+        results_folder.joinpath('wind_speed.txt'),
+        epw.wind_speed.values[:8760], fmt='%.1f'
+    )
+    return results_folder
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when a job is cancelled."""
+
+
+class SimulationJob:
+    """A single simulation request.
+
+    Args:
+        key: Unique key for this job. It is the hash of the geometry and the
+            simulation inputs.
+        model: A honeybee model.
+        transparency: Panel transparency between 0 and 1.
+        location_index: Index of the location in ``LOCATIONS``.
+        working_dir: Folder to write the simulation files.
+    """
+
+    def __init__(self, key, model, transparency, location_index, working_dir):
+        self.key = key
+        self.model = model
+        self.transparency = transparency
+        self.location_index = location_index
+        self.working_dir = pathlib.Path(working_dir)
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = 'Waiting for an available worker.'
+        self.error = None
+        self.result = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('finished', 'failed', 'cancelled')
+
+    def cancel(self):
+        """Cancel the job.
+
+        A queued job never starts. A running job stops before the next step. Radiance
+        commands that are already running are not interrupted.
+        """
+        self._cancel.set()
+        if self.status == 'queued':
+            self.status = 'cancelled'
+            self.message = 'Cancelled.'
+
+    def update(self, progress: float, message: str):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = progress
+        self.message = message
+
+
+def _load_results(folder: pathlib.Path) -> Dict:
+    """Load the results from a finished simulation folder.
+
+    The panel results are hourly values for each sensor with the shape of
+    (hours, sensors) and the ground results are monthly values with the shape of
+    (sensors, months).
+    """
+    panel = np.load(folder.joinpath('Agrivoltaic_Panel.npy'))
+    ground = np.loadtxt(
+        folder.joinpath('Crops_Surface.ill'), delimiter=',', skiprows=1,
+        dtype=np.float32, ndmin=2
+    )
+    return {'folder': folder, 'panel': panel, 'ground': ground}
+
+
+class SimulationService:
+    """A bounded pool of workers to run simulations for custom geometries.
+
+    Args:
+        folder: Folder to write the simulation files. The results in this folder are
+            reused between the sessions.
+        max_workers: Number of simulations that can run at the same time.
+        max_queue: Maximum number of jobs that can wait in the queue. Submitting a
+            new job to a full queue raises a ``queue.Full`` exception.
+        max_cache: Maximum number of results to keep in memory.
+    """
+
+    def __init__(self, folder=None, max_workers=2, max_queue=8, max_cache=32):
+        self.folder = pathlib.Path(folder or __here__.joinpath('temp_res', 'custom'))
+        self.max_cache = max_cache
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # skies are shared between the jobs for the same location
+        self._sky_locks = {}
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @staticmethod
+    def job_key(model_hash: str, transparency: float, location_index: int) -> str:
+        """Create the key of a job from the ``geometry_hash`` of its model."""
+        return f'{model_hash[:16]}_{int(transparency * 100)}_{location_index}'
+
+    def get_job(self, key: str) -> SimulationJob:
+        """Get a job by key. A finished job is returned from the cache."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            result = self._cache.get(key)
+            if result is None:
+                folder = self.folder.joinpath(key)
+                if not folder.joinpath('Crops_Surface.ill').exists():
+                    return None
+                result = self._cache_result(key, _load_results(folder))
+            else:
+                self._cache.move_to_end(key)
+        job = SimulationJob(key, None, None, None, result['folder'])
+        job.status, job.progress, job.message = 'finished', 1.0, 'Done.'
+        job.result = result
+        return job
+
+    def submit(
+        self, model: Model, transparency: float, location_index: int,
+        model_hash: str = None
+    ) -> SimulationJob:
+        """Submit a new simulation.
+
+        If the same design is already queued or running the existing job is returned.
+
+        Args:
+            model: A honeybee model from ``create_model``. The radiance modifiers of
+                the shades are changed by the simulation.
+            transparency: Panel transparency between 0 and 1.
+            location_index: Index of the location in ``LOCATIONS``.
+            model_hash: The ``geometry_hash`` of the model if it is already
+                calculated.
+        """
+        model_hash = model_hash or geometry_hash(model)
+        key = self.job_key(model_hash, transparency, location_index)
+        job = self.get_job(key)
+        if job is not None and job.status not in ('failed', 'cancelled'):
+            return job
+        job = SimulationJob(
+            key, model, transparency, location_index, self.folder.joinpath(key)
+        )
+        with self._lock:
+            self._queue.put_nowait(job)
+            self._jobs[key] = job
+        return job
+
+    def _cache_result(self, key, result):
+        self._cache[key] = result
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        return result
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job.status == 'cancelled':
+                    continue
+                job.status = 'running'
+                result = self._run(job)
+            except JobCancelled:
+                job.status, job.message = 'cancelled', 'Cancelled.'
+            except Exception as e:
+                job.status, job.message, job.error = 'failed', 'Failed.', str(e)
+            else:
+                with self._lock:
+                    self._cache_result(job.key, result)
+                job.result = result
+                job.status, job.progress, job.message = 'finished', 1.0, 'Done.'
+            finally:
+                with self._lock:
+                    # keep failed and cancelled jobs around to report them
+                    if job.status == 'finished':
+                        self._jobs.pop(job.key, None)
+                self._queue.task_done()
+
+    def _skies(self, location_index: int):
+        """Get the annual hourly and the monthly averaged skies for a location."""
+        with self._lock:
+            lock = self._sky_locks.setdefault(location_index, threading.Lock())
+        epw_name = [
+            name for name, info in LOCATIONS.items()
+            if info['index'] == location_index
+        ][0]
+        with lock:
+            return sky_matrices(
+                __here__.joinpath('epw', f'{epw_name}.epw'),
+                self.folder.joinpath('skies', str(location_index))
+            )
+
+    def _run(self, job: SimulationJob) -> Dict:
+        working_dir = job.working_dir
+        working_dir.joinpath('resources').mkdir(parents=True, exist_ok=True)
+        job.update(0.05, 'Calculating daylight coefficients.')
+        calculate_dc_mtx(job.model, transparency=job.transparency, working_dir=working_dir)
+        tr = int(10 * job.transparency / 2)
+
+        job.update(0.7, 'Generating the skies.')
+        hourly_sky, monthly_sky = self._skies(job.location_index)
+
+        job.update(0.85, 'Calculating irradiance for the panels.')
+        dc = read_matrix(working_dir.joinpath(f'Agrivoltaic_Panel_{tr}.dc'))
+        panel = multiply(dc, hourly_sky).T
+        write_pv_values(panel, working_dir)
+
+        job.update(0.95, 'Calculating irradiance for the ground.')
+        dc = read_matrix(working_dir.joinpath(f'Crops_Surface_{tr}.dc'))
+        ground = multiply(dc, monthly_sky)
+        np.savetxt(
+            working_dir.joinpath('Crops_Surface.ill'), ground, fmt='%.6g',
+            delimiter=',', header=','.join(MONTHS), comments=''
+        )
+        return {'folder': working_dir, 'panel': panel, 'ground': ground}
@@ -1,15 +1,65 @@
-"""Create a monthly averaged sky."""
+"""Create annual hourly and monthly averaged skies.
+
+The skies can be created using Radiance's gendaymtx or in-process using the NumPy
+implementation of the Perez all-weather sky model in ``perez_sky_matrix``. The sky
+patches are the 145 Tregenza patches plus the ground patch as the first row which
+matches the order of the daylight coefficient matrices in the models folder.
+"""
 import pathlib
 from ladybug.wea import Wea
+from ladybug.epw import EPW
 from ladybug.analysisperiod import AnalysisPeriod
 
 import calendar
+import numpy as np
 from honeybee_radiance_command._command_util import run_command
 
-def monthly_averaged_sky(wea, target_folder, name='averaged_sky.mtx'):
+from matrix import read_matrix
+
+# number of patches in each row of the Tregenza sky from horizon to zenith
+TREGENZA_PATCHES_PER_ROW = (30, 30, 24, 24, 18, 12, 6, 1)
+# altitude of each row in degrees
+TREGENZA_ROW_ANGLE = 12
+
+# Perez all-weather model coefficients for the 8 sky clearness bins. Each row is
+# (x1, x2, x3, x4) which is used as x = x1 + x2 * Z + D * (x3 + x4 * Z).
+# Perez, R., Seals, R., Michalsky, J. (1993). All-weather model for sky luminance
+# distribution - Preliminary configuration and validation. Solar Energy 50(3).
+PEREZ_CLEARNESS_BINS = (1.065, 1.230, 1.500, 1.950, 2.800, 4.500, 6.200)
+PEREZ_COEFFICIENTS = np.array([
+    # a, b, c, d, e
+    [[1.3525, -0.2576, -0.2690, -1.4366], [-0.7670, 0.0007, 1.2734, -0.1233],
+     [2.8000, 0.6004, 1.2375, 1.0000], [1.8734, 0.6297, 0.9738, 0.2809],
+     [0.0356, -0.1246, -0.5718, 0.9938]],
+    [[-1.2219, -0.7730, 1.4148, 1.1016], [-0.2054, 0.0367, -3.9128, 0.9156],
+     [6.9750, 0.1774, 6.4477, -0.1239], [-1.5798, -0.5081, -1.7812, 0.1080],
+     [0.2625, 0.0672, -0.2190, -0.4285]],
+    [[-1.1000, -0.2515, 0.8952, 0.0156], [0.2782, -0.1812, -4.5000, 1.1766],
+     [24.7219, -13.0812, -37.7000, 34.8438], [-5.0000, 1.5218, 3.9229, -2.6204],
+     [-0.0156, 0.1597, 0.4199, -0.5562]],
+    [[-0.5484, -0.6654, -0.2672, 0.7117], [0.7234, -0.6219, -5.6812, 2.6297],
+     [33.3389, -18.3000, -62.2500, 52.0781], [-3.5000, 0.0016, 1.1477, 0.1062],
+     [0.4659, -0.3296, -0.0876, -0.0329]],
+    [[-0.6000, -0.3566, -2.5000, 2.3250], [0.2937, 0.0496, -5.6812, 1.8415],
+     [21.0000, -4.7656, -21.5906, 7.2492], [-3.5000, -0.1554, 1.4062, 0.3988],
+     [0.0032, 0.0766, -0.0656, -0.1294]],
+    [[-1.0156, -0.3670, 1.0078, 1.4051], [0.2875, -0.5328, -3.8500, 3.3750],
+     [14.0000, -0.9999, -7.1406, 7.5469], [-3.4000, -0.1078, -1.0750, 1.5702],
+     [-0.0672, 0.4016, 0.3017, -0.4844]],
+    [[-1.0000, 0.0211, 0.5025, -0.5119], [-0.3000, 0.1922, 0.7023, -1.6317],
+     [19.0000, -5.0000, 1.2438, -1.9094], [-4.0000, 0.0250, 0.3844, 0.2656],
+     [1.0468, -0.3788, -2.4517, 1.4656]],
+    [[-1.0500, 0.0289, 0.4260, 0.3590], [-0.3250, 0.1156, 0.7781, 0.0025],
+     [31.0625, -14.5000, -46.1148, 55.3750], [-7.2312, 0.4050, 13.3500, 0.6234],
+     [1.5000, -0.6426, 1.8564, 0.5636]]
+])
+
+
+def monthly_averaged_sky(wea, target_folder, name='averaged_sky.mtx', temp_folder=None):
     # read the wea file
     wea = Wea.from_file(wea)
-    temp_folder = pathlib.Path('C:\\ladybug\\tt\\temp')
+    temp_folder = pathlib.Path(temp_folder or 'C:\\ladybug\\tt\\temp')
+    temp_folder.mkdir(parents=True, exist_ok=True)
     for month in range(12):
         # create 12 separate wea files for each month
         last_day = calendar.monthrange(2022, month + 1)[1]
@@ -20,23 +70,23 @@ def monthly_averaged_sky(wea, target_folder, name='averaged_sky.mtx'):
         # create 12 different averaged skies
         run_command(command, cwd=temp_folder.as_posix())
 
-    # put them back together as one
+    # put them back together as one. Each monthly sky is a single column so they are
+    # stacked as columns to keep the patches as the rows of the matrix.
+    skies = np.concatenate(
+        [read_matrix(temp_folder.joinpath(f'{month}.sky')) for month in range(12)],
+        axis=1
+    )
     sky_file = temp_folder.joinpath(name)
     first_month = temp_folder.joinpath('0.sky')
     with first_month.open() as inf, sky_file.open('w') as outf:
-        for i in range(8):
-            line = next(inf)
-            line = line.replace('NCOLS=1', 'NCOLS=12')
-            outf.write(line)
         for line in inf:
-            outf.write(line)
-        for i in range(11):
-            monthly_sky_file = temp_folder.joinpath(f'{i + 1}.sky')
-            with monthly_sky_file.open() as inf:
-                for _ in range(7):
-                    next(inf)
-                for line in inf:
-                    outf.write(line)
+            if not line.strip():
+                break
+            outf.write(line.replace('NCOLS=1', 'NCOLS=12'))
+        outf.write('\n')
+        for row in skies:
+            for values in row:
+                outf.write(' '.join(f'{v:.6g}' for v in values) + '\n')
 
     out_file = pathlib.Path(target_folder).joinpath(name)
     if out_file.exists():
@@ -45,6 +95,192 @@ def monthly_averaged_sky(wea, target_folder, name='averaged_sky.mtx'):
     return out_file
 
 
+def tregenza_patches():
+    """Get the direction and the solid angle of the Tregenza sky patches.
+
+    The patches start from the horizon and in each row they start from north and go
+    clockwise.
+
+    Returns:
+        A tuple with the unit vectors as an array with the shape of (145, 3) and the
+        solid angles in steradians as an array with the shape of (145,).
+    """
+    row_angle = np.radians(TREGENZA_ROW_ANGLE)
+    vectors, solid_angles = [], []
+    for row, count in enumerate(TREGENZA_PATCHES_PER_ROW):
+        if count == 1:
+            altitude = np.array([np.pi / 2])
+            solid_angle = 2 * np.pi * (1 - np.sin(row * row_angle))
+        else:
+            altitude = np.full(count, (row + 0.5) * row_angle)
+            solid_angle = 2 * np.pi * (
+                np.sin((row + 1) * row_angle) - np.sin(row * row_angle)
+            ) / count
+        azimuth = 2 * np.pi * np.arange(count) / count
+        vectors.append(
+            np.stack(
+                [
+                    np.sin(azimuth) * np.cos(altitude),
+                    np.cos(azimuth) * np.cos(altitude),
+                    np.sin(altitude)
+                ], axis=1
+            )
+        )
+        solid_angles.append(np.full(count, solid_angle))
+    return np.concatenate(vectors), np.concatenate(solid_angles)
+
+
+def sun_vectors(latitude, longitude, time_zone, hoys):
+    """Calculate the sun vectors for a list of hours of the year.
+
+    The calculation is based on the NOAA solar position equations.
+
+    Args:
+        latitude: Latitude in degrees.
+        longitude: Longitude in degrees. East is positive.
+        time_zone: Time zone in hours.
+        hoys: An array of hours of the year in local standard time.
+
+    Returns:
+        An array of unit vectors with the shape of (hours, 3). X is east, Y is north
+        and Z is up.
+    """
+    hoys = np.asarray(hoys, dtype=np.float64)
+    hour = hoys % 24
+    fraction = 2 * np.pi / 365 * (hoys / 24 + (hour - 12) / 24 - hour / 24)
+    eq_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(fraction) - 0.032077 * np.sin(fraction)
+        - 0.014615 * np.cos(2 * fraction) - 0.040849 * np.sin(2 * fraction)
+    )
+    declination = 0.006918 - 0.399912 * np.cos(fraction) \
+        + 0.070257 * np.sin(fraction) - 0.006758 * np.cos(2 * fraction) \
+        + 0.000907 * np.sin(2 * fraction) - 0.002697 * np.cos(3 * fraction) \
+        + 0.00148 * np.sin(3 * fraction)
+    solar_time = hour * 60 + eq_time + 4 * longitude - 60 * time_zone
+    hour_angle = np.radians(solar_time / 4 - 180)
+    lat = np.radians(latitude)
+
+    sin_altitude = np.sin(lat) * np.sin(declination) + \
+        np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    altitude = np.arcsin(np.clip(sin_altitude, -1, 1))
+    azimuth = np.arctan2(
+        np.sin(hour_angle),
+        np.cos(hour_angle) * np.sin(lat) - np.tan(declination) * np.cos(lat)
+    ) + np.pi
+    return np.stack(
+        [
+            np.sin(azimuth) * np.cos(altitude),
+            np.cos(azimuth) * np.cos(altitude),
+            np.sin(altitude)
+        ], axis=1
+    )
+
+
+def _perez_coefficients(epsilon, delta, zenith):
+    """Calculate the Perez coefficients for each hour."""
+    bins = np.digitize(epsilon, PEREZ_CLEARNESS_BINS)
+    x = PEREZ_COEFFICIENTS[bins]  # hours, 5, 4
+    zenith = zenith[:, None]
+    delta_ = delta[:, None]
+    coeffs = x[:, :, 0] + x[:, :, 1] * zenith + delta_ * (x[:, :, 2] + x[:, :, 3] * zenith)
+    # the first bin uses a different formula for c and d
+    first = bins == 0
+    if first.any():
+        c, d = x[first, 2], x[first, 3]
+        z, dl = zenith[first, 0], delta[first]
+        coeffs[first, 2] = np.exp(np.power(dl * (c[:, 0] + c[:, 1] * z), c[:, 2])) \
+            - c[:, 3]
+        coeffs[first, 3] = -np.exp(dl * (d[:, 0] + d[:, 1] * z)) + d[:, 2] + \
+            dl * d[:, 3]
+    return coeffs.T
+
+
+def perez_sky_matrix(epw_file, ground_reflectance=0.2) -> np.ndarray:
+    """Create an annual hourly sky matrix from an EPW file.
+
+    This is a NumPy implementation of the Perez all-weather sky that is similar to
+    ``gendaymtx -O1``. The values are solar radiance in W/sr/m2 and the direct sun is
+    added to the sky patch that is closest to the sun.
+
+    Args:
+        epw_file: Path to an EPW file or an EPW object.
+        ground_reflectance: Ground reflectance. Default is 0.2.
+
+    Returns:
+        A float32 array with the shape of (146, 8760). The first row is the ground.
+    """
+    epw = epw_file if isinstance(epw_file, EPW) else EPW(epw_file)
+    location = epw.location
+    direct = np.array(epw.direct_normal_radiation.values, dtype=np.float64)[:8760]
+    diffuse = np.array(epw.diffuse_horizontal_radiation.values, dtype=np.float64)[:8760]
+    hoys = np.arange(len(direct)) + 0.5  # use the middle of each hour
+    suns = sun_vectors(location.latitude, location.longitude, location.time_zone, hoys)
+    patches, solid_angles = tregenza_patches()
+
+    sky = np.zeros((len(patches) + 1, len(direct)), dtype=np.float64)
+    up = (suns[:, 2] > 0) & ((direct > 0) | (diffuse > 0))
+    suns, direct, diffuse = suns[up], direct[up], diffuse[up]
+    doy = hoys[up] / 24
+    zenith = np.arccos(np.clip(suns[:, 2], 0, 1))
+    zenith_deg = np.degrees(zenith)
+
+    # sky clearness and sky brightness
+    extra_terrestrial = 1367 * (1 + 0.033 * np.cos(2 * np.pi * doy / 365))
+    air_mass = 1 / (np.cos(zenith) + 0.50572 * np.power(96.07995 - zenith_deg, -1.6364))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        epsilon = ((diffuse + direct) / diffuse + 1.041 * zenith ** 3) / \
+            (1 + 1.041 * zenith ** 3)
+    epsilon = np.nan_to_num(np.clip(epsilon, 1, 12), nan=12)
+    delta = np.clip(diffuse * air_mass / extra_terrestrial, 0.01, 0.6)
+
+    a, b, c, d, e = _perez_coefficients(epsilon, delta, zenith)
+    # relative radiance of the patches - (hours, patches)
+    cos_zeta = np.clip(patches[:, 2], 0.01, 1)[None, :]
+    cos_gamma = np.clip(suns @ patches.T, -1, 1)
+    gamma = np.arccos(cos_gamma)
+    relative = (1 + a[:, None] * np.exp(b[:, None] / cos_zeta)) * \
+        (1 + c[:, None] * np.exp(d[:, None] * gamma) + e[:, None] * cos_gamma ** 2)
+    relative = np.clip(relative, 0, None)
+    # normalize the distribution to match the diffuse horizontal radiation
+    horizontal = (relative * cos_zeta * solid_angles[None, :]).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.nan_to_num(diffuse / horizontal)
+    diffuse_radiance = relative * factor[:, None]
+
+    # add the sun to the closest patch
+    sun_patch = cos_gamma.argmax(axis=1)
+    diffuse_radiance[np.arange(len(sun_patch)), sun_patch] += \
+        direct / solid_angles[sun_patch]
+
+    sky[1:, up] = diffuse_radiance.T
+    global_horizontal = diffuse + direct * suns[:, 2]
+    sky[0, up] = ground_reflectance * global_horizontal / np.pi
+    return sky.astype(np.float32)
+
+
+def monthly_averaged_sky_matrix(sky_matrix: np.ndarray, sun_up_hours=None) -> np.ndarray:
+    """Average an annual hourly sky matrix for each month.
+
+    This is the NumPy equivalent of the output of ``monthly_averaged_sky``.
+
+    Args:
+        sky_matrix: An annual hourly sky matrix with the shape of (patches, 8760).
+        sun_up_hours: An optional boolean array to only average these hours. By
+            default the hours with a non-zero sky are used similar to
+            ``gendaymtx -u``.
+
+    Returns:
+        A float32 array with the shape of (patches, 12).
+    """
+    if sun_up_hours is None:
+        sun_up_hours = sky_matrix.any(axis=0)
+    day_count = [calendar.monthrange(2022, month)[1] for month in range(1, 13)]
+    st_hours = np.cumsum([0] + day_count[:-1]) * 24
+    totals = np.add.reduceat(sky_matrix * sun_up_hours, st_hours, axis=1)
+    counts = np.add.reduceat(sun_up_hours.astype(np.float32), st_hours)
+    return (totals / np.maximum(counts, 1)).astype(np.float32)
+
+
 if __name__ == '__main__':
 
     folder = pathlib.Path(f"c:/Users/Mostapha/Documents/GitHub/sandbox-solar/sandbox-solar-irradiance/app/assets/weather/wea")
@@ -0,0 +1,214 @@
+"""Surrogate models to predict the results between the sampled parametric cases.
+
+A Gaussian process regression model is fitted for each location, configuration and
+output using the cases in ``parametric_data``. The hyperparameters are trained offline
+by running this module and are saved to ``parametric_data/surrogates``. The models are
+fitted to the data when they are loaded and each prediction is only a few small
+matrix products.
+
+    python surrogate.py
+"""
+import json
+import pathlib
+from itertools import product
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+__here__ = pathlib.Path(__file__).parent
+
+INPUTS = ['Transparency', 'Height from Ground', 'Panel Count', 'Angle (Degrees)']
+OUTPUTS = [
+    'Net AC electricity', 'Initial cost ($)', 'Low light area (%)',
+    'Medium light area (%)', 'High light area (%)'
+]
+LENGTH_SCALES = (0.15, 0.25, 0.4, 0.6, 1.0, 1.6, 2.5, 5.0)
+NOISE_LEVELS = (1e-4, 1e-3, 1e-2, 5e-2)
+
+
+class GaussianProcess:
+    """Gaussian process regression with a squared exponential kernel.
+
+    The inputs should be normalized between 0 and 1 and the output is standardized
+    internally.
+
+    Args:
+        x: Training inputs with the shape of (samples, inputs).
+        y: Training outputs with the shape of (samples,).
+        length_scales: Kernel length scale for each input.
+        noise: Noise variance for the standardized output.
+    """
+
+    def __init__(self, x, y, length_scales, noise):
+        self.x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.length_scales = np.asarray(length_scales, dtype=np.float64)
+        self.noise = noise
+        self.y_mean = y.mean()
+        self.y_std = y.std() or 1.0
+        y = (y - self.y_mean) / self.y_std
+
+        kernel = self._kernel(self.x, self.x) + noise * np.eye(len(self.x))
+        self._chol = np.linalg.cholesky(kernel)
+        self._alpha = np.linalg.solve(
+            self._chol.T, np.linalg.solve(self._chol, y)
+        )
+        # the inverse is used to keep the predictions to a few matrix products
+        self._kernel_inv = np.linalg.solve(
+            self._chol.T, np.linalg.solve(self._chol, np.eye(len(self.x)))
+        )
+        self.log_marginal_likelihood = float(
+            -0.5 * y @ self._alpha - np.log(np.diag(self._chol)).sum()
+            - 0.5 * len(y) * np.log(2 * np.pi)
+        )
+
+    def _kernel(self, a, b):
+        diff = (a[:, None, :] - b[None, :, :]) / self.length_scales
+        return np.exp(-0.5 * (diff ** 2).sum(axis=-1))
+
+    def predict(self, x) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict the mean and the standard deviation for the input values.
+
+        Args:
+            x: Normalized inputs with the shape of (samples, inputs).
+        """
+        k = self._kernel(np.atleast_2d(x), self.x)
+        mean = k @ self._alpha
+        variance = np.clip(
+            1 + self.noise - ((k @ self._kernel_inv) * k).sum(axis=1), 0, None
+        )
+        return (
+            mean * self.y_std + self.y_mean,
+            np.sqrt(variance) * self.y_std
+        )
+
+
+def _normalize(values, x_min, x_max):
+    """Normalize the inputs between 0 and 1. Inputs with a single value are set to 0."""
+    span = np.where(x_max > x_min, x_max - x_min, 1)
+    normalized = (np.asarray(values, dtype=np.float64) - x_min) / span
+    return np.where(x_max > x_min, normalized, 0)
+
+
+def train_hyperparameters(x: np.ndarray, y: np.ndarray) -> Dict:
+    """Find the hyperparameters that maximize the log marginal likelihood.
+
+    The search is a coordinate ascent over a grid of length scales for each input and
+    a grid of noise levels.
+    """
+    length_scales = [LENGTH_SCALES[3]] * x.shape[1]
+    noise = NOISE_LEVELS[1]
+    best = GaussianProcess(x, y, length_scales, noise).log_marginal_likelihood
+    for _ in range(3):
+        improved = False
+        for i, value in product(range(x.shape[1]), LENGTH_SCALES):
+            candidate = list(length_scales)
+            candidate[i] = value
+            lml = GaussianProcess(x, y, candidate, noise).log_marginal_likelihood
+            if lml > best + 1e-6:
+                best, length_scales, improved = lml, candidate, True
+        for value in NOISE_LEVELS:
+            lml = GaussianProcess(x, y, length_scales, value).log_marginal_likelihood
+            if lml > best + 1e-6:
+                best, noise, improved = lml, value, True
+        if not improved:
+            break
+    return {'length_scales': length_scales, 'noise': noise}
+
+
+def train_surrogate(data_file) -> Dict:
+    """Train the hyperparameters for all the configurations in a parametric CSV file."""
+    df = pd.read_csv(data_file)
+    surrogate = {}
+    for configuration, cases in df.groupby('Configuration'):
+        x = cases[INPUTS].values.astype(np.float64)
+        x_min, x_max = x.min(axis=0), x.max(axis=0)
+        x = _normalize(x, x_min, x_max)
+        surrogate[configuration] = {
+            'x_min': x_min.tolist(), 'x_max': x_max.tolist(),
+            'outputs': {
+                output: train_hyperparameters(x, cases[output].values)
+                for output in OUTPUTS
+            }
+        }
+    return surrogate
+
+
+def train_all(data_folder=None, target_folder=None):
+    """Train and save the surrogate models for all the locations."""
+    data_folder = pathlib.Path(data_folder or __here__.joinpath('parametric_data'))
+    target_folder = pathlib.Path(target_folder or data_folder.joinpath('surrogates'))
+    target_folder.mkdir(parents=True, exist_ok=True)
+    for data_file in sorted(data_folder.glob('*.csv')):
+        print(f'Training surrogate for location {data_file.stem}')
+        surrogate = train_surrogate(data_file)
+        target_folder.joinpath(f'{data_file.stem}.json').write_text(
+            json.dumps(surrogate, indent=2)
+        )
+
+
+class Surrogate:
+    """Surrogate models for a single location.
+
+    Args:
+        location_index: Index of the location.
+        data_folder: Optional path to the parametric data folder.
+    """
+
+    def __init__(self, location_index: int, data_folder=None):
+        data_folder = pathlib.Path(data_folder or __here__.joinpath('parametric_data'))
+        df = pd.read_csv(data_folder.joinpath(f'{location_index}.csv'))
+        info = json.loads(
+            data_folder.joinpath('surrogates', f'{location_index}.json').read_text()
+        )
+        self._ranges = {}
+        self._models = {}
+        for configuration, cases in df.groupby('Configuration'):
+            cfg = info[configuration]
+            x_min, x_max = np.array(cfg['x_min']), np.array(cfg['x_max'])
+            x = _normalize(cases[INPUTS].values, x_min, x_max)
+            self._ranges[configuration] = (x_min, x_max)
+            self._models[configuration] = {
+                output: GaussianProcess(
+                    x, cases[output].values, hp['length_scales'], hp['noise']
+                )
+                for output, hp in cfg['outputs'].items()
+            }
+
+    @property
+    def configurations(self) -> List[str]:
+        return list(self._models.keys())
+
+    def input_range(self, configuration: str) -> Dict[str, Tuple[float, float]]:
+        """Return the sampled range for each input of a configuration."""
+        x_min, x_max = self._ranges[configuration]
+        return {
+            name: (float(mn), float(mx)) for name, mn, mx in zip(INPUTS, x_min, x_max)
+        }
+
+    def predict(self, configuration: str, values: Dict[str, float]) \
+            -> Dict[str, Tuple[float, float]]:
+        """Predict all the outputs for a design.
+
+        Args:
+            configuration: Configuration name as it is in the parametric data.
+            values: A dictionary of input values. See ``INPUTS`` for the keys.
+
+        Returns:
+            A dictionary of output name to a tuple of (mean, standard deviation).
+        """
+        x_min, x_max = self._ranges[configuration]
+        x = _normalize([[values.get(name, 0) for name in INPUTS]], x_min, x_max)
+        predictions = {}
+        for output, model in self._models[configuration].items():
+            mean, std = model.predict(x)
+            mean = float(mean[0])
+            if output.endswith('(%)'):
+                mean = min(max(mean, 0), 100)
+            predictions[output] = (mean, float(std[0]))
+        return predictions
+
+
+if __name__ == '__main__':
+    train_all()
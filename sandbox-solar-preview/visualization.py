@@ -5,16 +5,10 @@ import pathlib
 
 from honeybee_vtk.model import Model, HBModel
 from par import calc_ppfd_clf
+from results import model_mapper
 
 from honeybee_vtk.vtkjs.schema import DisplayMode, SensorGridOptions
 
-model_mapper = [
-    '1_fixed_south_facing_tables', '2_fixed_south_facing_canopy',
-    '3_north_south_dynamic_single_axis', '4_fixed_east_facing_vertical',
-    '5_fixed_east_west_peaked_canopy'
-]
-
-
 def _create_results_folder(temp_folder:pathlib.Path):
     temp_folder.mkdir(parents=True, exist_ok=True)
     config_file = temp_folder.joinpath('config.json')
@@ -5,9 +5,9 @@ import streamlit as st
 from typing import List
 from streamlit_vtkjs import st_vtkjs
 from streamlit.uploaded_file_manager import UploadedFile
-from ladybug.epw import EPW
 from pollination_streamlit_io import special
 
+from epw_upload import load_epw
 from helper import get_sunpath_vtkjs, sunpath_by_location, sunpath_by_lat_long, write_csv_file, get_data, epw_fields
 from rhino import add_rhino_controls
 
@@ -29,10 +29,8 @@ def main(platform):
     with st.expander('Click here to create a Sunpath from an EPW file'):
         epw_data: UploadedFile = st.file_uploader('Load EPW', type='epw')
         if epw_data:
-            epw_file = pathlib.Path('./data/sample.epw')
-            epw_file.parent.mkdir(parents=True, exist_ok=True)
-            epw_file.write_bytes(epw_data.read())
-            epw = EPW(epw_file)
+            # the uploads are parsed in memory so the sessions never share a file
+            epw = load_epw(epw_data)
 
     selection: List[bool] = []
     if not epw:
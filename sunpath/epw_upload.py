@@ -0,0 +1,94 @@
+"""Parse EPW files from the bytes of the uploads without writing them to disk.
+
+The parsed EPW objects are kept in a small LRU cache that is keyed by the SHA-256 of
+the file contents so the sessions that upload the same file share it and two files
+from the same city never collide. Each session also keeps a registry of the SHA-256 of
+its uploads by the id of the upload so a rerun finds the parsed file without hashing
+or reading it again.
+"""
+
+import hashlib
+import pathlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Union
+
+import streamlit as st
+
+from ladybug.epw import EPW
+
+# number of parsed EPW files to keep in memory
+MAX_CACHED_FILES = 8
+
+_cache = OrderedDict()
+# SHA-256 of the cached EPW objects by their id. The EPW objects use __slots__ so
+# the hash can't be saved on them.
+_hashes: Dict[int, str] = {}
+_cache_lock = threading.Lock()
+
+
+def parse_epw(contents: bytes) -> EPW:
+    """Parse the contents of an EPW file.
+
+    The EPW objects are cached by the SHA-256 of the contents. Only use them to read
+    the data since they are shared between the sessions.
+    """
+    sha256 = hashlib.sha256(contents).hexdigest()
+    with _cache_lock:
+        if sha256 in _cache:
+            _cache.move_to_end(sha256)
+            return _cache[sha256]
+
+    try:
+        text = contents.decode('utf-8')
+    except UnicodeDecodeError:
+        text = contents.decode('latin-1')
+    # from_file_string skips the last line which is empty if the file ends with a
+    # new line
+    epw = EPW.from_file_string(text.rstrip('\r\n') + '\n')
+    with _cache_lock:
+        epw = _cache.setdefault(sha256, epw)
+        _cache.move_to_end(sha256)
+        _hashes[id(epw)] = sha256
+        while len(_cache) > MAX_CACHED_FILES:
+            _, removed = _cache.popitem(last=False)
+            _hashes.pop(id(removed), None)
+    return epw
+
+
+def epw_sha256(epw: EPW) -> str:
+    """Get the SHA-256 of the contents of a cached EPW object.
+
+    The name of the city is returned for the EPW objects that are not created by
+    this module.
+    """
+    with _cache_lock:
+        return _hashes.get(id(epw), epw.location.city)
+
+
+def load_epw(source: Union[str, pathlib.Path, BytesIO]) -> EPW:
+    """Load an EPW file from a path or from an uploaded file.
+
+    Args:
+        source: Path to an EPW file or an UploadedFile of Streamlit.
+
+    Returns:
+        A ladybug EPW object.
+    """
+    key = str(source) if isinstance(source, (str, pathlib.Path)) else source.id
+    registry = st.session_state.setdefault('epw_uploads', {})
+    sha256 = registry.get(key)
+    if sha256 is not None:
+        with _cache_lock:
+            if sha256 in _cache:
+                _cache.move_to_end(sha256)
+                return _cache[sha256]
+
+    if isinstance(source, (str, pathlib.Path)):
+        contents = pathlib.Path(source).read_bytes()
+    else:
+        contents = source.getvalue()
+    epw = parse_epw(contents)
+    registry[key] = epw_sha256(epw)
+    return epw